@@ -0,0 +1,398 @@
+import argparse
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from history import expand_runs, is_run_length, load_history
+from profiling import add_profile_argument, profile_mode, run_profiled
+
+# Rolling windows (in hours) materialized for every product
+DEFAULT_WINDOWS_HOURS = (24, 48, 168, 720)
+
+###############################################################################
+# 1. INPUT ARRAYS
+###############################################################################
+def _observation_arrays(df):
+    """Drops unusable rows and returns (nicknames, titles, ts, prices) arrays."""
+    df = expand_runs(df)
+    ts = df['ts'].to_numpy(dtype=np.int64)
+    prices = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64)
+    nicknames = df['nickname'].to_numpy(dtype=object)
+    titles = df['title'].to_numpy(dtype=object) if 'title' in df.columns else nicknames
+    valid = (ts >= 0) & np.isfinite(prices) & (prices > 0) & pd.notna(nicknames)
+    return nicknames[valid], titles[valid], ts[valid], prices[valid]
+
+###############################################################################
+# 2. VECTORIZED STATISTICS
+###############################################################################
+def _sort_groups(nicknames, ts, prices):
+    """
+    Sorts observations by (product, time) and returns the sorted arrays plus
+    group boundaries. Every per-product statistic below is a reduceat over
+    these contiguous groups, so all products are handled in one pass.
+    """
+    names, codes = np.unique(nicknames.astype(str), return_inverse=True)
+    order = np.lexsort((ts, codes))
+    codes, ts, prices = codes[order], ts[order], prices[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    return names[codes[starts]], order, ts, prices, starts, ends
+
+def _group_stats(ts, prices, starts, ends):
+    """All-time statistics for sorted, grouped observations."""
+    counts = ends - starts + 1
+    group_index = np.repeat(np.arange(len(starts)), counts)
+    same_group = np.r_[False, group_index[1:] == group_index[:-1]]
+    prev_prices = np.r_[prices[:1], prices[:-1]]
+
+    # Time of the most recent price change (first observation if it never changed)
+    changed = same_group & (prices != prev_prices)
+    change_ts = np.where(changed, ts, ts[starts][group_index])
+
+    # Log returns between consecutive observations of the same product
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(same_group, np.log(prices / prev_prices), 0.0)
+
+    return {
+        'obs_count': counts,
+        'first_seen': ts[starts],
+        'last_seen': ts[ends],
+        'last_price': prices[ends],
+        'all_time_low': np.minimum.reduceat(prices, starts),
+        'all_time_high': np.maximum.reduceat(prices, starts),
+        'last_change_ts': np.maximum.reduceat(change_ts, starts),
+        'ret_count': counts - 1,
+        'ret_sum': np.add.reduceat(returns, starts),
+        'ret_sumsq': np.add.reduceat(returns * returns, starts),
+    }
+
+def _volatility(ret_count, ret_sum, ret_sumsq):
+    """Sample standard deviation of log returns; NaN with fewer than two returns."""
+    ret_count = np.asarray(ret_count, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (ret_sumsq - ret_sum * ret_sum / ret_count) / (ret_count - 1)
+    return np.where(ret_count >= 2, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+def _window_stats(ts, prices, starts, ends, as_of, windows_hours):
+    """
+    Rolling statistics over the trailing windows ending at as_of.
+    Because each group is sorted by time, a window is always a suffix of its
+    group, which makes the first in-window price a simple index lookup.
+    """
+    results = {}
+    for hours in windows_hours:
+        in_window = ts >= as_of - int(hours * 3600)
+        count = np.add.reduceat(in_window.astype(np.int64), starts)
+        has_data = count > 0
+        first_idx = np.where(has_data, ends - count + 1, ends)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.add.reduceat(np.where(in_window, prices, 0.0), starts) / count
+        results[hours] = {
+            'obs_count': count,
+            'min_price': np.minimum.reduceat(np.where(in_window, prices, np.inf), starts),
+            'max_price': np.maximum.reduceat(np.where(in_window, prices, -np.inf), starts),
+            'mean_price': mean,
+            'first_price': prices[first_idx],
+            'last_price': prices[ends],
+            'price_change': prices[ends] - prices[first_idx],
+        }
+    return results
+
+###############################################################################
+# 3. SUMMARY TABLES
+###############################################################################
+def initialize_summary_tables(conn):
+    """Creates the product_stats and product_window_stats tables if needed."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_stats (
+            nickname TEXT PRIMARY KEY,
+            title TEXT,
+            last_price REAL,
+            first_seen INTEGER,
+            last_seen INTEGER,
+            obs_count INTEGER,
+            all_time_low REAL,
+            all_time_high REAL,
+            last_change_ts INTEGER,
+            seconds_since_change INTEGER,
+            ret_count INTEGER,
+            ret_sum REAL,
+            ret_sumsq REAL,
+            volatility REAL,
+            as_of INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_window_stats (
+            nickname TEXT,
+            window_hours INTEGER,
+            obs_count INTEGER,
+            min_price REAL,
+            max_price REAL,
+            mean_price REAL,
+            first_price REAL,
+            last_price REAL,
+            price_change REAL,
+            as_of INTEGER,
+            PRIMARY KEY (nickname, window_hours)
+        )
+    ''')
+
+def _write_windows(conn, names, window_results, as_of):
+    """Replaces every window row with freshly computed values."""
+    conn.execute('DELETE FROM product_window_stats')
+    rows = []
+    for hours, stats in window_results.items():
+        for i in np.flatnonzero(stats['obs_count'] > 0):
+            rows.append((str(names[i]), int(hours), int(stats['obs_count'][i]),
+                         float(stats['min_price'][i]), float(stats['max_price'][i]),
+                         float(stats['mean_price'][i]), float(stats['first_price'][i]),
+                         float(stats['last_price'][i]), float(stats['price_change'][i]),
+                         int(as_of)))
+    conn.executemany('INSERT INTO product_window_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+def _stats_rows(names, titles, stats, as_of):
+    volatility = _volatility(stats['ret_count'], stats['ret_sum'], stats['ret_sumsq'])
+    rows = []
+    for i, name in enumerate(names):
+        rows.append((str(name), titles[i], float(stats['last_price'][i]),
+                     int(stats['first_seen'][i]), int(stats['last_seen'][i]),
+                     int(stats['obs_count'][i]), float(stats['all_time_low'][i]),
+                     float(stats['all_time_high'][i]), int(stats['last_change_ts'][i]),
+                     int(as_of - stats['last_change_ts'][i]), int(stats['ret_count'][i]),
+                     float(stats['ret_sum'][i]), float(stats['ret_sumsq'][i]),
+                     None if np.isnan(volatility[i]) else float(volatility[i]), int(as_of)))
+    return rows
+
+def _fold_bars(conn):
+    """
+    Folds OHLC bars (compacted or imported history, see retention.py) into
+    product_stats: first_seen, obs_count and the all-time low/high cover the
+    bars too, and products that only have bars get a row from their latest
+    bar. Returns and volatility stay based on raw observations.
+    """
+    has_bars = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_bars'").fetchone()
+    if not has_bars:
+        return
+    conn.execute('''
+        CREATE TEMP TABLE bar_totals AS
+        SELECT nickname, MIN(bucket_start) AS first_bucket, SUM(count) AS bar_count,
+               MIN(low) AS low, MAX(high) AS high, MAX(bucket_start) AS last_bucket
+        FROM price_bars GROUP BY nickname
+    ''')
+    conn.execute('''
+        UPDATE product_stats SET
+            first_seen = MIN(first_seen, b.first_bucket),
+            obs_count = obs_count + b.bar_count,
+            all_time_low = MIN(all_time_low, b.low),
+            all_time_high = MAX(all_time_high, b.high)
+        FROM bar_totals b WHERE product_stats.nickname = b.nickname
+    ''')
+    as_of = conn.execute('SELECT MAX(as_of) FROM product_stats').fetchone()[0]
+    conn.execute('''
+        INSERT OR IGNORE INTO product_stats
+        SELECT b.nickname, NULL, p.close, b.first_bucket, b.last_bucket, b.bar_count, b.low, b.high,
+               b.last_bucket, COALESCE(?, b.last_bucket) - b.last_bucket, 0, 0.0, 0.0, NULL,
+               COALESCE(?, b.last_bucket)
+        FROM bar_totals b
+        JOIN price_bars p ON p.nickname = b.nickname AND p.bucket_start = b.last_bucket
+        GROUP BY b.nickname
+    ''', (as_of, as_of))
+    conn.execute('DROP TABLE bar_totals')
+
+def _fold_window_bars(conn, windows_hours):
+    """
+    Folds OHLC bars into product_window_stats, so windows longer than the raw
+    retention (retention.py) still cover their whole span. Bars starting
+    inside a window add their count, low and high, and the oldest one gives
+    first_price; a bar's mean is taken as (open + high + low + close) / 4.
+    Products whose window only holds bars get a row from them.
+    """
+    has_bars = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_bars'").fetchone()
+    as_of = conn.execute('SELECT MAX(as_of) FROM product_stats').fetchone()[0]
+    if not has_bars or as_of is None:
+        return
+    for hours in windows_hours:
+        conn.execute('''
+            CREATE TEMP TABLE window_bars AS
+            SELECT g.*,
+                   (SELECT open FROM price_bars p
+                    WHERE p.nickname = g.nickname AND p.bucket_start = g.first_bucket) AS first_open,
+                   (SELECT close FROM price_bars p
+                    WHERE p.nickname = g.nickname AND p.bucket_start = g.last_bucket) AS last_close
+            FROM (SELECT nickname, SUM(count) AS bar_count, MIN(low) AS low, MAX(high) AS high,
+                         SUM((open + high + low + close) / 4 * count) AS total,
+                         MIN(bucket_start) AS first_bucket, MAX(bucket_start) AS last_bucket
+                  FROM price_bars WHERE bucket_start >= ? GROUP BY nickname) g
+        ''', (as_of - int(hours * 3600),))
+        # Bars are older than every raw row, so they only move the window's start
+        conn.execute('''
+            UPDATE product_window_stats SET
+                obs_count = obs_count + b.bar_count,
+                min_price = MIN(min_price, b.low),
+                max_price = MAX(max_price, b.high),
+                mean_price = (mean_price * obs_count + b.total) / (obs_count + b.bar_count),
+                first_price = b.first_open,
+                price_change = last_price - b.first_open
+            FROM window_bars b
+            WHERE product_window_stats.nickname = b.nickname AND product_window_stats.window_hours = ?
+        ''', (int(hours),))
+        conn.execute('''
+            INSERT OR IGNORE INTO product_window_stats
+            SELECT nickname, ?, bar_count, low, high, total / bar_count, first_open, last_close,
+                   last_close - first_open, ?
+            FROM window_bars
+        ''', (int(hours), as_of))
+        conn.execute('DROP TABLE window_bars')
+
+def rebuild_summary(history_df, db_name='amazon_tracker.db', windows_hours=DEFAULT_WINDOWS_HOURS):
+    """
+    Recomputes both summary tables from the full price history, plus any
+    hourly/daily bars the history was compacted into (see _fold_bars and
+    _fold_window_bars).
+    """
+    nicknames, titles, ts, prices = _observation_arrays(history_df)
+    conn = sqlite3.connect(db_name)
+    initialize_summary_tables(conn)
+    conn.execute('DELETE FROM product_stats')
+    if len(ts):
+        names, order, ts, prices, starts, ends = _sort_groups(nicknames, ts, prices)
+        as_of = int(ts.max())
+        stats = _group_stats(ts, prices, starts, ends)
+        last_titles = titles[order][ends]
+        conn.executemany('INSERT INTO product_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         _stats_rows(names, last_titles, stats, as_of))
+        _write_windows(conn, names, _window_stats(ts, prices, starts, ends, as_of, windows_hours), as_of)
+    else:
+        conn.execute('DELETE FROM product_window_stats')
+    _fold_bars(conn)
+    _fold_window_bars(conn, windows_hours)
+    conn.commit()
+    conn.close()
+
+def update_summary(new_df, history_df, db_name='amazon_tracker.db',
+                   windows_hours=DEFAULT_WINDOWS_HOURS):
+    """
+    Incrementally updates the summary tables after a fetch cycle.
+
+    new_df holds the observations fetched this cycle; history_df is the
+    price history including them. All-time statistics are merged from the
+    stored values and the new rows only, and window statistics read just the
+    tail of history_df covering the longest window, plus the bars inside it. Observations that are not
+    newer than a product's stored last_seen are ignored, so running the same
+    update twice changes nothing. Falls back to a full rebuild when the
+    tables are still empty.
+    """
+    conn = sqlite3.connect(db_name)
+    initialize_summary_tables(conn)
+    existing = pd.read_sql_query('SELECT * FROM product_stats', conn).set_index('nickname')
+    if existing.empty:
+        conn.close()
+        rebuild_summary(history_df, db_name, windows_hours)
+        return
+
+    nicknames, titles, ts, prices = _observation_arrays(new_df)
+    known_last_seen = existing['last_seen'].reindex(nicknames.astype(str)).to_numpy()
+    fresh = ~(ts <= known_last_seen)  # NaN (new product) compares False, so it is kept
+    nicknames, titles, ts, prices = nicknames[fresh], titles[fresh], ts[fresh], prices[fresh]
+
+    if is_run_length(history_df):
+        # Only runs that reach into the longest window need expanding
+        horizon = history_df['last_seen'].max() - int(max(windows_hours) * 3600)
+        history_df = history_df[history_df['last_seen'] >= horizon]
+    hist_names, hist_titles, hist_ts, hist_prices = _observation_arrays(history_df)
+    as_of = int(max(hist_ts.max(initial=0), ts.max(initial=0), existing['as_of'].max()))
+
+    if len(ts):
+        # Seed every known product with its stored last observation so changes
+        # and returns are measured across the boundary with the previous cycle.
+        touched = existing.index.intersection(pd.unique(nicknames.astype(str)))
+        seeds = existing.loc[touched]
+        all_names = np.r_[seeds.index.to_numpy(dtype=object), nicknames]
+        all_titles = np.r_[seeds['title'].to_numpy(dtype=object), titles]
+        all_ts = np.r_[seeds['last_seen'].to_numpy(dtype=np.int64), ts]
+        all_prices = np.r_[seeds['last_price'].to_numpy(dtype=np.float64), prices]
+
+        names, order, all_ts, all_prices, starts, ends = _sort_groups(all_names, all_ts, all_prices)
+        stats = _group_stats(all_ts, all_prices, starts, ends)
+        last_titles = all_titles[order][ends]
+
+        previous = existing.reindex(names.astype(str))
+        seeded = previous['obs_count'].notna().to_numpy()
+        prev = {col: previous[col].to_numpy() for col in previous.columns}
+        # The seed row is already counted in the stored totals
+        stats['obs_count'] = np.where(seeded, prev['obs_count'] + stats['obs_count'] - 1, stats['obs_count'])
+        stats['first_seen'] = np.where(seeded, prev['first_seen'], stats['first_seen'])
+        stats['all_time_low'] = np.where(seeded, np.fmin(prev['all_time_low'], stats['all_time_low']),
+                                         stats['all_time_low'])
+        stats['all_time_high'] = np.where(seeded, np.fmax(prev['all_time_high'], stats['all_time_high']),
+                                          stats['all_time_high'])
+        unchanged = seeded & (stats['last_change_ts'] == previous['last_seen'].to_numpy())
+        stats['last_change_ts'] = np.where(unchanged, prev['last_change_ts'], stats['last_change_ts'])
+        for col in ('ret_count', 'ret_sum', 'ret_sumsq'):
+            stats[col] = np.where(seeded, prev[col] + stats[col], stats[col])
+
+        conn.executemany('INSERT OR REPLACE INTO product_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         _stats_rows(names, last_titles, stats, as_of))
+
+    conn.execute('UPDATE product_stats SET seconds_since_change = ? - last_change_ts, as_of = ?',
+                 (as_of, as_of))
+
+    # Window statistics only need the tail of the history
+    tail = hist_ts >= as_of - int(max(windows_hours) * 3600)
+    if tail.any():
+        names, order, w_ts, w_prices, starts, ends = _sort_groups(hist_names[tail], hist_ts[tail],
+                                                                  hist_prices[tail])
+        _write_windows(conn, names, _window_stats(w_ts, w_prices, starts, ends, as_of, windows_hours), as_of)
+    else:
+        conn.execute('DELETE FROM product_window_stats')
+    _fold_window_bars(conn, windows_hours)
+    conn.commit()
+    conn.close()
+
+###############################################################################
+# 4. READING THE SUMMARY
+###############################################################################
+def load_summary(db_name='amazon_tracker.db'):
+    """Returns product_stats as a DataFrame (empty if it was never built)."""
+    try:
+        conn = sqlite3.connect(db_name)
+        df = pd.read_sql_query('SELECT * FROM product_stats ORDER BY nickname', conn)
+        conn.close()
+        return df
+    except Exception:
+        return pd.DataFrame()
+
+def load_window_changes(hours=48, db_name='amazon_tracker.db'):
+    """
+    Returns a DataFrame with nickname and price_diff (last - first price)
+    for every product that has data within the given window.
+    """
+    try:
+        conn = sqlite3.connect(db_name)
+        df = pd.read_sql_query('''
+            SELECT nickname, first_price, last_price, price_change AS price_diff
+            FROM product_window_stats
+            WHERE window_hours = ? AND obs_count > 0
+            ORDER BY nickname
+        ''', conn, params=(hours,))
+        conn.close()
+        return df
+    except Exception:
+        return pd.DataFrame(columns=['nickname', 'first_price', 'last_price', 'price_diff'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or show the price summary tables.")
+    parser.add_argument('--rebuild', action='store_true', help="recompute from price_history.csv")
+    parser.add_argument('--csv', default='price_history.csv')
+    parser.add_argument('--db', default='amazon_tracker.db')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_summary(load_history(args.csv), args.db)
+    print(load_summary(args.db).to_string(index=False))
+
+if __name__ == "__main__":
+    run_profiled('analytics', main, mode=profile_mode())
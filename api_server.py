@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from analytics import load_summary, load_window_changes
+from history import load_history
+from offers import load_offer_series
+from profiling import add_profile_argument, profile_mode, run_profiled
+from retention import load_price_series
+
+###############################################################################
+# LOCAL READ API
+#
+# GET /products                          products with their latest stats
+# GET /series?nickname=A&nickname=B&start=TS&end=TS
+#                                        price series (resolution-aware)
+# GET /changes?hours=48                  first-to-last price change per product
+# GET /stats                             full per-product summary table
+# GET /offers?nickname=A&type=used&start=TS&end=TS
+#                                        list price, other sellers, used, coupon series
+#
+# Responses are JSON, cached in memory per (path, query) and tagged with an
+# ETag. The cache is dropped whenever price_history.csv or amazon_tracker.db
+# changes on disk, i.e. as soon as a fetch cycle stores new observations, and
+# holds at most CACHE_SIZE responses, evicting the least recently used.
+###############################################################################
+MAX_REQUEST_LINE = 8192
+CACHE_SIZE = 256
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+class HistoryStore:
+    """Holds the parsed history and the response cache for one data version."""
+
+    def __init__(self, csv_file='price_history.csv', db_name='amazon_tracker.db', cache_size=CACHE_SIZE):
+        self.csv_file = csv_file
+        self.db_name = db_name
+        self.version = None
+        self.history_df = None
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def _current_version(self):
+        stamps = []
+        for path in (self.csv_file, self.db_name, self.db_name + '-wal'):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def check_version(self):
+        """Drops cached data if new observations were written since the last request."""
+        version = self._current_version()
+        if version != self.version:
+            self.version = version
+            self.history_df = None
+            self.cache.clear()
+
+    def cached(self, key):
+        """Returns the cached (etag, body) for key, or None."""
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+        return entry
+
+    def remember(self, key, entry):
+        """Caches entry, evicting the least recently used responses beyond cache_size."""
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def history(self):
+        if self.history_df is None:
+            self.history_df = load_history(self.csv_file, expand=True)
+        return self.history_df
+
+    # Section: Endpoint Builders (run in a worker thread)
+    def products(self, query):
+        summary = load_summary(self.db_name)
+        if summary.empty:
+            names = sorted(self.history()['nickname'].dropna().unique())
+            return [{'nickname': name} for name in names]
+        columns = ['nickname', 'title', 'last_price', 'last_seen', 'all_time_low', 'all_time_high']
+        return _records(summary[columns])
+
+    def series(self, query):
+        nicknames = query.get('nickname') or None
+        start = _int_param(query, 'start')
+        end = _int_param(query, 'end')
+        df = load_price_series(nicknames, start, end, csv_file=self.csv_file, db_name=self.db_name,
+                               raw_df=self.history())
+        series = {}
+        for nickname, group in df.groupby('nickname', sort=True):
+            series[nickname] = list(zip(group['ts'].astype(int).tolist(), group['price'].tolist()))
+        return {'resolution': df.attrs.get('resolution', 'raw'), 'series': series}
+
+    def changes(self, query):
+        hours = _int_param(query, 'hours') or 48
+        return _records(load_window_changes(hours, self.db_name))
+
+    def stats(self, query):
+        return _records(load_summary(self.db_name))
+
+    def offers(self, query):
+        df = load_offer_series(query.get('nickname'), query.get('type'), _int_param(query, 'start'),
+                               _int_param(query, 'end'), db_name=self.db_name)
+        series = {}
+        for (nickname, offer_type), group in df.groupby(['nickname', 'offer_type'], sort=True):
+            series.setdefault(nickname, {})[offer_type] = list(zip(group['ts'].tolist(), group['value'].tolist()))
+        return series
+
+def _int_param(query, name):
+    values = query.get(name)
+    return int(values[0]) if values else None
+
+def _records(df):
+    """DataFrame -> list of dicts with JSON-safe values (NaN becomes null)."""
+    return json.loads(df.to_json(orient='records'))
+
+# Section: HTTP Handling
+class ApiServer:
+    """A minimal HTTP/1.1 server (keep-alive, GET/HEAD only) over asyncio streams."""
+
+    def __init__(self, store):
+        self.store = store
+        self.routes = {
+            '/products': store.products,
+            '/series': store.series,
+            '/changes': store.changes,
+            '/stats': store.stats,
+            '/offers': store.offers,
+        }
+        self.pending = {}
+
+    async def _build(self, key, builder, query):
+        """Builds a response body once per cache key, even under concurrent misses."""
+        entry = self.store.cached(key)
+        if entry is not None:
+            return entry
+        version = self.store.version
+        pending_key = (version, key)
+        if pending_key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[pending_key] = loop.run_in_executor(None, partial(builder, query))
+        try:
+            payload = await self.pending[pending_key]
+        finally:
+            self.pending.pop(pending_key, None)
+        body = json.dumps(payload, separators=(',', ':')).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if self.store.version == version:
+            self.store.remember(key, (etag, body))
+        return etag, body
+
+    async def respond(self, method, target, headers):
+        parts = urlsplit(target)
+        builder = self.routes.get(parts.path)
+        if builder is None:
+            return 404, {}, b'{"error":"not found"}'
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b'{"error":"method not allowed"}'
+
+        self.store.check_version()
+        query = parse_qs(parts.query)
+        key = (parts.path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        try:
+            etag, body = await self._build(key, builder, query)
+        except ValueError as e:
+            return 400, {}, json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            # e.g. a locked or corrupt database; the connection stays usable
+            print(f"Error building {target}: {type(e).__name__}: {e}", flush=True)
+            return 500, {}, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()
+
+        extra = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if headers.get('if-none-match') == etag:
+            return 304, extra, b''
+        return 200, extra, body
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line or len(request_line) > MAX_REQUEST_LINE:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                status, extra, body = await self.respond(method, target, headers)
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                        'Content-Type: application/json',
+                        f"Content-Length: {len(body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host='127.0.0.1', port=8080, csv_file='price_history.csv', db_name='amazon_tracker.db',
+                cache_size=CACHE_SIZE):
+    server = ApiServer(HistoryStore(csv_file, db_name, cache_size))
+    tcp_server = await asyncio.start_server(server.handle, host, port)
+    print(f"Price history API listening on http://{host}:{port}", flush=True)
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local read API over the price history.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--csv', default='price_history.csv')
+    parser.add_argument('--db', default='amazon_tracker.db')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="responses kept in memory")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.csv, args.db, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    run_profiled('api_server', main, mode=profile_mode())
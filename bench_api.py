@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from analytics import rebuild_summary
+from bench_retention import write_synthetic_history
+from history import load_history
+from stub_server import free_port, wait_for_port
+
+# Section: HTTP Client
+async def _request(reader, writer, path, etag=None):
+    """Sends one keep-alive GET and returns (status, etag, body length)."""
+    lines = [f"GET {path} HTTP/1.1", "Host: localhost"]
+    if etag:
+        lines.append(f"If-None-Match: {etag}")
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('etag'), len(body)
+
+async def _client(port, paths, deadline, latencies, use_etags, offset):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    etags = {}
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        status, etag, _ = await _request(reader, writer, path, etags.get(path) if use_etags else None)
+        latencies.append(time.perf_counter() - start)
+        if status == 200 and etag:
+            etags[path] = etag
+    writer.close()
+
+async def _load(port, paths, connections, seconds, use_etags):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(port, paths, deadline, latencies, use_etags, c)
+                           for c in range(connections)])
+    return latencies, time.perf_counter() - started
+
+async def _cold(port, paths):
+    """Times the first (uncached) request for every path."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    timings = []
+    for path in paths:
+        start = time.perf_counter()
+        await _request(reader, writer, path)
+        timings.append((path, time.perf_counter() - start))
+    writer.close()
+    return timings
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+# Section: Benchmark
+def run_benchmark(products=50, days=60, connections=32, seconds=10):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, 'price_history.csv')
+        db_name = os.path.join(tmp, 'bench.db')
+        rows = write_synthetic_history(csv_file, products, days, interval_minutes=30)
+        rebuild_summary(load_history(csv_file), db_name)
+
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                'api_server.py'),
+                                   '--port', str(port), '--csv', csv_file, '--db', db_name],
+                                  stdout=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+
+            paths = ['/products', '/stats', '/changes?hours=48', '/changes?hours=24', '/series']
+            paths += [f"/series?nickname=product-{p}" for p in range(min(products, 20))]
+
+            print(f"{rows:,} history rows, {products} products, {connections} connections, {seconds}s per run")
+            for path, seconds_taken in asyncio.run(_cold(port, paths[:5])):
+                print(f"  cold {path:<22} {seconds_taken * 1000:8.1f} ms")
+
+            for use_etags in (False, True):
+                latencies, elapsed = asyncio.run(_load(port, paths, connections, seconds, use_etags))
+                label = "cached, If-None-Match (304)" if use_etags else "cached, full bodies (200)"
+                print(f"{label:<30} p50 {_percentile(latencies, 50) * 1000:6.2f} ms  "
+                      f"p99 {_percentile(latencies, 99) * 1000:6.2f} ms  "
+                      f"{len(latencies) / elapsed:8.0f} req/s")
+        finally:
+            server.terminate()
+            server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the local price history API.")
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+    run_benchmark(args.products, args.days, args.connections, args.seconds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from bench_retention import write_synthetic_history
+from history import compress_runs, load_history, save_history
+
+# Section: Measurements
+def _time(func, repeat=3):
+    """Returns (best seconds, last result) over repeat runs."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def compare(label, csv_file, tmp):
+    """Prints rows, bytes and load times for csv_file stored in full and change-only form."""
+    full_file = os.path.join(tmp, 'full.csv')
+    runs_file = os.path.join(tmp, 'runs.csv')
+    full_df = load_history(csv_file)
+    save_history(full_df, full_file)
+    save_history(compress_runs(full_df), runs_file)
+
+    full_load, full_loaded = _time(lambda: load_history(full_file))
+    runs_load, runs_loaded = _time(lambda: load_history(runs_file))
+    expand_load, expanded = _time(lambda: load_history(runs_file, expand=True))
+    full_bytes, runs_bytes = os.path.getsize(full_file), os.path.getsize(runs_file)
+
+    print(f"{label}")
+    print(f"  rows:  {len(full_loaded):>10,} full -> {len(runs_loaded):,} runs "
+          f"({len(full_loaded) / max(len(runs_loaded), 1):.1f}x fewer)")
+    print(f"  bytes: {full_bytes:>10,} full -> {runs_bytes:,} runs "
+          f"({full_bytes / max(runs_bytes, 1):.1f}x smaller)")
+    print(f"  load:  {full_load:.3f}s full, {runs_load:.3f}s runs, "
+          f"{expand_load:.3f}s runs expanded to {len(expanded):,} observations")
+
+def run_benchmark(csv_file='price_history.csv', products=20, days=365, interval_minutes=30):
+    with tempfile.TemporaryDirectory() as tmp:
+        if os.path.exists(csv_file):
+            # Work on a copy: a legacy file would otherwise be rewritten in place
+            copy = os.path.join(tmp, 'checked_in.csv')
+            shutil.copy(csv_file, copy)
+            compare(f"{csv_file}", copy, tmp)
+
+        synthetic = os.path.join(tmp, 'synthetic.csv')
+        write_synthetic_history(synthetic, products, days, interval_minutes)
+        compare(f"synthetic: {products} products, {days} days every {interval_minutes} min",
+                synthetic, tmp)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and change-only price history storage.")
+    parser.add_argument('--csv', default='price_history.csv')
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval-minutes', type=int, default=30)
+    args = parser.parse_args()
+    run_benchmark(args.csv, args.products, args.days, args.interval_minutes)
+
+if __name__ == "__main__":
+    main()
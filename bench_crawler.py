@@ -0,0 +1,54 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from crawler import run_coordinator
+from stub_server import free_port, serve_stub, synthetic_product_urls, wait_for_port
+
+# Section: Benchmark
+def run_benchmark(products=400, worker_counts=(1, 2, 4, 8), latency=0.01, page_kb=200,
+                  batch_size=10):
+    """
+    Times one full crawl cycle of `products` stub products for each worker count.
+    Prints wall time, throughput and speedup relative to the first run.
+    """
+    port = free_port()
+    server = multiprocessing.Process(target=serve_stub, args=(port, {'latency': latency, 'page_kb': page_kb}),
+                                     daemon=True)
+    server.start()
+    wait_for_port(port)
+    product_urls = synthetic_product_urls(f"http://127.0.0.1:{port}", products)
+
+    print(f"{products} products, {page_kb} KB pages, {latency * 1000:.0f} ms stub latency, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'products/s':>11} {'speedup':>8}")
+    baseline = None
+    try:
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                db_name = os.path.join(tmp, 'bench.db')
+                start = time.perf_counter()
+                counts = run_coordinator(workers, product_urls, db_name=db_name, csv_file=None,
+                                         batch_size=batch_size)
+                elapsed = time.perf_counter() - start
+            if counts.get('done', 0) != products:
+                print(f"Warning: only {counts.get('done', 0)} of {products} products completed: {counts}")
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {products / elapsed:>11.1f} {baseline / elapsed:>7.2f}x")
+    finally:
+        server.terminate()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local multi-process crawler scaling benchmark.")
+    parser.add_argument('--products', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--page-kb', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=10)
+    args = parser.parse_args()
+    run_benchmark(args.products, args.workers, args.latency, args.page_kb, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+
+import requests
+
+from generate_data import HEADERS, parse_product_page, run_fetch_cycle
+from stub_server import (add_server_arguments, free_port, serve_stub, server_options, synthetic_product_urls,
+                         wait_for_port)
+
+# Section: Stub Server Process
+def _stub_stats(base_url):
+    return requests.get(f"{base_url}/__stats").json()
+
+# Section: Measurements
+def measure_parse_cpu(session, product_urls, sample=50):
+    """
+    Downloads up to `sample` pages once, then returns the CPU seconds spent
+    per page in parse_product_page alone (network excluded).
+    """
+    bodies = []
+    for url in list(product_urls.values())[:sample]:
+        response = session.get(url, headers=HEADERS)
+        if response.status_code == 200:
+            bodies.append((response.content, url))
+    if not bodies:
+        return None
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.process_time()
+        for content, url in bodies:
+            parse_product_page(content, url)
+        return (time.process_time() - start) / len(bodies)
+
+def run_cycle(product_urls, workers, tmp, session):
+    """Runs one end-to-end fetch cycle into tmp; returns (wall seconds, CPU seconds)."""
+    db_name = os.path.join(tmp, 'bench.db')
+    csv_file = os.path.join(tmp, 'price_history.csv')
+    start_wall, start_cpu = time.perf_counter(), os.times()
+    # Per-product progress lines would dominate the output
+    with contextlib.redirect_stdout(io.StringIO()):
+        if workers > 1:
+            from crawler import run_coordinator
+            run_coordinator(workers, product_urls, db_name=db_name, csv_file=csv_file)
+        else:
+            run_fetch_cycle(product_urls, session=session, db_name=db_name, csv_file=csv_file)
+    end_cpu = os.times()
+    # Worker processes are children, so their CPU shows up in the children fields
+    cpu = sum(end_cpu[:4]) - sum(start_cpu[:4])
+    return time.perf_counter() - start_wall, cpu
+
+# Section: Load Driver
+def run_benchmark(products=1000, workers=1, cycles=3, parse_sample=50, options=None):
+    """
+    Crawls `products` stub products for `cycles` cycles and prints cycle
+    time, throughput, CPU and how the stub answered (ok/errors/throttled).
+    """
+    options = options or {}
+    port = free_port()
+    server = multiprocessing.Process(target=serve_stub, args=(port, options), daemon=True)
+    server.start()
+    wait_for_port(port)
+    base_url = f"http://127.0.0.1:{port}"
+    product_urls = synthetic_product_urls(base_url, products)
+
+    try:
+        session = requests.Session()
+        parse_cpu = measure_parse_cpu(session, product_urls, parse_sample)
+        source = f"replaying {options['replay_dir']}" if options.get('replay_dir') else \
+            f"synthetic {options.get('page_kb', 0)} KB pages"
+        print(f"{products} products, {workers} worker(s), {source}, "
+              f"latency {options.get('latency', 0) * 1000:.0f} ms {options.get('latency_dist', 'fixed')}, "
+              f"errors {options.get('error_rate', 0):.0%}, throttled {options.get('throttle_rate', 0):.0%}")
+        if parse_cpu is not None:
+            print(f"Parse CPU: {parse_cpu * 1000:.1f} ms per page "
+                  f"({parse_cpu * products:.1f} CPU-s per cycle)")
+        print(f"{'cycle':>5} {'seconds':>9} {'products/s':>11} {'CPU-s':>7} {'ok':>6} {'errors':>7} {'throttled':>10}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for cycle in range(1, cycles + 1):
+                before = _stub_stats(base_url)
+                elapsed, cpu = run_cycle(product_urls, workers, tmp, session)
+                after = _stub_stats(base_url)
+                counts = {name: after[name] - before[name] for name in after}
+                print(f"{cycle:>5} {elapsed:>9.2f} {products / elapsed:>11.1f} {cpu:>7.2f} "
+                      f"{counts['ok']:>6} {counts['errors']:>7} {counts['throttled']:>10}")
+        session.close()
+    finally:
+        server.terminate()
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end fetch cycle load driver against the stub server.")
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=1, help="> 1 uses the multi-process crawler")
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--parse-sample', type=int, default=50, help="pages used to measure parse CPU")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    run_benchmark(args.products, args.workers, args.cycles, args.parse_sample, server_options(args))
+
+if __name__ == "__main__":
+    main()
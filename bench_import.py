@@ -0,0 +1,97 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bulk_import import import_files, print_report
+
+# Section: Synthetic Exports
+def write_synthetic_exports(directory, total_mb=2048, files=4, products=200, years=3,
+                            chunk_rows=1_000_000, now=None):
+    """
+    Writes `files` export files totalling about total_mb: CSV files in an
+    ASIN/Date/Price layout and JSON Lines files with nickname and epoch
+    milliseconds, alternating. Rows are in random time order and about 2%
+    repeat an earlier row. Returns the file paths and the number of rows.
+    """
+    now = int(time.time() if now is None else now)
+    start = now - years * 365 * 86400
+    rng = np.random.default_rng(0)
+    paths, rows = [], 0
+    for f in range(files):
+        is_csv = f % 2 == 0
+        path = os.path.join(directory, f"export-{f}.csv" if is_csv else f"export-{f}.jsonl")
+        paths.append(path)
+        target = total_mb * 1024 * 1024 // files
+        first = True
+        while not os.path.exists(path) or os.path.getsize(path) < target:
+            codes = rng.integers(0, products, chunk_rows)
+            ts = rng.integers(start, now, chunk_rows) // 60 * 60
+            prices = np.round(20 + codes % 50 + rng.normal(0, 1, chunk_rows), 2)
+            repeats = rng.random(chunk_rows) < 0.02
+            ts[repeats] = np.roll(ts, 1)[repeats]
+            codes[repeats] = np.roll(codes, 1)[repeats]
+            if is_csv:
+                chunk = pd.DataFrame({
+                    'ASIN': pd.Series(codes).map(lambda c: f"B{c:09d}"),
+                    'Date': pd.to_datetime(ts, unit='s').strftime('%Y-%m-%d %H:%M:%S'),
+                    'Price': pd.Series(prices).map(lambda p: f"${p:,.2f}"),
+                })
+                chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+            else:
+                chunk = pd.DataFrame({'nickname': pd.Series(codes).map(lambda c: f"product-{c}"),
+                                      'time': ts * 1000, 'price': prices})
+                with open(path, 'w' if first else 'a') as file:
+                    chunk.to_json(file, orient='records', lines=True)
+            first = False
+            rows += chunk_rows
+    return paths, rows
+
+# Section: Benchmark
+def run_benchmark(total_mb=2048, files=4, products=200, workers=None, keep=None):
+    with tempfile.TemporaryDirectory(dir=keep) as tmp:
+        start = time.perf_counter()
+        # Generated in a child process so it does not count towards the import's peak memory
+        with multiprocessing.Pool(1) as pool:
+            paths, rows = pool.apply(write_synthetic_exports, (tmp, total_mb, files, products))
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print(f"Wrote {rows:,} rows in {len(paths)} files ({size_mb:,.0f} MB) "
+              f"in {time.perf_counter() - start:.0f}s")
+
+        # The ASINs of half the products are tracked under nicknames
+        urls_file = os.path.join(tmp, 'product_urls.json')
+        with open(urls_file, 'w') as file:
+            json.dump({f"tracked-{p}": f"https://www.amazon.com/dp/B{p:09d}" for p in range(0, products, 2)}, file)
+
+        db_name = os.path.join(tmp, 'amazon_tracker.db')
+        csv_file = os.path.join(tmp, 'price_history.csv')
+        start = time.perf_counter()
+        report = import_files(paths, db_name, csv_file, workers=workers, urls_file=urls_file)
+        total = time.perf_counter() - start
+        print_report(report)
+        print(f"Total {total:.0f}s: {report['rows_parsed'] / total:,.0f} rows/s, "
+              f"{size_mb / total:.1f} MB/s end to end")
+
+        conn = sqlite3.connect(db_name)
+        bars = conn.execute('SELECT resolution, COUNT(*), SUM(count) FROM price_bars GROUP BY resolution').fetchall()
+        conn.close()
+        print(f"Bars: {bars}; database {os.path.getsize(db_name) / 1024 / 1024:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a bulk import of generated multi-GB exports.")
+    parser.add_argument('--mb', type=int, default=2048, help="total size of the generated files")
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dir', default=None, help="where to write the files (default: system temp)")
+    args = parser.parse_args()
+    run_benchmark(args.mb, args.files, args.products, args.workers, args.dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tkinter as tk
+
+from product_list import ProductIndex, ProductList
+
+BRANDS = ['Sony', 'Anker', 'Logitech', 'Samsung', 'Apple', 'Bose', 'Lenovo', 'Philips',
+          'Ninja', 'Instant Pot', 'Keurig', 'Dyson', 'JBL', 'Razer', 'Garmin', 'Canon']
+ITEMS = ['Headphones', 'Charger', 'Mouse', 'Keyboard', 'Monitor', 'Speaker', 'Blender',
+         'Air Fryer', 'Coffee Maker', 'Vacuum', 'Webcam', 'Watch', 'Camera', 'Cable', 'Tablet']
+# Typed one character at a time, as in the search box
+QUERIES = ['air fryer', 'sony hea', 'b0042', 'xm4', 'watch 7']
+
+def synthetic_nicknames(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        extra = rng.choice(['', ' XM4', ' Pro', ' Mini', ' 2-Pack', ' Gen 2'])
+        names.add(f"{rng.choice(BRANDS)} {rng.choice(ITEMS)}{extra} B{rng.randrange(10 ** 5):05d}")
+    return sorted(names)
+
+def _ms(func, repeat=5):
+    """Median milliseconds of func()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+# Section: Index
+def bench_index(names):
+    print(f"Index over {len(names):,} products")
+    start = time.perf_counter()
+    index = ProductIndex(names)
+    print(f"  build:                  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    folded = [n.casefold() for n in names]
+    scan = lambda q: [n for n, f in zip(names, folded) if q in f]
+    for query in QUERIES:
+        keystrokes, fresh = [], []
+        for _ in range(5):
+            index.search('')  # clears the narrowing from the previous query
+            for i in range(1, len(query) + 1):
+                keystrokes.append(_ms(lambda: index.search(query[:i]), repeat=1))
+            index.search('')
+            fresh.append(_ms(lambda: index.search(query), repeat=1))
+        print(f"  '{query}': {len(index.search(query)):6,} matches, "
+              f"{statistics.mean(keystrokes):6.2f} ms per keystroke (worst {max(keystrokes):6.2f}), "
+              f"{statistics.median(fresh):6.2f} ms pasted (linear scan {_ms(lambda: scan(query)):6.2f} ms)")
+
+    new = [f"Bench Product {i}" for i in range(1000)]
+    start = time.perf_counter()
+    for name in new:
+        index.add(name)
+    add = (time.perf_counter() - start) * 1000 / len(new)
+    start = time.perf_counter()
+    for name in new:
+        index.remove(name)
+    remove = (time.perf_counter() - start) * 1000 / len(new)
+    print(f"  add one: {add:.3f} ms, remove one: {remove:.3f} ms")
+
+# Section: Widgets
+def bench_widgets(names):
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Widget timings skipped, no display ({e})")
+        return
+    print(f"Widgets with {len(names):,} products")
+
+    # Old Product Manager behavior: reload product_urls.json and reinsert every row
+    with tempfile.TemporaryDirectory() as tmp:
+        urls_file = os.path.join(tmp, 'product_urls.json')
+        with open(urls_file, 'w') as file:
+            json.dump({n: f"https://www.amazon.com/dp/{n[-6:]}" for n in names}, file, indent=4)
+        listbox = tk.Listbox(root, width=50, height=10)
+        listbox.pack()
+
+        def full_refresh():
+            listbox.delete(0, tk.END)
+            with open(urls_file) as file:
+                for nickname in json.load(file):
+                    listbox.insert(tk.END, nickname)
+            root.update()
+        print(f"  Listbox full refresh (old add/delete): {_ms(full_refresh, 3):8.1f} ms")
+        listbox.destroy()
+
+    start = time.perf_counter()
+    widget = ProductList(root, names, width=50, height=10, selectmode='multiple')
+    widget.pack()
+    root.update()
+    print(f"  ProductList build:                     {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    def insert_delete():
+        widget.insert('Bench Product')
+        root.update()
+        widget.delete('Bench Product')
+        root.update()
+    print(f"  ProductList insert + delete:           {_ms(insert_delete, 20):8.2f} ms")
+    print(f"  ProductList scroll one page:           {_ms(lambda: (widget.scroll(10), root.update()), 20):8.2f} ms")
+    for query in QUERIES[:2]:
+        def type_query():
+            widget.search_var.set('')
+            widget._apply_filter()
+            for i in range(1, len(query) + 1):
+                widget.search_var.set(query[:i])
+                widget._apply_filter()
+                root.update()
+        print(f"  ProductList typing '{query}':   {_ms(type_query, 3) / len(query):8.2f} ms per keystroke")
+    root.destroy()
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the product list index and widget at scale.")
+    parser.add_argument('--products', type=int, default=50_000)
+    args = parser.parse_args()
+    names = synthetic_nicknames(args.products)
+    bench_index(names)
+    bench_widgets(names)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import load_history, to_local_datetime
+from retention import compact_history, load_price_series
+
+# Section: Synthetic History
+def write_synthetic_history(csv_file, products=20, days=365, interval_minutes=30, now=None):
+    """Writes a price_history.csv-style file with a random-walk price per product."""
+    now = int(time.time() if now is None else now)
+    steps = days * 24 * 60 // interval_minutes
+    ts = now - (steps - np.arange(steps)) * interval_minutes * 60
+    rng = np.random.default_rng(0)
+    frames = []
+    for p in range(products):
+        # Prices change rarely, like real listings
+        jumps = np.where(rng.random(steps) < 0.02, rng.normal(0, 2, steps), 0.0)
+        prices = np.round(np.maximum(50 + np.cumsum(jumps), 1.0), 2)
+        frames.append(pd.DataFrame({
+            'nickname': f"product-{p}",
+            'title': f"Synthetic Product {p} - Example Listing Title For Benchmarking",
+            'price': prices,
+            'url': f"https://www.amazon.com/Example-Product/dp/B{p:09d}?th=1&psc=1",
+            'ts': ts,
+        }))
+    pd.concat(frames, ignore_index=True).to_csv(csv_file, index=False)
+    return products * steps
+
+def _time(func, repeat=3):
+    """Returns (best seconds, last result) over repeat runs."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def _raw_full_history(csv_file):
+    """The pre-compaction chart load: every raw row, like graph.load_data."""
+    df = load_history(csv_file)
+    df['date'] = to_local_datetime(df['ts'])
+    return df
+
+def _build_figure(df):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(5, 4))
+    for product, product_data in df.groupby('nickname'):
+        ax.plot(product_data['date'], product_data['price'], marker='o', linestyle='-')
+    fig.canvas.draw()
+    plt.close(fig)
+
+# Section: Benchmark
+def run_benchmark(products=20, days=365, interval_minutes=30, plot=False):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, 'price_history.csv')
+        db_name = os.path.join(tmp, 'bench.db')
+        rows = write_synthetic_history(csv_file, products, days, interval_minutes)
+        raw_bytes = os.path.getsize(csv_file)
+
+        raw_seconds, raw_df = _time(lambda: _raw_full_history(csv_file))
+        if plot:
+            raw_plot, _ = _time(lambda: _build_figure(raw_df), repeat=1)
+
+        start = time.perf_counter()
+        summary = compact_history(csv_file, db_name)
+        compact_seconds = time.perf_counter() - start
+        rerun = compact_history(csv_file, db_name)
+
+        # Pages freed by the hourly -> daily rollup are reused by later inserts;
+        # vacuum so the file size reflects the steady-state footprint
+        conn = sqlite3.connect(db_name)
+        conn.execute('VACUUM')
+        conn.close()
+
+        compacted_bytes = os.path.getsize(csv_file) + os.path.getsize(db_name)
+        tiered_seconds, tiered_df = _time(lambda: load_price_series(csv_file=csv_file, db_name=db_name))
+        if plot:
+            tiered_plot, _ = _time(lambda: _build_figure(tiered_df), repeat=1)
+
+    print(f"{products} products x {days} days every {interval_minutes} min = {rows:,} raw rows")
+    print(f"Compaction: {compact_seconds:.2f}s  {summary}")
+    print(f"Second run (idempotency check): {rerun}")
+    print(f"Storage: {raw_bytes / 1e6:.1f} MB raw CSV -> {compacted_bytes / 1e6:.1f} MB "
+          f"(CSV + bars), {raw_bytes / compacted_bytes:.1f}x smaller")
+    print(f"Full-history load: {raw_seconds:.3f}s for {len(raw_df):,} points -> "
+          f"{tiered_seconds:.3f}s for {len(tiered_df):,} points, "
+          f"{raw_seconds / tiered_seconds:.1f}x faster")
+    if plot:
+        print(f"Full-history figure: {raw_plot:.2f}s -> {tiered_plot:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tiered retention storage and chart load times.")
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval-minutes', type=int, default=30)
+    parser.add_argument('--plot', action='store_true', help="also time drawing the full-history figure")
+    args = parser.parse_args()
+    run_benchmark(args.products, args.days, args.interval_minutes, args.plot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_retention import write_synthetic_history
+from history import load_history
+from snapshot import SnapshotReader, publish_snapshot
+
+# Code run in each fresh reader process. It prints the load time and the
+# process's memory after loading as JSON. Rss includes mapped snapshot pages
+# the kernel read ahead; they live in the shared page cache, so Anonymous
+# (private heap) and Pss (shared pages split between processes) are the
+# numbers to compare.
+READER_CODE = r'''
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import numpy as np
+from history import load_history
+from snapshot import SnapshotReader
+imported = time.perf_counter()
+
+def memory():
+    values = {{}}
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                name, _, rest = line.partition(':')
+                if name in ('Rss', 'Pss', 'Anonymous'):
+                    values[name.lower()] = int(rest.split()[0]) / 1024
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    values['peak'] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+csv_file, source, workload = {csv_file!r}, {source!r}, {workload!r}
+if source == 'csv':
+    df = load_history(csv_file, expand=True)
+    if workload == 'recent':
+        df = df[df['ts'] >= df['ts'].max() - 48 * 3600]
+    result = float(df['price'].sum())
+else:
+    snapshot = SnapshotReader(csv_file).fresh()
+    if workload == 'recent':
+        df = snapshot.frame(start=snapshot.manifest['max_ts'] - 48 * 3600)
+        result = float(df['price'].sum())
+    else:
+        result = float(np.sum(snapshot.price))
+loaded = time.perf_counter()
+print(json.dumps(dict(memory(), imports=imported - start, load=loaded - imported, result=result)))
+sys.stdout.flush()
+time.sleep({hold})
+'''
+
+# Section: Reader Processes
+def run_readers(csv_file, source, workload, count=1, hold=0.0):
+    """Starts `count` reader processes at once; returns their JSON reports and wall time to ready."""
+    code = READER_CODE.format(repo=os.path.dirname(os.path.abspath(__file__)), csv_file=csv_file,
+                              source=source, workload=workload, hold=hold)
+    start = time.perf_counter()
+    procs = [subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True)
+             for _ in range(count)]
+    # Readers hold their data until all have reported, so PSS shows the sharing
+    reports = [json.loads(proc.stdout.readline()) for proc in procs]
+    ready = time.perf_counter() - start
+    for proc in procs:
+        proc.wait()
+    return reports, ready
+
+# Section: Benchmark
+def run_benchmark(products=50, days=365, interval_minutes=30, readers=4):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, 'price_history.csv')
+        rows = write_synthetic_history(csv_file, products, days, interval_minutes)
+        start = time.perf_counter()
+        publish_snapshot(load_history(csv_file), csv_file)
+        publish_seconds = time.perf_counter() - start
+        csv_mb = os.path.getsize(csv_file) / 1024 / 1024
+        print(f"{rows:,} observations, {products} products; CSV {csv_mb:.1f} MB, "
+              f"snapshot published in {publish_seconds:.2f}s")
+
+        reader = SnapshotReader(csv_file)
+        reader.current()
+        checks = 1000
+        start = time.perf_counter()
+        for _ in range(checks):
+            reader.current()
+        print(f"Version check (snapshot unchanged): {(time.perf_counter() - start) / checks * 1e6:.0f} us")
+
+        print(f"{'source':<9} {'workload':<8} {'load s':>7} {'peak MB':>8} {'RSS MB':>7} {'anon MB':>8}   "
+              f"{readers} concurrent readers: {'ready s':>7} {'total PSS MB':>12}")
+        for workload in ('recent', 'full'):
+            for source in ('csv', 'snapshot'):
+                (single,), _ = run_readers(csv_file, source, workload)
+                many, ready = run_readers(csv_file, source, workload, readers, hold=1.0)
+                total_pss = sum(report.get('pss', float('nan')) for report in many)
+                print(f"{source:<9} {workload:<8} {single['load']:>7.3f} {single.get('peak', float('nan')):>8.1f} {single.get('rss', float('nan')):>7.1f} "
+                      f"{single.get('anonymous', float('nan')):>8.1f}   {'':>22}{ready:>7.2f} {total_pss:>12.1f}")
+        print("'recent' builds the 48h DataFrame graph.py plots; 'full' sums every price.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reader startup and memory: CSV vs mapped snapshot.")
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--interval-minutes', type=int, default=30)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+    run_benchmark(args.products, args.days, args.interval_minutes, args.readers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import rebuild_summary
+from generate_data import ASIN_PATTERN, URLS_FILE
+from history import (compress_runs, expand_runs, history_is_current, history_lock, is_run_length, load_history,
+                     localize_naive, save_history)
+from retention import (DAY, HOUR, HOURLY_RETENTION_DAYS, RAW_RETENTION_DAYS, check_retention, initialize_bars_table,
+                       ohlc_bars, replace_bars)
+from profiling import add_profile_argument, profile_mode, rss_mb, run_profiled
+from snapshot import publish_snapshot
+
+###############################################################################
+# BULK IMPORT / BACKFILL
+#
+# Files are parsed in worker processes, one file at a time per worker, in
+# chunks of chunk_rows. Normalized chunks come back through a bounded queue
+# and the main process inserts them into a scratch SQLite table whose
+# primary key (nickname, ts) is the dedupe index, committing every
+# commit_rows rows. The existing history's keys are loaded into it first, so
+# observations that are already stored are skipped.
+#
+# Finally, rows older than the raw retention window become hourly/daily OHLC
+# bars (retention.py) and newer rows are merged into price_history.csv.
+# Buckets that already have a bar, or still have raw rows waiting for compaction,
+# are left alone: the tracker's own data wins.
+###############################################################################
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_COMMIT_ROWS = 500_000
+# Chunks waiting for the writer; bounds memory when parsing outruns SQLite
+QUEUE_CHUNKS = 4
+
+# Accepted column names per field, compared lowercase with non-alphanumerics removed
+COLUMN_ALIASES = {
+    'nickname': ('nickname', 'product', 'productname', 'name', 'item'),
+    'asin': ('asin', 'productid', 'sku'),
+    'title': ('title', 'producttitle', 'description'),
+    'price': ('price', 'amount', 'value', 'priceusd', 'saleprice'),
+    'url': ('url', 'link', 'producturl'),
+    'ts': ('ts', 'timestamp', 'epoch', 'datetime', 'date', 'time', 'observedat', 'recordedat'),
+}
+SUPPORTED_EXTENSIONS = ('.csv', '.tsv', '.txt', '.gz', '.json', '.jsonl', '.ndjson', '.xlsx', '.xlsm')
+
+# Section: Reading Files in Chunks
+def _xlsx_chunks(path, chunk_rows, sheet=None):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Reading .xlsx files requires openpyxl (pip install openpyxl)")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(name) if name is not None else f"column_{i}" for i, name in enumerate(next(rows, []))]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def _json_chunks(path, chunk_rows):
+    """JSON Lines files are streamed; a JSON array (or an object holding one) is read whole."""
+    if path.endswith(('.jsonl', '.ndjson')):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False)
+        return
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    for start in range(0, len(data), chunk_rows):
+        yield pd.DataFrame(data[start:start + chunk_rows])
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, sheet=None):
+    """Yields the rows of a CSV/TSV, JSON/JSON Lines or XLSX file as DataFrames of up to chunk_rows."""
+    lower = path.lower()
+    if lower.endswith(('.xlsx', '.xlsm')):
+        yield from _xlsx_chunks(path, chunk_rows, sheet)
+    elif lower.endswith(('.json', '.jsonl', '.ndjson')):
+        yield from _json_chunks(path, chunk_rows)
+    else:
+        sep = '\t' if lower.endswith(('.tsv', '.tsv.gz')) else ','
+        yield from pd.read_csv(path, sep=sep, chunksize=chunk_rows)
+
+# Section: Normalizing Rows
+def _key(name):
+    return re.sub(r'[^0-9a-z]', '', str(name).lower())
+
+def resolve_columns(columns, overrides=None):
+    """
+    Maps the fields nickname/asin/title/price/url/ts to source column names.
+    overrides ({field: column}) win over the aliases. A legacy pair of
+    date_only/time_only columns is recognised as the timestamp.
+    """
+    by_key = {_key(column): column for column in columns}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in by_key:
+                mapping[field] = by_key[alias]
+                break
+    if 'dateonly' in by_key:
+        mapping['ts'] = (by_key['dateonly'], by_key.get('timeonly'))
+    mapping.update(overrides or {})
+
+    missing = [field for field in ('price', 'ts') if field not in mapping]
+    if not any(field in mapping for field in ('nickname', 'asin', 'url')):
+        missing.append('nickname, asin or url')
+    if missing:
+        raise ValueError(f"No column for {', '.join(missing)} in {list(columns)}")
+    return mapping
+
+def _looks_numeric(values):
+    if pd.api.types.is_numeric_dtype(values):
+        return True
+    # Deciding from a sample keeps failed conversions of whole date columns cheap
+    sample = values.dropna().head(100)
+    return len(sample) > 0 and pd.to_numeric(sample, errors='coerce').notna().mean() > 0.9
+
+def _to_epoch_seconds(values):
+    """Epoch seconds/milliseconds or date strings/objects -> epoch seconds as floats (NaN if unparseable)."""
+    if _looks_numeric(values):
+        numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+        # Values above ~5138 AD in seconds can only be milliseconds
+        return np.where(np.abs(numeric) > 1e11, numeric // 1000, numeric)
+
+    dates = pd.to_datetime(values, errors='coerce')
+    if dates.dtype == object:
+        # Mixed UTC offsets
+        dates = pd.to_datetime(values, errors='coerce', utc=True)
+    if dates.dt.tz is None:
+        # Naive times are local, like the tracker's own legacy date strings
+        dates = localize_naive(dates)
+    seconds = (dates - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    return seconds.astype('float64').to_numpy()
+
+def _to_prices(values):
+    """Numbers or strings such as "$1,299.00" -> floats (NaN if unparseable)."""
+    if not _looks_numeric(values):
+        values = values.astype(str).str.replace(r'[^\d.\-]', '', regex=True)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+def normalize_chunk(df, mapping, product_index):
+    """
+    Returns (rows, details, rejected): a DataFrame of nickname, price and ts,
+    {nickname: (title, url)} from the chunk's last row per product, and the
+    number of unusable rows. Products are named by the nickname column, else
+    by the nickname product_index ({ASIN: nickname}) gives the row's ASIN,
+    else by the ASIN itself.
+    """
+    n = len(df)
+    missing = pd.Series(np.full(n, None, dtype=object), index=df.index)
+
+    urls = df[mapping['url']].astype(object) if 'url' in mapping else missing
+    if 'asin' in mapping:
+        asins = df[mapping['asin']].astype(object)
+    else:
+        asins = urls.astype(str).str.extract(ASIN_PATTERN, expand=False).astype(object)
+    asins = asins.where(asins.notna(), None)
+    nicknames = df[mapping['nickname']].astype(object) if 'nickname' in mapping else missing
+    nicknames = nicknames.where(nicknames.notna(), asins.map(product_index))
+    nicknames = nicknames.where(nicknames.notna(), asins)
+
+    prices = _to_prices(df[mapping['price']])
+    ts_field = mapping['ts']
+    if isinstance(ts_field, tuple):
+        date_col, time_col = ts_field
+        ts = _to_epoch_seconds(df[date_col].astype(str) + ' ' +
+                               (df[time_col].astype(str) if time_col else '00:00:00'))
+    else:
+        ts = _to_epoch_seconds(df[ts_field])
+
+    valid = nicknames.notna().to_numpy() & (prices > 0) & np.isfinite(ts)
+    rows = pd.DataFrame({'nickname': nicknames[valid].astype(str).to_numpy(dtype=object),
+                         'price': prices[valid], 'ts': ts[valid].astype(np.int64)})
+
+    # Titles and URLs are kept per product, not per row
+    info = pd.DataFrame({'nickname': rows['nickname'],
+                         'title': (df[mapping['title']].astype(object) if 'title' in mapping else missing)[valid].to_numpy(),
+                         'url': urls[valid].to_numpy(), 'asin': asins[valid].to_numpy()})
+    details = {}
+    for row in info.drop_duplicates('nickname', keep='last').itertuples(index=False):
+        url = row.url if pd.notna(row.url) else None
+        if url is None and pd.notna(row.asin):
+            url = f"https://www.amazon.com/dp/{row.asin}"
+        details[row.nickname] = (str(row.title) if pd.notna(row.title) else None, url)
+    return rows, details, int(n - valid.sum())
+
+def load_product_index(urls_file=URLS_FILE):
+    """{ASIN: nickname} for the tracked products, so imported ASINs reuse their nicknames."""
+    try:
+        with open(urls_file) as file:
+            product_urls = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    index = {}
+    for nickname, url in product_urls.items():
+        match = ASIN_PATTERN.search(url)
+        if match:
+            index[match.group(1)] = nickname
+    return index
+
+# Section: Parser Processes
+def _parse_worker(files, results, options):
+    """Parses files from the task queue until it yields None, sending normalized chunks to results."""
+    while True:
+        path = files.get()
+        if path is None:
+            break
+        try:
+            mapping = None
+            for chunk in read_chunks(path, options['chunk_rows'], options.get('sheet')):
+                if chunk.empty:
+                    continue
+                if mapping is None:
+                    mapping = resolve_columns(chunk.columns, options.get('overrides'))
+                rows, details, rejected = normalize_chunk(chunk, mapping, options['product_index'])
+                # Key order keeps the writer's inserts into the dedupe index local
+                rows = rows.sort_values(['nickname', 'ts'], kind='stable')
+                results.put(('rows', path, (rows, details, rejected)))
+            results.put(('file', path, None))
+        except Exception as e:
+            results.put(('error', path, f"{type(e).__name__}: {e}"))
+    results.put(('worker', None, rss_mb(peak=True)))
+
+# Section: Staging Table
+def _open_staging(path):
+    conn = sqlite3.connect(path)
+    # Scratch data: an interrupted import is simply run again
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -65536')
+    conn.execute('''
+        CREATE TABLE staged (
+            nickname TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            price REAL NOT NULL,
+            existing INTEGER NOT NULL,
+            PRIMARY KEY (nickname, ts)
+        ) WITHOUT ROWID
+    ''')
+    return conn
+
+def _stage(conn, df, existing=0):
+    """INSERT OR IGNOREs rows into the staging table; the first copy of a key wins."""
+    conn.executemany(f'INSERT OR IGNORE INTO staged VALUES (?, ?, ?, {int(existing)})',
+                     zip(df['nickname'].tolist(), df['ts'].tolist(), df['price'].tolist()))
+
+# Section: Import
+def import_files(paths, db_name='amazon_tracker.db', csv_file='price_history.csv', workers=None,
+                 chunk_rows=DEFAULT_CHUNK_ROWS, commit_rows=DEFAULT_COMMIT_ROWS, overrides=None,
+                 urls_file=URLS_FILE, sheet=None, raw_days=RAW_RETENTION_DAYS,
+                 hourly_days=HOURLY_RETENTION_DAYS, now=None):
+    """
+    Imports price observations from CSV/TSV, JSON/JSON Lines and XLSX files.
+    overrides maps fields (nickname, asin, title, price, url, ts) to column
+    names the aliases do not recognise. When files overlap, which copy of a
+    duplicate observation is kept depends on parsing order. raw_days must
+    be less than hourly_days (ValueError otherwise). Returns a dictionary of
+    counts, timings and peak memory.
+    """
+    check_retention(raw_days, hourly_days)
+    now = int(time.time() if now is None else now)
+    raw_cutoff = (now - raw_days * DAY) // HOUR * HOUR
+    hourly_cutoff = (now - hourly_days * DAY) // DAY * DAY
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    report = {'files': len(paths), 'rows_parsed': 0, 'rows_rejected': 0, 'rows_new': 0, 'errors': {}}
+    details = {}
+
+    scratch = tempfile.mkdtemp(prefix='import-', dir=os.path.dirname(os.path.abspath(db_name)))
+    staging = _open_staging(os.path.join(scratch, 'staging.db'))
+    try:
+        # Keys already in the raw history take precedence over imported rows
+        existing_df = load_history(csv_file)
+        existing_rows = expand_runs(existing_df)
+        if not existing_rows.empty:
+            _stage(staging, existing_rows.dropna(subset=['nickname', 'price']), existing=1)
+            staging.commit()
+
+        started = time.perf_counter()
+        files = multiprocessing.Queue()
+        for path in list(paths) + [None] * workers:
+            files.put(path)
+        results = multiprocessing.Queue(maxsize=QUEUE_CHUNKS)
+        options = {'chunk_rows': chunk_rows, 'overrides': overrides, 'sheet': sheet,
+                   'product_index': load_product_index(urls_file)}
+        procs = [multiprocessing.Process(target=_parse_worker, args=(files, results, options), daemon=True)
+                 for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+
+        finished, uncommitted, worker_peaks, file_rows = 0, 0, [], {}
+        while finished < workers:
+            try:
+                kind, path, payload = results.get(timeout=5)
+            except queue.Empty:
+                if not any(proc.is_alive() for proc in procs):
+                    print("Parser processes exited unexpectedly.")
+                    break
+                continue
+            if kind == 'rows':
+                rows, chunk_details, rejected = payload
+                details.update(chunk_details)
+                report['rows_parsed'] += len(rows)
+                report['rows_rejected'] += rejected
+                file_rows[path] = file_rows.get(path, 0) + len(rows)
+                _stage(staging, rows)
+                uncommitted += len(rows)
+                if uncommitted >= commit_rows:
+                    staging.commit()
+                    uncommitted = 0
+            elif kind == 'file':
+                print(f"Parsed {path}: {file_rows.get(path, 0):,} rows")
+            elif kind == 'error':
+                report['errors'][path] = payload
+                print(f"Error importing {path} after {file_rows.get(path, 0):,} rows: {payload}")
+            else:
+                worker_peaks.append(payload)
+                finished += 1
+        staging.commit()
+        for proc in procs:
+            proc.join()
+        report['parse_seconds'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report.update(_store_old_rows(staging, db_name, raw_cutoff, hourly_cutoff, commit_rows))
+        recent = pd.read_sql_query('SELECT nickname, price, ts FROM staged WHERE existing = 0 AND ts >= ? '
+                                   'ORDER BY nickname, ts', staging, params=(raw_cutoff,))
+    finally:
+        staging.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # Recent rows join the raw history; change-only files stay change-only.
+    # A fetch cycle that rewrote the CSV during the import is merged, not lost.
+    with history_lock(csv_file):
+        if not history_is_current(existing_df, csv_file):
+            existing_df = load_history(csv_file)
+            existing_rows = expand_runs(existing_df)
+            if not recent.empty and not existing_rows.empty:
+                seen = pd.MultiIndex.from_frame(existing_rows[['nickname', 'ts']])
+                recent = recent[~pd.MultiIndex.from_frame(recent[['nickname', 'ts']]).isin(seen)]
+        history_df = existing_df
+        if not recent.empty:
+            # Title and URL: the ones already in the history, else the import's
+            known = existing_rows.dropna(subset=['nickname']).drop_duplicates('nickname', keep='last')
+            known = {row.nickname: (row.title, row.url) for row in known.itertuples(index=False)}
+            for nickname, (title, url) in details.items():
+                old_title, old_url = known.get(nickname, (None, None))
+                known[nickname] = (old_title if pd.notna(old_title) else title, old_url if pd.notna(old_url) else url)
+            recent.insert(1, 'title', recent['nickname'].map(lambda nick: known.get(nick, (None, None))[0]))
+            recent.insert(3, 'url', recent['nickname'].map(lambda nick: known.get(nick, (None, None))[1]))
+            if is_run_length(existing_df):
+                history_df = compress_runs(pd.concat([existing_rows, recent], ignore_index=True))
+            else:
+                history_df = pd.concat([existing_df, recent], ignore_index=True)
+            save_history(history_df, csv_file)
+            publish_snapshot(history_df, csv_file)
+    report['raw_rows_added'] = len(recent)
+    # Counted after the split, so rows skipped for existing bars or raw rows are not new
+    report['rows_new'] = report.get('bar_rows', 0) + len(recent)
+    rebuild_summary(expand_runs(history_df), db_name)
+    report['store_seconds'] = time.perf_counter() - started
+    report['peak_mb'] = rss_mb(peak=True)
+    report['worker_peak_mb'] = max(worker_peaks) if worker_peaks else float('nan')
+    return report
+
+def _store_old_rows(staging, db_name, raw_cutoff, hourly_cutoff, commit_rows):
+    """
+    Writes staged rows older than raw_cutoff as bars, one product at a time:
+    hourly bars down to hourly_cutoff and daily bars before it, the same bars
+    compaction would produce. Hours and days that already have bars are
+    skipped, and so are hours that still have raw rows in the CSV, since
+    compaction would replace an imported bar with one built from those rows
+    alone. For daily bars, a day also counts as taken if it has hourly bars
+    or raw rows that the next compaction will roll up.
+    """
+    store = sqlite3.connect(db_name, timeout=30)
+    initialize_bars_table(store)
+
+    counts = {'bar_rows': 0, 'rows_in_existing_bars': 0, 'hourly_bars_written': 0, 'daily_bars_written': 0}
+    nicknames = [row[0] for row in staging.execute(
+        'SELECT DISTINCT nickname FROM staged WHERE existing = 0 AND ts < ?', (raw_cutoff,))]
+    pending = 0
+    for nickname in nicknames:
+        old = pd.read_sql_query('SELECT ts, price FROM staged WHERE existing = 0 AND nickname = ? AND ts < ? '
+                                'ORDER BY ts', staging, params=(nickname, raw_cutoff))
+        stored = pd.read_sql_query('SELECT resolution, bucket_start FROM price_bars WHERE nickname = ?',
+                                   store, params=(nickname,))
+        ts = old['ts'].to_numpy(dtype=np.int64)
+        prices = old['price'].to_numpy(dtype=np.float64)
+        raw_hours = [row[0] for row in staging.execute(
+            'SELECT DISTINCT ts - ts % ? FROM staged WHERE existing = 1 AND nickname = ? AND ts < ?',
+            (HOUR, nickname, raw_cutoff))]
+        hours = np.union1d(stored.loc[stored['resolution'] == 'hour', 'bucket_start'].to_numpy(dtype=np.int64),
+                           np.array(raw_hours, dtype=np.int64))
+        days = stored.loc[stored['resolution'] == 'day', 'bucket_start'].to_numpy(dtype=np.int64)
+        # Rows for daily bars also skip days whose hours will be rolled up
+        taken = np.where(ts >= hourly_cutoff, np.isin(ts - ts % HOUR, hours),
+                         np.isin(ts - ts % DAY, hours - hours % DAY))
+        new = ~taken & ~np.isin(ts - ts % DAY, days)
+        counts['rows_in_existing_bars'] += int(len(ts) - new.sum())
+        counts['bar_rows'] += int(new.sum())
+
+        for resolution, bucket_seconds, selected, key in (
+                ('hour', HOUR, new & (ts >= hourly_cutoff), 'hourly_bars_written'),
+                ('day', DAY, new & (ts < hourly_cutoff), 'daily_bars_written')):
+            if selected.any():
+                bars = ohlc_bars(np.full(int(selected.sum()), nickname, dtype=object), ts[selected],
+                             prices[selected], bucket_seconds)
+                replace_bars(store, bars, resolution)
+                counts[key] += len(bars)
+                pending += len(bars)
+        if pending >= commit_rows:
+            store.commit()
+            pending = 0
+    store.commit()
+    store.close()
+    return counts
+
+def print_report(report):
+    parse_seconds = report.get('parse_seconds', 0) or float('nan')
+    print(f"Parsed {report['rows_parsed']:,} rows from {report['files']} file(s) in {parse_seconds:.1f}s "
+          f"({report['rows_parsed'] / parse_seconds:,.0f} rows/s); {report['rows_rejected']:,} rejected.")
+    print(f"New observations: {report['rows_new']:,} "
+          f"({report['rows_parsed'] - report['rows_new']:,} duplicates or already stored).")
+    print(f"Stored {report.get('bar_rows', 0):,} old rows as {report.get('hourly_bars_written', 0):,} hourly and "
+          f"{report.get('daily_bars_written', 0):,} daily bars, skipped "
+          f"{report.get('rows_in_existing_bars', 0):,} in already stored bars, and added "
+          f"{report.get('raw_rows_added', 0):,} recent rows to the raw history "
+          f"in {report.get('store_seconds', 0):.1f}s.")
+    print(f"Peak memory: {report['peak_mb']:.0f} MB (writer), {report['worker_peak_mb']:.0f} MB (largest parser).")
+    if report['errors']:
+        print(f"{len(report['errors'])} file(s) failed; see the errors above.")
+
+def parse_column_map(pairs):
+    """['price=Sale Price', ...] from --map -> {'price': 'Sale Price', ...}"""
+    overrides = {}
+    for pair in pairs or []:
+        field, _, column = pair.partition('=')
+        if field not in COLUMN_ALIASES or not column:
+            raise SystemExit(f"--map expects FIELD=COLUMN with FIELD in {', '.join(COLUMN_ALIASES)}")
+        overrides[field] = column
+    return overrides
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import price history from CSV, JSON or XLSX files.")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--db', default='amazon_tracker.db')
+    parser.add_argument('--csv', default='price_history.csv')
+    parser.add_argument('--urls', default=URLS_FILE, help="product list used to map ASINs to nicknames")
+    parser.add_argument('--workers', type=int, default=None, help="parser processes (default: CPUs)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--commit-rows', type=int, default=DEFAULT_COMMIT_ROWS)
+    parser.add_argument('--sheet', default=None, help="XLSX sheet name (default: the first sheet)")
+    parser.add_argument('--map', action='append', metavar='FIELD=COLUMN',
+                        help="use COLUMN for FIELD (nickname, asin, title, price, url, ts)")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    unsupported = [path for path in args.files if not path.lower().endswith(SUPPORTED_EXTENSIONS)]
+    if unsupported:
+        raise SystemExit(f"Unsupported file type: {', '.join(unsupported)}")
+    report = import_files(args.files, args.db, args.csv, args.workers, args.chunk_rows, args.commit_rows,
+                          parse_column_map(args.map), args.urls, args.sheet)
+    print_report(report)
+    return 1 if report['errors'] else 0
+
+if __name__ == "__main__":
+    sys.exit(run_profiled('bulk_import', main, mode=profile_mode()))
@@ -0,0 +1,68 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+from generate_data import parse_product_page
+
+# Saved product pages and the output parse_product_page should give for each
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'offers')
+
+# Section: Run Fixtures
+def parse_fixture(html_file):
+    """Parses one saved page; returns title, price and offers (or None), without the URL."""
+    with open(html_file, 'rb') as page:
+        content = page.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = parse_product_page(content, html_file)
+    if result is None:
+        return None
+    return {'title': result['title'], 'price': result['price'], 'offers': result['offers']}
+
+def check_fixtures(fixtures_dir=FIXTURES_DIR, update=False):
+    """
+    Compares every <name>.html with <name>.json. With update=True the
+    expected files are rewritten from the current parser instead.
+    Returns the number of mismatches.
+    """
+    failures = 0
+    for name in sorted(os.listdir(fixtures_dir)):
+        if not name.endswith('.html'):
+            continue
+        html_file = os.path.join(fixtures_dir, name)
+        expected_file = html_file[:-len('.html')] + '.json'
+        actual = parse_fixture(html_file)
+
+        if update:
+            with open(expected_file, 'w') as file:
+                json.dump(actual, file, indent=2, sort_keys=True)
+                file.write('\n')
+            print(f"UPDATED {name}")
+            continue
+
+        try:
+            with open(expected_file) as file:
+                expected = json.load(file)
+        except FileNotFoundError:
+            print(f"MISSING {name}: no {os.path.basename(expected_file)}")
+            failures += 1
+            continue
+        if actual == expected:
+            print(f"ok      {name}")
+        else:
+            print(f"FAIL    {name}\n  expected: {expected}\n  actual:   {actual}")
+            failures += 1
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the page parser against saved product pages.")
+    parser.add_argument('--dir', default=FIXTURES_DIR)
+    parser.add_argument('--update', action='store_true', help="rewrite the expected outputs")
+    args = parser.parse_args()
+    failures = check_fixtures(args.dir, args.update)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 import pandas as pd
 import sqlite3
+from history import atomic_write, load_history, to_local_datetime
+from profiling import profile_mode, run_profiled
 
 def clean_price_data_tableau(
     input_csv='price_history.csv',
@@ -7,16 +9,16 @@ def clean_price_data_tableau(
 ):
     """
     Reads price_history.csv, cleans data in an in-memory SQLite database,
-    merges date_only & time_only into a single 'timestamp' column,
+    converts the epoch 'ts' column into a local 'timestamp' column,
     and writes a single sheet 'Master' (plus optionally 'ByTimestamp') for Tableau.
     """
 
     # 1. Load raw CSV
     try:
-        df = pd.read_csv(input_csv)
-    except FileNotFoundError:
-        print(f"Error: The file '{input_csv}' was not found.")
-        return
+        df = load_history(input_csv, expand=True)
+        if df.empty:
+            print(f"Error: The file '{input_csv}' was not found or is empty.")
+            return
     except Exception as e:
         print(f"Error reading {input_csv}: {e}")
         return
@@ -41,39 +43,19 @@ def clean_price_data_tableau(
         WHERE rowid NOT IN (
             SELECT MIN(rowid)
             FROM price_history
-            GROUP BY nickname, title, price, url, date_only, time_only
+            GROUP BY nickname, title, price, url, ts
         )
     """)
 
     df_clean = pd.read_sql_query("SELECT * FROM price_history", conn)
     conn.close()
 
-    # 3. Combine date_only + time_only into a single 'timestamp' column
-    #    If you only have date_only, skip this step. If you only have date/time in one column, skip too.
-    if 'date_only' in df_clean.columns:
-        # Convert to datetime
-        df_clean['date_only'] = pd.to_datetime(df_clean['date_only'], errors='coerce')
-
-    if 'time_only' in df_clean.columns:
-        # If time_only is a string like 'HH:MM:SS', convert to timedelta
-        # or parse it as a time. Example approach:
-        df_clean['time_only'] = pd.to_timedelta(df_clean['time_only'].astype(str), errors='coerce')
-    else:
-        df_clean['time_only'] = pd.to_timedelta(0)  # if missing, just 0
-
-    # Now create a combined 'timestamp'
-    # If date_only is a full date and time_only is a timedelta, we can add them:
-    df_clean['timestamp'] = df_clean['date_only'] + df_clean['time_only']
+    # 3. Convert epoch seconds into a local 'timestamp' column for Tableau
+    #    (a numeric conversion; no date strings are parsed)
+    df_clean['timestamp'] = to_local_datetime(df_clean['ts'])
+    df_clean.drop(columns=['ts'], inplace=True)
 
-    # 4. Drop the old columns if you like
-    columns_to_drop = []
-    if 'date_only' in df_clean.columns:
-        columns_to_drop.append('date_only')
-    if 'time_only' in df_clean.columns:
-        columns_to_drop.append('time_only')
-    df_clean.drop(columns=columns_to_drop, inplace=True)
-
-    # 5. (Optional) Reorder or rename columns for clarity
+    # 4. (Optional) Reorder or rename columns for clarity
     #    Example: rename columns to simpler ones for Tableau
     rename_map = {
         'nickname': 'Product',
@@ -84,18 +66,19 @@ def clean_price_data_tableau(
     }
     df_clean.rename(columns=rename_map, inplace=True)
 
-    # 6. Sort the final DataFrame by Timestamp ascending for the Master sheet
+    # 5. Sort the final DataFrame by Timestamp ascending for the Master sheet
     if 'Timestamp' in df_clean.columns:
         df_clean = df_clean.sort_values(by=['Timestamp'])
 
-    # 7. Optionally create a "ByTimestamp" version sorted descending
+    # 6. Optionally create a "ByTimestamp" version sorted descending
     df_by_ts = df_clean.copy()
     if 'Timestamp' in df_by_ts.columns:
         df_by_ts = df_by_ts.sort_values(by=['Timestamp'], ascending=False)
 
-    # 8. Write to Excel with only numeric Price
+    # 7. Write to Excel with only numeric Price
     #    We'll skip special currency formatting so Tableau sees it as a measure
-    with pd.ExcelWriter(output_excel, engine='xlsxwriter') as writer:
+    #    (written to a temporary file and renamed, so Tableau never opens half a workbook)
+    with atomic_write(output_excel, 'wb') as file, pd.ExcelWriter(file, engine='xlsxwriter') as writer:
         # Master sheet
         df_clean.to_excel(writer, sheet_name='Master', index=False)
 
@@ -103,4 +86,7 @@ def clean_price_data_tableau(
         df_by_ts.to_excel(writer, sheet_name='ByTimestamp', index=False)
 
     print(f"Created '{output_excel}' for Tableau with sheets 'Master' and 'ByTimestamp'.")
-    print("Contains a combined 'Timestamp' column instead of date_only/time_only, and a numeric 'Price'.")
+    print("Contains a 'Timestamp' column converted from the epoch 'ts' column, and a numeric 'Price'.")
+
+if __name__ == "__main__":
+    run_profiled('clean_data', clean_price_data_tableau, mode=profile_mode())
@@ -0,0 +1,131 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+
+import requests
+
+from profiling import add_profile_argument, profile_mode, run_profiled
+from generate_data import (HEADERS, export_price_history, fetch_amazon_data,
+                           initialize_database, load_product_urls, new_cycle_id)
+from work_queue import (DEFAULT_LEASE_SECONDS, claim_batch, complete_batch,
+                        connect_queue, enqueue_products, initialize_queue,
+                        queue_counts, queue_drained)
+
+# How long an idle worker waits before asking the queue again
+POLL_INTERVAL = 0.5
+
+# Section: Worker
+def run_worker(worker_id=None, db_name='amazon_tracker.db', batch_size=10,
+               lease_seconds=DEFAULT_LEASE_SECONDS, headers=HEADERS):
+    """
+    Claims batches from the work queue, fetches and parses each product, and
+    commits the results together with the lease release. Exits once the queue
+    is drained. Any number of workers on the machine that holds the
+    database file can run at the same time (see work_queue.connect_queue).
+    Returns the number of observations this worker stored.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect_queue(db_name)
+    session = requests.Session()
+    stored = 0
+
+    while True:
+        batch = claim_batch(conn, worker_id, batch_size, lease_seconds)
+        if not batch:
+            if queue_drained(conn):
+                break
+            # Other workers hold the remaining leases; wait in case they expire
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        results, failures = [], []
+        for queue_id, nickname, url in batch:
+            try:
+                product_data = fetch_amazon_data(url, headers, session=session)
+                if product_data is None:
+                    failures.append((queue_id, "no valid price"))
+                    continue
+                product_data['ts'] = int(time.time())
+                results.append((queue_id, nickname, product_data))
+            except Exception as e:
+                failures.append((queue_id, e))
+
+        stored += complete_batch(conn, worker_id, results, failures)
+
+    session.close()
+    conn.close()
+    return stored
+
+def _worker_process(worker_id, db_name, batch_size, lease_seconds):
+    """Entry point for worker processes started by the coordinator."""
+    stored = run_worker(worker_id, db_name, batch_size, lease_seconds)
+    print(f"Worker {worker_id} stored {stored} observation(s).")
+
+# Section: Coordinator
+def run_coordinator(num_workers=None, product_urls=None, db_name='amazon_tracker.db',
+                    csv_file='price_history.csv', batch_size=10,
+                    lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Runs one sharded crawl cycle:
+    1. Initializes the database and queues every due product.
+    2. Starts num_workers worker processes and waits for the queue to drain.
+    3. Merges the stored rows into the price history CSV.
+    Returns the queue counts by status at the end of the cycle.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    if product_urls is None:
+        product_urls = load_product_urls()
+
+    initialize_database(db_name)
+    initialize_queue(db_name)
+    cycle = new_cycle_id()
+    enqueue_products(product_urls, db_name, cycle)
+
+    workers = []
+    for i in range(num_workers):
+        worker_id = f"{socket.gethostname()}:worker-{i}"
+        process = multiprocessing.Process(target=_worker_process,
+                                          args=(worker_id, db_name, batch_size, lease_seconds))
+        process.start()
+        workers.append(process)
+
+    for process in workers:
+        process.join()
+
+    # A worker that died mid-batch leaves leases behind; finish them here
+    conn = connect_queue(db_name)
+    if not queue_drained(conn):
+        print("Some workers exited early; retrying their expired leases...")
+        run_worker(f"{socket.gethostname()}:coordinator", db_name, batch_size, lease_seconds)
+    counts = queue_counts(conn)
+    conn.close()
+
+    if csv_file:
+        export_price_history(db_name, csv_file, cycle=cycle)
+    print(f"Crawl cycle finished: {counts}")
+    return counts
+
+# Section: Command Line
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process price crawler.")
+    parser.add_argument('mode', choices=['coordinator', 'worker'], nargs='?', default='coordinator',
+                        help="'coordinator' runs a full cycle; 'worker' only drains an existing queue")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument('--db', default='amazon_tracker.db')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.mode == 'worker':
+        stored = run_worker(db_name=args.db, batch_size=args.batch_size,
+                            lease_seconds=args.lease_seconds)
+        print(f"Worker stored {stored} observation(s).")
+    else:
+        run_coordinator(args.workers, db_name=args.db, batch_size=args.batch_size,
+                        lease_seconds=args.lease_seconds)
+
+if __name__ == "__main__":
+    run_profiled('crawler', main, mode=profile_mode())
@@ -0,0 +1,124 @@
+import os
+import signal
+import sqlite3
+import threading
+import time
+
+import requests
+
+from generate_data import HEADERS, REQUEST_TIMEOUT, URLS_FILE, load_product_urls, run_fetch_cycle
+from history import file_stamp
+from profiling import rss_mb
+
+# Default time between fetch cycles (seconds)
+DEFAULT_INTERVAL = 3600
+
+###############################################################################
+# HEADLESS TRACKER DAEMON
+#
+# This module must stay importable without a display: never import tkinter,
+# matplotlib or seaborn here or in anything it imports.
+###############################################################################
+class TrackerDaemon:
+    """
+    Runs fetch cycles on a fixed interval without a GUI.
+
+    State that is expensive to rebuild is kept across cycles: the HTTP
+    session (keep-alive connections to Amazon), the SQLite connection, the
+    parsed product list (reloaded only when product_urls.json changes) and
+    the in-memory price history (reused while price_history.csv is unchanged
+    on disk). SIGTERM and SIGINT stop fetching, save what the current cycle
+    already fetched and exit cleanly. request_timeout is the (connect, read)
+    timeout of every page fetch, so one hung connection cannot stall a cycle.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, urls_file=URLS_FILE,
+                 db_name='amazon_tracker.db', csv_file='price_history.csv', max_cycles=None,
+                 request_timeout=REQUEST_TIMEOUT):
+        self.interval = interval
+        self.urls_file = urls_file
+        self.db_name = db_name
+        self.csv_file = csv_file
+        self.max_cycles = max_cycles
+        self.request_timeout = request_timeout
+        self.stop_event = threading.Event()
+        self.session = None
+        self.conn = None
+        self.product_urls = {}
+        self._urls_stamp = None
+        self.history_df = None
+        self._history_stamp = None
+
+    # Section: Warm State
+    def _refresh_product_urls(self):
+        """Reloads the product list only when its file changed."""
+        stamp = file_stamp(self.urls_file)
+        if stamp != self._urls_stamp:
+            self.product_urls = load_product_urls(self.urls_file)
+            self._urls_stamp = stamp
+            print(f"Loaded {len(self.product_urls)} product(s) from {self.urls_file}.", flush=True)
+
+    def _cached_history(self):
+        """Returns the history kept from the last cycle if nobody else rewrote the CSV."""
+        if self.history_df is not None and file_stamp(self.csv_file) == self._history_stamp:
+            return self.history_df
+        return None
+
+    # Section: Signals
+    def request_stop(self, signum=None, frame=None):
+        if not self.stop_event.is_set():
+            print("Stop requested; finishing the current cycle...", flush=True)
+        self.stop_event.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+    # Section: Main Loop
+    def run_cycle(self):
+        """Runs one fetch cycle with the warm session, connection and history."""
+        self._refresh_product_urls()
+        self.history_df = run_fetch_cycle(self.product_urls, HEADERS, session=self.session,
+                                          conn=self.conn, db_name=self.db_name,
+                                          csv_file=self.csv_file, existing_df=self._cached_history(),
+                                          stop_event=self.stop_event, timeout=self.request_timeout)
+        self._history_stamp = file_stamp(self.csv_file)
+
+    def run(self):
+        """Runs cycles until stopped or max_cycles is reached."""
+        self.session = requests.Session()
+        self.conn = sqlite3.connect(self.db_name)
+        print(f"Tracker daemon started (pid {os.getpid()}, every {self.interval}s).", flush=True)
+
+        cycles = 0
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                cpu_before = time.process_time()
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    print(f"Error during fetch cycle: {e}", flush=True)
+                    # Release anything the failed cycle left uncommitted, or
+                    # the warm connection would hold the write lock
+                    self.conn.rollback()
+                cycles += 1
+                print(f"Cycle {cycles} finished in {time.monotonic() - started:.1f}s "
+                      f"(CPU {time.process_time() - cpu_before:.2f}s, RSS {rss_mb():.1f} MB).",
+                      flush=True)
+
+                if self.max_cycles is not None and cycles >= self.max_cycles:
+                    break
+                # Sleep until the next cycle, waking immediately on SIGTERM
+                self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            self.session.close()
+            self.conn.close()
+            print("Tracker daemon stopped.", flush=True)
+        return cycles
+
+def run_daemon(interval=DEFAULT_INTERVAL, **kwargs):
+    """Starts a TrackerDaemon with signal handling and blocks until it stops."""
+    daemon = TrackerDaemon(interval, **kwargs)
+    daemon.install_signal_handlers()
+    return daemon.run()
@@ -1,161 +1,323 @@
 import requests
 from bs4 import BeautifulSoup
 import sqlite3
-from datetime import datetime
+import time
 import pandas as pd
 import json
+import hashlib
+import os
+import re
+import uuid
+from analytics import update_summary
+from offers import extract_offers, initialize_offers_table, store_offers
+from history import (HISTORY_COLUMNS, append_observations, history_is_current, history_lock,
+                     load_history, save_history)
+from snapshot import publish_snapshot
+from profiling import profile_mode, run_profiled
 
 # File containing product URLs and nicknames
 URLS_FILE = "product_urls.json"
 
+# Set TRACKER_RECORD_DIR to save every fetched page for replay by stub_server.py
+RECORD_DIR = os.environ.get('TRACKER_RECORD_DIR')
+
+# ASIN in a product URL, e.g. .../dp/B0DDTNR59W/...
+ASIN_PATTERN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+
+# Rows a crashed cycle stored but never exported are dropped after this long
+ORPHAN_SECONDS = 7 * 86400
+
+# (connect, read) timeout in seconds for each page fetch
+REQUEST_TIMEOUT = (5, 30)
+
+# Browser-like headers; Amazon blocks the default requests User-Agent
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
 # Section: Load Product URLs
-def load_product_urls():
+def load_product_urls(urls_file=URLS_FILE):
     """Loads product URLs and nicknames from a JSON file."""
     try:
-        with open(URLS_FILE, 'r') as file:
+        with open(urls_file, 'r') as file:
             return json.load(file)
     except FileNotFoundError:
         return {}
 
 # Section: Fetch Data from Amazon
-def fetch_amazon_data(url, headers):
+def parse_product_page(content, url):
+    """
+    Parses a product page's HTML to extract the product title and price.
+    Every other offer on the page (list price, other sellers, used, coupon)
+    is returned under 'offers' (see offers.extract_offers).
+    Returns a dictionary with the title, price, URL and offers, or None if
+    no valid price was found.
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Extract the title of the product
+    title_element = soup.find(id='productTitle')
+    title = title_element.get_text(strip=True) if title_element else "Unknown Title"
+
+    # Extract the price of the product: the buy box, else the first displayed price
+    offers = extract_offers(soup)
+    price_element = soup.find('span', {'class': 'a-offscreen'})
+    if 'buy_box' in offers:
+        price = offers['buy_box']
+    elif price_element:
+        price_str = price_element.get_text(strip=True).replace('$', '').replace(',', '')
+        try:
+            price = float(price_str)
+        except ValueError:
+            price = None  # If price conversion fails, set to None
+    else:
+        price = None  # If price element is not found
+
+    # Warn if no valid price was found
+    if price is None:
+        print(f"Warning: Could not fetch a valid price for {title}. Skipping...")
+        return None
+    offers.setdefault('buy_box', price)
+
+    return {
+        'title': title,
+        'price': price,
+        'url': url,
+        'offers': offers
+    }
+
+def fetch_amazon_data(url, headers, session=None, record_dir=RECORD_DIR, timeout=None):
     """
     Fetches product data from an Amazon product page.
     Parses the HTML to extract the product title and price.
     Returns a dictionary with the nickname, title, price, and URL.
+    Pass a requests.Session to reuse connections across many fetches.
+    timeout is requests' (connect, read) timeout; REQUEST_TIMEOUT by default.
+    If record_dir is set, every response is also saved there (see
+    record_response) so stub_server.py can replay it later.
     """
-    response = requests.get(url, headers=headers)
+    http = session if session is not None else requests
+    response = http.get(url, headers=headers, timeout=timeout or REQUEST_TIMEOUT)
+    if record_dir:
+        record_response(record_dir, url, response)
     if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract the title of the product
-        title_element = soup.find(id='productTitle')
-        title = title_element.get_text(strip=True) if title_element else "Unknown Title"
-
-        # Extract the price of the product
-        price_element = soup.find('span', {'class': 'a-offscreen'})
-        if price_element:
-            price_str = price_element.get_text(strip=True).replace('$', '').replace(',', '')
-            try:
-                price = float(price_str)
-            except ValueError:
-                price = None  # If price conversion fails, set to None
-        else:
-            price = None  # If price element is not found
-
-        # Warn if no valid price was found
-        if price is None:
-            print(f"Warning: Could not fetch a valid price for {title}. Skipping...")
-            return None
-
-        return {
-            'title': title,
-            'price': price,
-            'url': url
-        }
+        return parse_product_page(response.content, url)
     else:
         raise Exception(f"Failed to fetch the page. Status code: {response.status_code}")
 
+# Section: Record Responses
+def recording_key(url):
+    """Returns the ASIN in a product URL, or a hash of the URL if it has none."""
+    match = ASIN_PATTERN.search(url)
+    return match.group(1) if match else hashlib.sha1(url.encode()).hexdigest()[:16]
+
+def record_response(record_dir, url, response):
+    """
+    Saves a fetched page as <key>.html plus a <key>.json sidecar with the URL,
+    status code, content type and fetch time. A later fetch of the same
+    product overwrites the earlier recording.
+    """
+    try:
+        os.makedirs(record_dir, exist_ok=True)
+        key = recording_key(url)
+        with open(os.path.join(record_dir, f"{key}.html"), 'wb') as page:
+            page.write(response.content)
+        with open(os.path.join(record_dir, f"{key}.json"), 'w') as meta:
+            json.dump({
+                'url': url,
+                'status': response.status_code,
+                'content_type': response.headers.get('Content-Type', 'text/html'),
+                'ts': int(time.time()),
+            }, meta)
+    except OSError as e:
+        print(f"Warning: could not record response for {url}: {e}")
+
 # Section: Initialize Database
-def initialize_database(db_name='amazon_tracker.db'):
+def new_cycle_id():
+    """A unique tag for the rows one fetch cycle stores in the products table."""
+    return uuid.uuid4().hex
+
+def initialize_database(db_name='amazon_tracker.db', conn=None):
     """
-    Creates and initializes the SQLite database.
-    Drops the existing table if it exists and creates a fresh one.
+    Creates the products table (and offer_history) if they do not exist.
+    products holds fetched rows until their cycle exports them; every row
+    carries its cycle id, so overlapping cycles sharing the database only
+    export and clear their own rows.
+    Pass an open connection to reuse it instead of opening a new one.
     """
-    conn = sqlite3.connect(db_name)
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
-    cursor.execute('DROP TABLE IF EXISTS products')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nickname TEXT,
-            title TEXT,
-            price REAL,
-            url TEXT,
-            date TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    try:
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(products)')}
+        if columns and not {'ts', 'cycle'} <= columns:
+            # Tables from before epoch timestamps or cycle ids only hold rows
+            # that were already exported
+            cursor.execute('DROP TABLE products')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nickname TEXT,
+                title TEXT,
+                price REAL,
+                url TEXT,
+                ts INTEGER,
+                cycle TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_cycle ON products (cycle)')
+        cursor.execute('DELETE FROM products WHERE ts < ?', (int(time.time()) - ORPHAN_SECONDS,))
+        initialize_offers_table(conn)
+        conn.commit()
+    except sqlite3.Error:
+        # Do not leave a half-done migration holding the write lock
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
 
 # Section: Store Data in Database
-def store_data_in_db(data, nickname, db_name='amazon_tracker.db'):
-    """Inserts the fetched product data into the SQLite database."""
-    conn = sqlite3.connect(db_name)
+def store_data_in_db(data, nickname, db_name='amazon_tracker.db', conn=None, cycle=None):
+    """
+    Inserts the fetched product data into the SQLite database, tagged with cycle.
+    Its offers are appended to offer_history with the same timestamp.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(db_name)
+    ts = int(time.time())
     cursor = conn.cursor()
     cursor.execute('''
-        INSERT INTO products (nickname, title, price, url, date)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (nickname, data['title'], data['price'], data['url'], datetime.now()))
+        INSERT INTO products (nickname, title, price, url, ts, cycle)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (nickname, data['title'], data['price'], data['url'], ts, cycle))
+    store_offers(conn, nickname, data.get('offers'), ts)
     conn.commit()
-    conn.close()
+    if own_conn:
+        conn.close()
 
 # Section: Fetch Price History
-def fetch_price_history(db_name='amazon_tracker.db'):
-    """Fetches all historical price records from the SQLite database."""
-    conn = sqlite3.connect(db_name)
+def fetch_price_history(db_name='amazon_tracker.db', conn=None, cycle=None):
+    """Fetches the price records stored by one cycle (by default, every stored record)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
-    cursor.execute('SELECT nickname, title, price, url, date FROM products ORDER BY date ASC')
+    if cycle is None:
+        cursor.execute('SELECT nickname, title, price, url, ts FROM products ORDER BY ts ASC')
+    else:
+        cursor.execute('SELECT nickname, title, price, url, ts FROM products WHERE cycle = ? ORDER BY ts ASC',
+                       (cycle,))
     rows = cursor.fetchall()
-    conn.close()
+    if own_conn:
+        conn.close()
     return rows
 
-# Section: Main Script Workflow
-def main():
+def clear_cycle(cycle, db_name='amazon_tracker.db', conn=None):
+    """Deletes the rows an exported cycle stored."""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(db_name)
+    conn.execute('DELETE FROM products WHERE cycle = ?', (cycle,))
+    conn.commit()
+    if own_conn:
+        conn.close()
+
+# Section: Fetch Cycle
+def run_fetch_cycle(product_urls, headers=HEADERS, session=None, conn=None,
+                    db_name='amazon_tracker.db', csv_file='price_history.csv', existing_df=None,
+                    stop_event=None, timeout=None):
     """
-    Main workflow for the script:
-    1. Loads product URLs from a JSON file.
-    2. Initializes the SQLite database.
-    3. Fetches product data for each URL.
-    4. Stores data in the database.
-    5. Fetches price history and saves it to a CSV file.
+    Fetches every product once, stores the results and merges them into the CSV.
+    A long-running caller can pass its requests.Session, SQLite connection and
+    the history DataFrame returned by the previous cycle to keep them warm.
+    If stop_event (a threading.Event) is set mid-cycle, the remaining products
+    are skipped and what was fetched so far is still saved. timeout is passed
+    to fetch_amazon_data.
+    Returns the merged price history (or existing_df if nothing was fetched).
     """
-    product_urls = load_product_urls()
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9"
-    }
-
-    # Initialize database
-    initialize_database()
+    # Initialize database; this cycle's rows are tagged so it exports only those
+    initialize_database(db_name, conn)
+    cycle = new_cycle_id()
 
     # Fetch data for each product and store in the database
     for nickname, url in product_urls.items():
+        if stop_event is not None and stop_event.is_set():
+            print("Stopping early; saving the products fetched so far.")
+            break
         try:
-            product_data = fetch_amazon_data(url, headers)
+            product_data = fetch_amazon_data(url, headers, session=session, timeout=timeout)
             if product_data['title'] and product_data['price'] is not None:
-                store_data_in_db(product_data, nickname)
+                store_data_in_db(product_data, nickname, db_name, conn, cycle=cycle)
                 print(f"Fetched data for {nickname} ({product_data['title']}): {product_data['price']}")
             else:
                 print(f"Could not get valid data for URL: {url}")
         except Exception as e:
             print(f"Error fetching URL {url}: {e}")
 
-    # Fetch and process price history
-    history = fetch_price_history()
+    return export_price_history(db_name, csv_file, existing_df, conn, cycle=cycle)
+
+# Section: Main Script Workflow
+def main():
+    """
+    Main workflow for the script:
+    1. Loads product URLs from a JSON file.
+    2. Initializes the SQLite database.
+    3. Fetches product data for each URL.
+    4. Stores data in the database.
+    5. Fetches price history and saves it to a CSV file.
+    """
+    run_fetch_cycle(load_product_urls())
+
+# Section: Export Price History to CSV
+def export_price_history(db_name='amazon_tracker.db', csv_file='price_history.csv',
+                         existing_df=None, conn=None, cycle=None):
+    """
+    Merges the rows stored by one fetch cycle (all stored rows if cycle is
+    None) into the price history CSV, then deletes them from the database.
+    In change-only mode (see history.STORAGE_MODE) an unchanged price only
+    extends the product's current run instead of adding a row.
+    existing_df, when given, is used instead of re-reading the CSV unless
+    another writer replaced the CSV since it was loaded. The merge, snapshot
+    and summary update hold the history writer lock, so overlapping cycles
+    cannot drop each other's rows or interleave summary updates.
+    Returns the merged history, or existing_df if there was nothing to merge.
+    """
+    history = fetch_price_history(db_name, conn, cycle)
     if history:
-        # Convert to DataFrame and preprocess
-        df = pd.DataFrame(history, columns=["nickname", "title", "price", "url", "date"])
-        df['date'] = pd.to_datetime(df['date'])
-        df['date_only'] = df['date'].dt.date
-        df['time_only'] = df['date'].dt.time
-
-        # Save to CSV, avoiding duplicates
-        csv_file = 'price_history.csv'
-        try:
-            existing_df = pd.read_csv(csv_file)
-            combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df.drop_duplicates(subset=["nickname", "price", "date_only", "time_only"], inplace=True)
-        except FileNotFoundError:
-            combined_df = df
-
-        # Finalize and save the cleaned DataFrame
-        combined_df = combined_df[["nickname", "title", "price", "url", "date_only", "time_only"]]
-        combined_df.to_csv('price_history.csv', index=False)
-        print("Price history has been updated and saved to price_history.csv")
+        # Convert to DataFrame; ts is already int64 epoch seconds
+        df = pd.DataFrame(history, columns=HISTORY_COLUMNS)
+
+        with history_lock(csv_file):
+            # Save to CSV, avoiding duplicates
+            if not history_is_current(existing_df, csv_file):
+                existing_df = load_history(csv_file)
+            combined_df = append_observations(existing_df, df)
+
+            # Finalize and save the cleaned DataFrame
+            save_history(combined_df, csv_file)
+            print(f"Price history has been updated and saved to {csv_file}")
+
+            # Publish the memory-mapped snapshot that graph.py and other readers map
+            try:
+                publish_snapshot(combined_df, csv_file)
+            except Exception as e:
+                print(f"Warning: could not publish the history snapshot: {e}")
+
+            # Refresh the materialized analytics with this cycle's observations
+            update_summary(df, combined_df, db_name)
+
+        # The rows are in the CSV now
+        if cycle is not None:
+            clear_cycle(cycle, db_name, conn)
+        return combined_df
     else:
         print("No data found in database.")
+        return existing_df
 
 # Run the main function if executed as a script
 if __name__ == "__main__":
-    main()
+    run_profiled('generate_data', main, mode=profile_mode())
@@ -6,19 +6,38 @@ import matplotlib.dates as mdates
 import mplcursors
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import seaborn as sns
+from analytics import load_summary, load_window_changes
+from history import load_history, to_local_datetime
+from retention import load_price_series
+from snapshot import SnapshotReader
+from product_list import ProductList
+from profiling import profile_mode, run_profiled
 
 ###############################################################################
 # 1. LOADING THE CSV DATA
 ###############################################################################
-def load_data(csv_file='price_history.csv'):
+def load_data(csv_file='price_history.csv', recent_hours=None):
     """
-    Loads a CSV containing columns like: nickname, price, date_only, ...
-    Returns a DataFrame with date_only as datetime.
+    Loads a CSV containing columns like: nickname, price, ts, ...
+    ts stays int64 epoch seconds for window math; a 'date' column holds the
+    same instants as local datetimes for plotting.
+    If the snapshot published by generate_data.py (snapshot.py) still
+    mirrors the CSV, it is mapped instead of parsing the CSV.
+    recent_hours keeps only observations within that many hours of the
+    newest one.
     """
     try:
-        df = pd.read_csv(csv_file)
-        df['date_only'] = pd.to_datetime(df['date_only'], errors='coerce')
-        df.dropna(subset=['nickname', 'price', 'date_only'], inplace=True)
+        snapshot = SnapshotReader(csv_file).fresh()
+        if snapshot is not None:
+            max_ts = snapshot.manifest['max_ts']
+            start = max_ts - recent_hours * 3600 if recent_hours and max_ts is not None else None
+            df = snapshot.frame(start=start)
+        else:
+            df = load_history(csv_file, expand=True)
+            if recent_hours and not df.empty:
+                df = df[df['ts'] >= df['ts'].max() - recent_hours * 3600]
+        df.dropna(subset=['nickname', 'price'], inplace=True)
+        df['date'] = to_local_datetime(df['ts'])
         return df
     except Exception as e:
         print("Error loading data:", e)
@@ -41,8 +60,8 @@ def create_line_figure(filtered_df, title="Price Over Time"):
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
 
     for product in filtered_df['nickname'].unique():
-        product_data = filtered_df[filtered_df['nickname'] == product].sort_values(by='date_only')
-        line, = ax.plot(product_data['date_only'], product_data['price'],
+        product_data = filtered_df[filtered_df['nickname'] == product].sort_values(by='ts')
+        line, = ax.plot(product_data['date'], product_data['price'],
                         marker='o', linestyle='-', label=product)
         # Use mplcursors for hover
         cursor = mplcursors.cursor(line, hover=True)
@@ -80,9 +99,8 @@ def create_48h_line_figure(filtered_df):
                 transform=ax.transAxes, fontsize=12)
         return fig
 
-    latest_date = filtered_df['date_only'].max()
-    cutoff = latest_date - pd.Timedelta(hours=48)
-    recent_data = filtered_df[filtered_df['date_only'] >= cutoff].copy()
+    cutoff = filtered_df['ts'].max() - 48 * 3600
+    recent_data = filtered_df[filtered_df['ts'] >= cutoff]
 
     if recent_data.empty:
         ax.text(0.5, 0.5, "No data in the last 48 hours",
@@ -90,8 +108,8 @@ def create_48h_line_figure(filtered_df):
         return fig
 
     for product in recent_data['nickname'].unique():
-        product_data = recent_data[recent_data['nickname'] == product].sort_values(by='date_only')
-        line, = ax.plot(product_data['date_only'], product_data['price'],
+        product_data = recent_data[recent_data['nickname'] == product].sort_values(by='ts')
+        line, = ax.plot(product_data['date'], product_data['price'],
                         marker='o', linestyle='-', label=product)
         cursor = mplcursors.cursor(line, hover=True)
 
@@ -110,10 +128,11 @@ def create_48h_line_figure(filtered_df):
     fig.tight_layout()
     return fig
 
-def create_48h_bar_figure(filtered_df):
+def create_48h_bar_figure(change_df):
     """
     A bar chart showing the price change in the last 48 hours:
       price_diff = last_price - first_price
+    change_df comes from the analytics summary table (see load_window_changes).
     If no data, display a message.
     """
     fig, ax = plt.subplots(figsize=(5, 4))
@@ -123,35 +142,13 @@ def create_48h_bar_figure(filtered_df):
     ax.tick_params(axis='x', rotation=45)
     ax.grid(True, linestyle='--', alpha=0.7)
 
-    if filtered_df.empty:
-        ax.text(0.5, 0.5, "No data available", ha='center', va='center',
-                transform=ax.transAxes, fontsize=12)
-        return fig
-
-    latest_date = filtered_df['date_only'].max()
-    cutoff = latest_date - pd.Timedelta(hours=48)
-    recent_df = filtered_df[filtered_df['date_only'] >= cutoff].copy()
-    if recent_df.empty:
-        ax.text(0.5, 0.5, "No data in the last 48 hours",
-                ha='center', va='center', transform=ax.transAxes, fontsize=12)
-        return fig
-
-    # Sort by date to ensure first=earliest, last=latest in the 48h
-    recent_df.sort_values('date_only', inplace=True)
-
-    # Group by product, get first & last price
-    change_df = recent_df.groupby('nickname').agg(
-        first_price=('price', 'first'),
-        last_price=('price', 'last')
-    )
-    change_df['price_diff'] = change_df['last_price'] - change_df['first_price']
-    change_df.reset_index(inplace=True)
-
     if change_df.empty:
         ax.text(0.5, 0.5, "No data in the last 48 hours",
                 ha='center', va='center', transform=ax.transAxes, fontsize=12)
         return fig
 
+    change_df = change_df.reset_index(drop=True)
+
     # Bar chart
     sns.barplot(data=change_df, x='nickname', y='price_diff',
                 palette='rocket', ax=ax)
@@ -182,19 +179,24 @@ def show_graphs_window(parent, selected_products, df):
     graph_win.geometry("1000x800")
 
     # Filter
+    change_df = load_window_changes(48)
     if selected_products:
         filtered_df = df[df['nickname'].isin(selected_products)]
+        change_df = change_df[change_df['nickname'].isin(selected_products)]
     else:
         filtered_df = df
 
-    if filtered_df.empty:
+    # Reads raw rows, hourly and daily bars at the coarsest resolution that fills the span
+    history_df = load_price_series(selected_products or None)
+
+    if filtered_df.empty and history_df.empty:
         messagebox.showinfo("No Data", "No data available for the selected product(s).")
         return
 
     # --- Top Frame: historical line chart ---
     frame_top = tk.Frame(graph_win)
     frame_top.pack(side="top", fill="both", expand=True)
-    fig_hist = create_line_figure(filtered_df, title="Price Over Time (Full History)")
+    fig_hist = create_line_figure(history_df, title="Price Over Time (Full History)")
     canvas_hist = FigureCanvasTkAgg(fig_hist, master=frame_top)
     canvas_hist.get_tk_widget().pack(side="left", fill="both", expand=True)
 
@@ -208,7 +210,7 @@ def show_graphs_window(parent, selected_products, df):
     # --- Bottom Frame: 48h bar chart ---
     frame_bottom = tk.Frame(graph_win)
     frame_bottom.pack(side="top", fill="both", expand=True)
-    fig_bar = create_48h_bar_figure(filtered_df)
+    fig_bar = create_48h_bar_figure(change_df)
     canvas_bar = FigureCanvasTkAgg(fig_bar, master=frame_bottom)
     canvas_bar.get_tk_widget().pack(side="left", fill="both", expand=True)
 
@@ -232,14 +234,23 @@ def main_gui():
     root.title("Select Products")
     root.geometry("400x500")
 
-    df = load_data('price_history.csv')
-    product_list = df['nickname'].unique() if not df.empty else []
+    # Only the 48h chart uses these rows; the full-history chart reads its own series
+    df = load_data('price_history.csv', recent_hours=48)
+    snapshot = SnapshotReader('price_history.csv').fresh()
+    # Products whose raw rows were all compacted into bars only appear in the summary
+    if snapshot is not None:
+        product_list = list(snapshot.nicknames)
+    else:
+        product_list = list(df['nickname'].unique()) if not df.empty else []
+    summary = load_summary()
+    if not summary.empty:
+        seen = set(product_list)
+        product_list += [p for p in summary['nickname'] if p not in seen]
 
     tk.Label(root, text="Select Product(s):", font=("Arial", 14)).pack(pady=10)
 
-    listbox = tk.Listbox(root, selectmode=tk.MULTIPLE, width=30, height=10)
-    for p in product_list:
-        listbox.insert(tk.END, p)
+    # Draws only the visible rows and filters as you type
+    listbox = ProductList(root, product_list, width=30, height=10, selectmode='multiple')
     listbox.pack(pady=5)
 
     def on_generate_graphs():
@@ -248,8 +259,7 @@ def main_gui():
             messagebox.showinfo("Already Open", "Graphs window is already open.")
             return
 
-        sel_indices = listbox.curselection()
-        selected = [listbox.get(i) for i in sel_indices]
+        selected = listbox.selection()
         show_graphs_window(root, selected, df)
 
     gen_btn = tk.Button(root, text="Generate Graphs", font=("Arial", 12),
@@ -272,4 +282,5 @@ def main_gui():
     root.mainloop()
 
 if __name__ == "__main__":
-    main_gui()
+    # TRACKER_PROFILE=1 profiles the whole GUI session, including every figure built
+    run_profiled('graph', main_gui, mode=profile_mode())
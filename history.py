@@ -0,0 +1,387 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import pandas as pd
+
+from profiling import add_profile_argument, profile_mode, run_profiled
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Column layout of price_history.csv; ts is int64 UTC epoch seconds
+HISTORY_COLUMNS = ["nickname", "title", "price", "url", "ts"]
+# Change-only files add the end of each run and how many observations it covers
+RUN_COLUMNS = HISTORY_COLUMNS + ["last_seen", "obs_count"]
+HISTORY_DTYPES = {'ts': 'int64', 'price': 'float64', 'last_seen': 'int64', 'obs_count': 'int64'}
+
+# 'full' stores every observation; 'change_only' stores one row per run of
+# identical price and title. A file that is already change-only stays that way.
+STORAGE_MODE = os.environ.get('TRACKER_STORAGE_MODE', 'full')
+
+def local_timezone():
+    """
+    This machine's time zone with its daylight saving rules: tzlocal's answer
+    if it is installed (the only option on Windows), else the TZ variable,
+    else /etc/localtime. Falls back to the current UTC offset, which is only
+    right for the half of the year it was taken in.
+    """
+    try:
+        import tzlocal
+        return tzlocal.get_localzone()
+    except Exception:
+        pass
+    name = os.environ.get('TZ', '').lstrip(':')
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    try:
+        target = os.path.realpath('/etc/localtime')
+        if 'zoneinfo/' in target:
+            return ZoneInfo(target.split('zoneinfo/', 1)[1])
+        with open('/etc/localtime', 'rb') as file:
+            return ZoneInfo.from_file(file, key='localtime')
+    except (OSError, ValueError, ZoneInfoNotFoundError):
+        return datetime.now().astimezone().tzinfo
+
+# Timezone of this machine; legacy date_only/time_only strings were local time
+LOCAL_TZ = local_timezone()
+
+def localize_naive(dates):
+    """
+    Reads naive datetimes (a Series) as local wall-clock times and returns
+    them tz-aware. A time repeated when clocks go back is taken as the first
+    (daylight saving) one; a time skipped when they go forward is moved to
+    the end of the gap.
+    """
+    return dates.dt.tz_localize(LOCAL_TZ, ambiguous=np.ones(len(dates), dtype=bool),
+                                nonexistent='shift_forward')
+
+# Section: Legacy Conversion
+def convert_legacy_history(df):
+    """
+    Converts a DataFrame with the old date_only/time_only string columns into
+    the current layout with a single int64 'ts' column. The strings were
+    written in local time, so they are localized before converting to UTC.
+    Rows whose date cannot be parsed are dropped.
+    """
+    time_only = df['time_only'].astype(str) if 'time_only' in df.columns else '00:00:00'
+    dates = pd.to_datetime(df['date_only'].astype(str) + ' ' + time_only,
+                           format='ISO8601', errors='coerce')
+    dates = localize_naive(dates)
+    df = df.assign(ts=(dates - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1))
+    df = df.dropna(subset=['ts'])
+    df['ts'] = df['ts'].astype('int64')
+    return df[[col for col in HISTORY_COLUMNS if col in df.columns]]
+
+# Section: Change-Only Runs
+def is_run_length(df):
+    """True if df stores runs (has last_seen/obs_count) rather than observations."""
+    return 'last_seen' in df.columns
+
+def compress_runs(df):
+    """
+    Collapses consecutive observations of a product with the same price and
+    title into one row: ts is when the run started, last_seen when it was
+    last observed and obs_count how many observations it covers. Accepts
+    observations, runs, or a mix of both.
+    """
+    if df.empty:
+        return empty_history(run_length=True)
+    if not is_run_length(df):
+        df = df.assign(last_seen=df['ts'], obs_count=1)
+    else:
+        df = df.assign(last_seen=df['last_seen'].fillna(df['ts']), obs_count=df['obs_count'].fillna(1))
+    df = df.sort_values(['nickname', 'ts'], kind='stable')
+
+    nickname, price, title = df['nickname'], df['price'], df['title']
+    new_run = ((nickname != nickname.shift()) | (price != price.shift())
+               | (title.fillna('') != title.fillna('').shift()))
+    runs = df.groupby(new_run.cumsum().to_numpy(), sort=False).agg(
+        nickname=('nickname', 'first'),
+        title=('title', 'first'),
+        price=('price', 'first'),
+        url=('url', 'last'),
+        ts=('ts', 'first'),
+        last_seen=('last_seen', 'max'),
+        obs_count=('obs_count', 'sum'),
+    )
+    runs['last_seen'] = runs['last_seen'].astype('int64')
+    runs['obs_count'] = runs['obs_count'].astype('int64')
+    return runs[RUN_COLUMNS].reset_index(drop=True)
+
+def expand_runs(df):
+    """
+    Expands runs back into one row per observation. Only the first and last
+    observation times of a run are stored, so the obs_count observations are
+    spread evenly between ts and last_seen (exact for regularly scheduled
+    fetches). A DataFrame that is not run-length is returned unchanged.
+    """
+    if not is_run_length(df):
+        return df
+    counts = df['obs_count'].to_numpy(dtype=np.int64)
+    rows = np.repeat(np.arange(len(df)), counts)
+    # Position of each observation within its run: 0, 1, ..., count - 1
+    position = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    start = df['ts'].to_numpy(dtype=np.int64)[rows]
+    span = df['last_seen'].to_numpy(dtype=np.int64)[rows] - start
+    steps = np.maximum(counts[rows] - 1, 1)
+    expanded = df.iloc[rows][HISTORY_COLUMNS].reset_index(drop=True)
+    expanded['ts'] = start + span * position // steps
+    return expanded
+
+def append_observations(existing_df, new_df):
+    """
+    Merges newly fetched observations into the stored history.
+    Full files drop exact duplicates; change-only files extend the current
+    run of each product and skip observations that are not newer than it,
+    so merging the same cycle twice changes nothing.
+    """
+    if is_run_length(existing_df) or STORAGE_MODE == 'change_only':
+        existing = compress_runs(existing_df) if not is_run_length(existing_df) else existing_df
+        last_seen = existing.groupby('nickname')['last_seen'].max()
+        known = new_df['nickname'].map(last_seen)
+        fresh = new_df[known.isna() | (new_df['ts'] > known)]
+        return compress_runs(pd.concat([existing, fresh[HISTORY_COLUMNS]], ignore_index=True))
+
+    combined_df = pd.concat([existing_df, new_df[HISTORY_COLUMNS]], ignore_index=True)
+    combined_df.drop_duplicates(subset=["nickname", "price", "ts"], inplace=True)
+    return combined_df[HISTORY_COLUMNS]
+
+# Section: Atomic Writes and Writer Lock
+# Readers never lock. Every write goes to a temporary file in the same
+# directory that is then renamed over the target, so a reader that opens the
+# file gets the old version or the new one, whole. Writers that read, merge
+# and rewrite the history hold history_lock from the read to the rename so
+# that two of them cannot drop each other's rows.
+LOCK_POLL = 0.05
+# Windows refuses to replace a file a reader has open; keep retrying this long
+REPLACE_TIMEOUT = 10
+
+def _stat_stamp(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def file_stamp(path):
+    """Identifies one version of a file (changes on every rewrite); None if it does not exist."""
+    try:
+        return _stat_stamp(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+def replace_file(source, target):
+    """os.replace, retried on Windows while a reader still has target open."""
+    deadline = time.monotonic() + REPLACE_TIMEOUT
+    while True:
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if os.name != 'nt' or time.monotonic() > deadline:
+                raise
+            time.sleep(LOCK_POLL)
+
+@contextmanager
+def atomic_write(path, mode='w', **open_kwargs):
+    """
+    Yields a temporary file next to path. If the block finishes, the file is
+    flushed to disk and renamed over path; if it raises, path is untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp creates the file private to its owner; keep the permissions path had
+        try:
+            shutil.copymode(path, tmp)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o644)
+        replace_file(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+# Lock files held by this process: path -> [RLock, open lock file, depth]
+_held_locks = {}
+_held_locks_guard = threading.Lock()
+
+def _forget_held_locks():
+    """A forked child does not own its parent's locks; it must take them itself."""
+    global _held_locks, _held_locks_guard
+    for _, file, _ in _held_locks.values():
+        if file is not None:
+            file.close()
+    _held_locks = {}
+    _held_locks_guard = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_held_locks)
+
+def _lock_file(path, timeout):
+    file = open(path, 'a+')
+    deadline = None if timeout is None else time.monotonic() + timeout
+    waiting = False
+    while True:
+        try:
+            if os.name == 'nt':
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return file
+        except OSError:
+            if deadline is not None and time.monotonic() >= deadline:
+                file.close()
+                raise TimeoutError(f"Another writer has held {path} for more than {timeout}s")
+            if not waiting:
+                print(f"Waiting for another writer to release {path}...", flush=True)
+                waiting = True
+            time.sleep(LOCK_POLL)
+
+def _unlock_file(file):
+    try:
+        if os.name == 'nt':
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    finally:
+        file.close()
+
+@contextmanager
+def history_lock(csv_file='price_history.csv', timeout=None):
+    """
+    Exclusive advisory lock for writers of csv_file, held on csv_file + '.lock'
+    (fcntl.flock on POSIX, msvcrt.locking on Windows). Other processes and
+    threads wait for it; the thread holding it may take it again. The OS
+    drops the lock if the process dies. Raises TimeoutError after timeout
+    seconds (default: wait as long as it takes).
+    """
+    path = os.path.abspath(csv_file) + '.lock'
+    with _held_locks_guard:
+        held = _held_locks.setdefault(path, [threading.RLock(), None, 0])
+    if not held[0].acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"Another thread has held {path} for more than {timeout}s")
+    try:
+        if held[2] == 0:
+            held[1] = _lock_file(path, timeout)
+        held[2] += 1
+        try:
+            yield
+        finally:
+            held[2] -= 1
+            if held[2] == 0:
+                _unlock_file(held[1])
+                held[1] = None
+    finally:
+        held[0].release()
+
+def history_is_current(df, csv_file='price_history.csv'):
+    """True if df is the version of csv_file last loaded or saved, i.e. nobody rewrote it since."""
+    return df is not None and df.attrs.get('csv_stamp') is not None \
+        and df.attrs['csv_stamp'] == file_stamp(csv_file)
+
+# Section: Load / Save History
+def load_history(csv_file='price_history.csv', expand=False):
+    """
+    Loads the price history with 'ts' as int64 epoch seconds.
+    A legacy file with date_only/time_only columns is converted and rewritten
+    in place the first time it is loaded, so later loads never parse dates.
+    Change-only files are returned as runs unless expand=True, which gives
+    one row per observation.
+    The file is opened once, so the result is one whole version even if a
+    writer replaces it meanwhile; no lock is taken unless a legacy file has
+    to be converted. The version's stamp is kept in df.attrs['csv_stamp'].
+    Returns an empty DataFrame with the history columns if the file is missing.
+    """
+    try:
+        with open(csv_file, 'rb') as file:
+            stamp = _stat_stamp(os.fstat(file.fileno()))
+            header = pd.read_csv(file, nrows=0).columns
+            file.seek(0)
+            legacy = 'ts' not in header and 'date_only' in header
+            df = pd.read_csv(file, dtype=None if legacy else
+                             {k: v for k, v in HISTORY_DTYPES.items() if k in header})
+    except FileNotFoundError:
+        return empty_history()
+
+    if legacy:
+        with history_lock(csv_file):
+            if file_stamp(csv_file) != stamp:
+                # Converted or rewritten by another process while we waited
+                return load_history(csv_file, expand)
+            df = convert_legacy_history(df)
+            if STORAGE_MODE == 'change_only':
+                df = compress_runs(df)
+            save_history(df, csv_file)
+        print(f"Converted {csv_file} to epoch timestamps ({len(df)} rows).")
+    else:
+        df.attrs['csv_stamp'] = stamp
+    return expand_runs(df) if expand else df
+
+def save_history(df, csv_file='price_history.csv'):
+    """
+    Writes the history (observations or runs) to csv_file by atomic replace.
+    Callers that merged into a loaded history should hold history_lock.
+    """
+    columns = RUN_COLUMNS if is_run_length(df) else HISTORY_COLUMNS
+    with atomic_write(csv_file, newline='') as file:
+        df[columns].to_csv(file, index=False)
+    df.attrs['csv_stamp'] = file_stamp(csv_file)
+
+def empty_history(run_length=False):
+    """Returns an empty DataFrame with the price history columns and dtypes."""
+    columns = {
+        'nickname': pd.Series(dtype=object),
+        'title': pd.Series(dtype=object),
+        'price': pd.Series(dtype='float64'),
+        'url': pd.Series(dtype=object),
+        'ts': pd.Series(dtype='int64'),
+    }
+    if run_length:
+        columns['last_seen'] = pd.Series(dtype='int64')
+        columns['obs_count'] = pd.Series(dtype='int64')
+    return pd.DataFrame(columns)
+
+# Section: Display Helpers
+def to_local_datetime(ts):
+    """
+    Converts epoch seconds to naive local datetimes for plotting and exports.
+    This is a numeric conversion; no strings are parsed.
+    """
+    dates = pd.to_datetime(np.asarray(ts, dtype=np.int64), unit='s', utc=True)
+    return dates.tz_convert(LOCAL_TZ).tz_localize(None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert price_history.csv between storage modes.")
+    parser.add_argument('mode', choices=['change_only', 'full'],
+                        help="'change_only' collapses unchanged prices into runs; 'full' expands them")
+    parser.add_argument('--csv', default='price_history.csv')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with history_lock(args.csv):
+        df = load_history(args.csv)
+        before = len(df)
+        df = compress_runs(df) if args.mode == 'change_only' else expand_runs(df)
+        save_history(df, args.csv)
+    print(f"{args.csv}: {before} -> {len(df)} rows ({args.mode}).")
+
+if __name__ == "__main__":
+    run_profiled('history', main, mode=profile_mode())
@@ -0,0 +1,171 @@
+import re
+import sqlite3
+
+import pandas as pd
+
+###############################################################################
+# OFFER EXTRACTION
+#
+# One product page carries several prices besides the buy box: the list
+# (strike-through) price, the cheapest new offer from other sellers, the
+# cheapest used offer and clipped coupons. extract_offers reads all of them
+# from the parsed page; each becomes its own series in offer_history.
+###############################################################################
+OFFER_TYPES = ('buy_box', 'list_price', 'new_other', 'used', 'coupon_amount', 'coupon_percent')
+
+# Selectors are tried in order; Amazon has served each layout at some point
+BUY_BOX_SELECTORS = [
+    '#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen',
+    '#corePrice_desktop .priceToPay .a-offscreen',
+    '#apex_desktop .priceToPay .a-offscreen',
+    '#corePrice_feature_div .a-price:not(.a-text-price) .a-offscreen',
+    '#priceblock_dealprice',
+    '#priceblock_ourprice',
+    '#priceblock_saleprice',
+]
+LIST_PRICE_SELECTORS = [
+    '.basisPrice .a-offscreen',
+    'span.a-price.a-text-price[data-a-strike="true"] .a-offscreen',
+    '#listPrice',
+    '.priceBlockStrikePriceString',
+]
+USED_SELECTORS = ['#usedBuySection .a-offscreen', '#usedAccordionRow .a-offscreen']
+OTHER_SELLERS_SELECTORS = ['#olp_feature_div', '#olpLinkWidget_feature_div', '#aod-ingress-link']
+COUPON_SELECTORS = ['[id^="couponBadge"]', 'label[id^="couponText"]', '#promoPriceBlockMessage_feature_div',
+                    '#vpcButton']
+
+PRICE_PATTERN = re.compile(r'\$\s*([\d,]+(?:\.\d+)?)')
+NEW_OFFERS_PATTERN = re.compile(r'New\s*(?:\(\d+\))?\s*from\s*\$\s*([\d,]+(?:\.\d+)?)', re.I)
+USED_OFFERS_PATTERN = re.compile(r'Used\s*(?:\(\d+\))?\s*(?:-\s*[\w ]+?\s*)?from\s*\$\s*([\d,]+(?:\.\d+)?)', re.I)
+PERCENT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+
+# Section: Parsing Helpers
+def parse_price(text):
+    """'$1,299.99' -> 1299.99. Takes the first price in ranges; None if there is none."""
+    match = PRICE_PATTERN.search(text or '')
+    if not match:
+        # Some layouts omit the currency symbol inside a-offscreen
+        match = re.fullmatch(r'\s*([\d,]+(?:\.\d+)?)\s*', text or '')
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+
+def _first_price(soup, selectors):
+    for selector in selectors:
+        for element in soup.select(selector):
+            price = parse_price(element.get_text(strip=True))
+            if price is not None:
+                return price
+    return None
+
+def _texts(soup, selectors):
+    return [element.get_text(' ', strip=True) for selector in selectors for element in soup.select(selector)]
+
+def _pattern_price(texts, pattern):
+    prices = []
+    for text in texts:
+        prices += [float(value.replace(',', '')) for value in pattern.findall(text)]
+    return min(prices) if prices else None
+
+def _coupon(soup):
+    """Returns (amount, percent) of a clippable coupon; either may be None."""
+    for text in _texts(soup, COUPON_SELECTORS):
+        if 'coupon' not in text.lower():
+            continue
+        percent = PERCENT_PATTERN.search(text)
+        if percent:
+            return None, float(percent.group(1))
+        amount = parse_price(text)
+        if amount is not None:
+            return amount, None
+    return None, None
+
+# Section: Extraction
+def extract_offers(soup):
+    """
+    Returns {offer_type: value} for every offer found on a parsed product
+    page. Prices are in dollars; coupon_percent is a percentage. Types that
+    are not on the page are left out.
+    """
+    offers = {
+        'buy_box': _first_price(soup, BUY_BOX_SELECTORS),
+        'list_price': _first_price(soup, LIST_PRICE_SELECTORS),
+    }
+
+    other_texts = _texts(soup, OTHER_SELLERS_SELECTORS)
+    offers['new_other'] = _pattern_price(other_texts, NEW_OFFERS_PATTERN)
+    offers['used'] = _first_price(soup, USED_SELECTORS)
+    if offers['used'] is None:
+        offers['used'] = _pattern_price(other_texts, USED_OFFERS_PATTERN)
+
+    offers['coupon_amount'], offers['coupon_percent'] = _coupon(soup)
+    return {offer_type: value for offer_type, value in offers.items() if value is not None}
+
+###############################################################################
+# OFFER HISTORY TABLE
+###############################################################################
+def initialize_offers_table(conn):
+    """Creates offer_history if needed. Unlike products, it is never dropped."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS offer_history (
+            nickname TEXT NOT NULL,
+            offer_type TEXT NOT NULL,
+            value REAL NOT NULL,
+            ts INTEGER NOT NULL,
+            PRIMARY KEY (nickname, offer_type, ts)
+        )
+    ''')
+
+def store_offers(conn, nickname, offers, ts):
+    """
+    Inserts one row per offer type; the caller commits. Storing the same
+    observation twice replaces it instead of duplicating it.
+    """
+    if not offers:
+        return
+    conn.executemany('INSERT OR REPLACE INTO offer_history (nickname, offer_type, value, ts) VALUES (?, ?, ?, ?)',
+                     [(nickname, offer_type, float(value), int(ts)) for offer_type, value in offers.items()])
+
+def load_offer_series(nicknames=None, offer_types=None, start=None, end=None, db_name='amazon_tracker.db'):
+    """
+    Returns nickname, offer_type, value and ts for the requested products,
+    offer types and time range (epoch seconds), ordered by product and time.
+    """
+    query = 'SELECT nickname, offer_type, value, ts FROM offer_history WHERE 1 = 1'
+    params = []
+    for column, values in (('nickname', nicknames), ('offer_type', offer_types)):
+        if values:
+            query += f" AND {column} IN ({', '.join('?' * len(values))})"
+            params += list(values)
+    if start is not None:
+        query += ' AND ts >= ?'
+        params.append(int(start))
+    if end is not None:
+        query += ' AND ts <= ?'
+        params.append(int(end))
+    query += ' ORDER BY nickname, offer_type, ts'
+
+    conn = sqlite3.connect(db_name)
+    initialize_offers_table(conn)
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+def latest_offers(db_name='amazon_tracker.db'):
+    """Returns one row per product with the most recent value of every offer type as columns."""
+    conn = sqlite3.connect(db_name)
+    initialize_offers_table(conn)
+    df = pd.read_sql_query('''
+        SELECT o.nickname, o.offer_type, o.value FROM offer_history o
+        JOIN (SELECT nickname, offer_type, MAX(ts) AS ts FROM offer_history
+              GROUP BY nickname, offer_type) latest
+          ON o.nickname = latest.nickname AND o.offer_type = latest.offer_type AND o.ts = latest.ts
+    ''', conn)
+    conn.close()
+    if df.empty:
+        return pd.DataFrame(columns=['nickname', *OFFER_TYPES])
+    wide = df.pivot(index='nickname', columns='offer_type', values='value')
+    return wide.reindex(columns=list(OFFER_TYPES)).reset_index()
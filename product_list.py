@@ -0,0 +1,312 @@
+import tkinter as tk
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+###############################################################################
+# SEARCHABLE PRODUCT LIST
+#
+# ProductIndex keeps the nicknames sorted case-insensitively, so a prefix
+# search is a bisect range, and maps every three-letter substring to the
+# nicknames containing it, so a substring search only checks names that
+# share all of the query's trigrams. Adding or removing one nickname
+# updates both in place. Results list prefix matches first, then the other
+# substring matches, each in sorted order. Typing further narrows the
+# previous result instead of searching again.
+#
+# ProductList is a Tk widget that shows an index through a Listbox holding
+# only the visible rows. Scrolling, filtering, inserts and deletes redraw
+# those few rows; nothing scales with the number of products except the
+# search itself.
+###############################################################################
+GRAM = 3
+# Keystrokes within this many milliseconds are filtered once
+FILTER_DELAY_MS = 60
+WHEEL_ROWS = 3
+
+def sort_key(nickname):
+    return (nickname.casefold(), nickname)
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+# Section: Index
+class ProductIndex:
+    def __init__(self, nicknames=()):
+        self.set_products(nicknames)
+
+    def set_products(self, nicknames):
+        """Replaces the whole index; use add/remove for single changes."""
+        self._keys = sorted({sort_key(str(n)) for n in nicknames})
+        self._grams = defaultdict(set)
+        for folded, nickname in self._keys:
+            for gram in _grams(folded):
+                self._grams[gram].add(nickname)
+        self._last = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, nickname):
+        key = sort_key(nickname)
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def names(self):
+        return [nickname for _, nickname in self._keys]
+
+    def add(self, nickname):
+        """Adds one nickname; returns False if it was already there."""
+        if nickname in self:
+            return False
+        key = sort_key(nickname)
+        insort(self._keys, key)
+        for gram in _grams(key[0]):
+            self._grams[gram].add(nickname)
+        self._last = None
+        return True
+
+    def remove(self, nickname):
+        """Removes one nickname; returns False if it was not there."""
+        if nickname not in self:
+            return False
+        key = sort_key(nickname)
+        del self._keys[bisect_left(self._keys, key)]
+        for gram in _grams(key[0]):
+            postings = self._grams[gram]
+            postings.discard(nickname)
+            if not postings:
+                del self._grams[gram]
+        self._last = None
+        return True
+
+    def matches(self, query, nickname):
+        return query.strip().casefold() in nickname.casefold()
+
+    def search(self, query):
+        """Nicknames containing query (case-insensitive), prefix matches first."""
+        query = query.strip().casefold()
+        if not query:
+            self._last = None
+            return self.names()
+        # Prefix matches are one contiguous, already sorted range of the keys
+        keys = self._keys
+        i = j = bisect_left(keys, (query,))
+        while j < len(keys) and keys[j][0].startswith(query):
+            j += 1
+        prefix = [nickname for _, nickname in keys[i:j]]
+        if self._last is not None and self._last[0] in query:
+            # Typing further: the new matches are a subset of the last ones
+            rest = [key for key in self._last[1] if query in key[0] and not key[0].startswith(query)]
+            rest.sort()
+        elif len(query) < GRAM:
+            rest = [key for key in keys if query in key[0] and not key[0].startswith(query)]
+        else:
+            postings = sorted((self._grams.get(gram, set()) for gram in _grams(query)), key=len)
+            rest = sorted(key for key in map(sort_key, set.intersection(*postings))
+                          if query in key[0] and not key[0].startswith(query))
+        self._last = (query, keys[i:j] + rest)
+        return prefix + [nickname for _, nickname in rest]
+
+# Section: Widget
+class ProductList(tk.Frame):
+    """
+    A search box over a list of nicknames. selectmode is 'browse' (one
+    product) or 'multiple' (click to toggle). Only `height` rows exist in
+    the underlying Listbox at any time.
+    """
+
+    def __init__(self, master, nicknames=(), width=30, height=10, selectmode='browse', **kwargs):
+        super().__init__(master, **kwargs)
+        self.index = ProductIndex(nicknames)
+        self.height = height
+        self.selectmode = selectmode
+        self.selected = set()
+        self.active = None
+        self.query = ''
+        self.view = self.index.names()
+        # view[:_split] start with the query, view[_split:] only contain it
+        self._split = len(self.view)
+        self.top = 0
+        self._pending = None
+
+        search_row = tk.Frame(self)
+        search_row.pack(fill='x')
+        tk.Label(search_row, text="Search:").pack(side='left')
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_row, textvariable=self.search_var)
+        self.search_entry.pack(side='left', fill='x', expand=True)
+        self.search_var.trace_add('write', lambda *_: self._schedule_filter())
+
+        list_row = tk.Frame(self)
+        list_row.pack(fill='both', expand=True)
+        self.listbox = tk.Listbox(list_row, width=width, height=height,
+                                  selectmode=tk.MULTIPLE, exportselection=False, activestyle='none')
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.scrollbar = tk.Scrollbar(list_row, orient='vertical', command=self._on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        self.count_label = tk.Label(self, anchor='w')
+        self.count_label.pack(fill='x')
+
+        # The Listbox's own selection only mirrors self.selected, so its default
+        # click and drag bindings are replaced
+        for sequence in ('<Button-1>', '<Shift-Button-1>', '<Control-Button-1>'):
+            self.listbox.bind(sequence, self._on_click)
+        self.listbox.bind('<B1-Motion>', lambda e: 'break')
+        self.listbox.bind('<MouseWheel>', lambda e: self.scroll(-WHEEL_ROWS if e.delta > 0 else WHEEL_ROWS))
+        self.listbox.bind('<Button-4>', lambda e: self.scroll(-WHEEL_ROWS))
+        self.listbox.bind('<Button-5>', lambda e: self.scroll(WHEEL_ROWS))
+        for widget in (self.listbox, self.search_entry):
+            widget.bind('<Up>', lambda e: self._move_active(-1))
+            widget.bind('<Down>', lambda e: self._move_active(1))
+            widget.bind('<Prior>', lambda e: self._move_active(-self.height))
+            widget.bind('<Next>', lambda e: self._move_active(self.height))
+        self.listbox.bind('<space>', lambda e: self._toggle(self.active))
+        self.search_entry.bind('<Return>', lambda e: self._toggle(self.active))
+        self.render()
+
+    # Section: Data
+    def set_products(self, nicknames):
+        """Replaces every product, e.g. after the list changed on disk."""
+        self.index.set_products(nicknames)
+        self.selected &= set(self.index.names())
+        if self.active is not None and self.active not in self.index:
+            self.active = None
+        self._apply_filter()
+
+    def insert(self, nickname):
+        """Adds one product without rebuilding the list."""
+        if not self.index.add(nickname):
+            return
+        if self.index.matches(self.query, nickname):
+            lo, hi = self._bounds(nickname)
+            position = bisect_left(self.view, sort_key(nickname), lo, hi, key=sort_key)
+            self.view.insert(position, nickname)
+            if nickname.casefold().startswith(self.query):
+                self._split += 1
+            if position < self.top:
+                self.top += 1
+        self.render()
+
+    def delete(self, nickname):
+        """Removes one product without rebuilding the list."""
+        if not self.index.remove(nickname):
+            return
+        self.selected.discard(nickname)
+        if self.active == nickname:
+            self.active = None
+        position = self._position(nickname)
+        if position is not None:
+            del self.view[position]
+            if position < self._split:
+                self._split -= 1
+            if position < self.top:
+                self.top -= 1
+        self.render()
+
+    def selection(self):
+        """Selected nicknames in list order."""
+        return sorted(self.selected, key=sort_key)
+
+    def _bounds(self, nickname):
+        """The slice of the view nickname sorts into: prefix matches come first."""
+        if nickname.casefold().startswith(self.query):
+            return 0, self._split
+        return self._split, len(self.view)
+
+    def _position(self, nickname):
+        """Index of nickname in the view, or None; a bisect, not a scan."""
+        lo, hi = self._bounds(nickname)
+        position = bisect_left(self.view, sort_key(nickname), lo, hi, key=sort_key)
+        return position if position < hi and self.view[position] == nickname else None
+
+    # Section: Filtering
+    def _schedule_filter(self):
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._pending = None
+        self.query = self.search_var.get().strip().casefold()
+        self.view = self.index.search(self.query)
+        self._split = bisect_left(self.view, True, key=lambda n: not n.casefold().startswith(self.query))
+        self.top = 0
+        if self.view and (self.active is None or self._position(self.active) is None):
+            self.active = self.view[0] if self.query else None
+        self.render()
+
+    # Section: Rendering
+    def render(self):
+        """Redraws the visible rows only."""
+        total = len(self.view)
+        self.top = max(0, min(self.top, total - self.height))
+        rows = self.view[self.top:self.top + self.height]
+        self.listbox.delete(0, tk.END)
+        if rows:
+            self.listbox.insert(tk.END, *rows)
+        for i, nickname in enumerate(rows):
+            if nickname in self.selected:
+                self.listbox.selection_set(i)
+            if nickname == self.active:
+                self.listbox.itemconfig(i, background='#dde8f5')
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        shown = f"{total:,} of {len(self.index):,} products" if self.query else f"{total:,} products"
+        if self.selectmode == 'multiple' and self.selected:
+            shown += f", {len(self.selected):,} selected"
+        self.count_label.config(text=shown)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return 'break'
+
+    def see(self, nickname):
+        position = self._position(nickname)
+        if position is None:
+            return
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.height:
+            self.top = position - self.height + 1
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.top = int(float(amount) * len(self.view))
+        elif action == 'scroll':
+            self.top += int(amount) * (self.height if unit == 'pages' else 1)
+        self.render()
+
+    def _on_click(self, event):
+        row = self.listbox.nearest(event.y)
+        if 0 <= row < self.listbox.size():
+            self._toggle(self.view[self.top + row])
+        self.listbox.focus_set()
+        return 'break'
+
+    def _toggle(self, nickname):
+        if nickname is None:
+            return 'break'
+        self.active = nickname
+        if self.selectmode == 'multiple':
+            self.selected ^= {nickname}
+        else:
+            self.selected = {nickname}
+        self.render()
+        return 'break'
+
+    def _move_active(self, step):
+        if not self.view:
+            return 'break'
+        position = self._position(self.active) if self.active is not None else None
+        if position is None:
+            position = self.top - step
+        position = max(0, min(len(self.view) - 1, position + step))
+        self.active = self.view[position]
+        if self.selectmode != 'multiple':
+            self.selected = {self.active}
+        self.see(self.active)
+        self.render()
+        return 'break'
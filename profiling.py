@@ -0,0 +1,221 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+###############################################################################
+# PROFILING MODE
+#
+# Every entry point accepts --profile (cProfile) or --profile-sample (a
+# stack sampler with lower overhead on hot loops). TRACKER_PROFILE=1 (or
+# =sample) does the same for the GUIs and every script they launch. A
+# profiled run also traces allocations with tracemalloc and writes, to
+# profiles/<name>-<timestamp>/:
+#   summary.txt     wall/CPU time, peak traced memory, hottest functions
+#   profile.pstats  cProfile data (python -m pstats, snakeviz), or
+#   stacks.txt      sampled stacks in collapsed format (flamegraph.pl, speedscope)
+#   memory.txt      largest allocations by source line
+# When profiling is off, run_profiled calls the function directly; cProfile
+# and tracemalloc are not even imported.
+###############################################################################
+PROFILE_ENV = 'TRACKER_PROFILE'
+PROFILE_DIR = os.environ.get('TRACKER_PROFILE_DIR', 'profiles')
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 25
+
+def env_profile_mode():
+    """The mode TRACKER_PROFILE asks for ('cprofile', 'sample'), or None when unset."""
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    return value if value in PROFILE_MODES else 'cprofile'
+
+def profile_mode(argv=None):
+    """
+    The mode requested by --profile / --profile-sample in argv (default:
+    sys.argv), else by TRACKER_PROFILE; None when profiling is off. Lets a
+    script decide before its own argument parsing runs.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if '--profile-sample' in argv:
+        return 'sample'
+    if '--profile' in argv:
+        return 'cprofile'
+    return env_profile_mode()
+
+def add_profile_argument(parser):
+    """Adds --profile and --profile-sample to an argparse parser, defaulting to TRACKER_PROFILE."""
+    parser.add_argument('--profile', dest='profile', action='store_const', const='cprofile',
+                        default=env_profile_mode(),
+                        help=f"profile this run with cProfile and save the results under {PROFILE_DIR}/")
+    parser.add_argument('--profile-sample', dest='profile', action='store_const', const='sample',
+                        help="like --profile, but with a low-overhead stack sampler")
+
+def run_profiled(name, func, *args, mode=None, **kwargs):
+    """
+    Calls func(*args, **kwargs). With a mode, the call is profiled and the
+    artifacts are saved even if func raises or is interrupted with Ctrl+C.
+    """
+    if not mode:
+        return func(*args, **kwargs)
+    session = ProfileSession(name, mode)
+    session.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        session.stop()
+        session.save()
+
+# Section: Memory
+def rss_mb(peak=False):
+    """
+    Resident set size of this process in MB: the current size, or the largest
+    so far with peak=True. Read from /proc where it exists; elsewhere only
+    the peak is known, and NaN is returned where neither is supported.
+    """
+    field = 'VmHWM:' if peak else 'VmRSS:'
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+# Section: Sampling Profiler
+class StackSampler:
+    """Records the stack of one thread every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+# Section: Profile Session
+class ProfileSession:
+    def __init__(self, name, mode='cprofile'):
+        self.name = name
+        self.mode = mode
+        self.started_at = datetime.now()
+
+    def start(self):
+        import tracemalloc
+        tracemalloc.start()
+        if self.mode == 'sample':
+            self.profiler = StackSampler(threading.get_ident())
+            self.profiler.start()
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.wall_start, self.cpu_start = time.perf_counter(), time.process_time()
+
+    def stop(self):
+        import tracemalloc
+        self.wall = time.perf_counter() - self.wall_start
+        self.cpu = time.process_time() - self.cpu_start
+        if self.mode == 'sample':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+        self.memory_peak = tracemalloc.get_traced_memory()[1]
+        self.memory_snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        tracemalloc.stop()
+
+    def _hottest(self):
+        """[(own seconds or samples, cumulative, label)] for the profiled functions."""
+        if self.mode == 'sample':
+            own, cumulative = Counter(), Counter()
+            for stack, count in self.profiler.stacks.items():
+                frames = stack.split(';')
+                own[frames[-1]] += count
+                for frame in set(frames):
+                    cumulative[frame] += count
+            return [(own[label], cumulative[label], label) for label in cumulative]
+        import pstats
+        rows = []
+        for (filename, line, func), (_, _, own, cumulative, _) in pstats.Stats(self.profiler).stats.items():
+            # Built-ins have no source file
+            label = func if filename == '~' else f"{func} ({os.path.basename(filename)}:{line})"
+            rows.append((own, cumulative, label))
+        return rows
+
+    def summary(self):
+        rows = self._hottest()
+        if self.mode == 'sample':
+            total = max(sum(self.profiler.stacks.values()), 1)
+            unit = lambda value: f"{value * 100 / total:5.1f}% of {total} samples"
+        else:
+            unit = lambda value: f"{value:8.3f} s"
+        lines = [
+            f"Profile of {self.name} ({self.mode}), started {self.started_at:%Y-%m-%d %H:%M:%S}",
+            f"Wall {self.wall:.2f} s, CPU {self.cpu:.2f} s, peak traced memory {self.memory_peak / 1024 / 1024:.1f} MB",
+            "",
+            "Hottest functions by own time:",
+        ]
+        lines += [f"  {unit(own)}  {label}" for own, _, label in sorted(rows, reverse=True)[:TOP_FUNCTIONS] if own]
+        lines += ["", "Hottest functions including callees:"]
+        lines += [f"  {unit(cumulative)}  {label}"
+                  for _, cumulative, label in sorted(rows, key=lambda row: row[1], reverse=True)[:TOP_FUNCTIONS]]
+        lines += ["", "Largest allocations still held at the end:"]
+        for stat in self.memory_snapshot.statistics('lineno')[:5]:
+            lines.append(f"  {stat.size / 1024:10.1f} KB  {stat.count:8} blocks  {stat.traceback}")
+        return '\n'.join(lines) + '\n'
+
+    def save(self):
+        """Writes the artifacts and prints the summary; returns the artifact directory."""
+        directory = os.path.join(PROFILE_DIR, f"{self.name}-{self.started_at:%Y%m%d-%H%M%S}")
+        os.makedirs(directory, exist_ok=True)
+        summary = self.summary()
+        with open(os.path.join(directory, 'summary.txt'), 'w') as file:
+            file.write(summary)
+        if self.mode == 'sample':
+            with open(os.path.join(directory, 'stacks.txt'), 'w') as file:
+                for stack, count in self.profiler.stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+        else:
+            self.profiler.dump_stats(os.path.join(directory, 'profile.pstats'))
+        with open(os.path.join(directory, 'memory.txt'), 'w') as file:
+            file.write(f"Peak traced memory: {self.memory_peak / 1024 / 1024:.1f} MB\n\n")
+            for stat in self.memory_snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                file.write(f"{stat.size / 1024:10.1f} KB  {stat.count:8} blocks  {stat.traceback}\n")
+        print(summary)
+        print(f"Profile saved to {directory}")
+        return directory
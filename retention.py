@@ -0,0 +1,247 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import (compress_runs, expand_runs, history_lock, is_run_length, load_history, save_history,
+                     to_local_datetime)
+from snapshot import SnapshotReader, publish_snapshot
+from profiling import add_profile_argument, profile_mode, run_profiled
+
+# Raw observations newer than this are kept as-is
+RAW_RETENTION_DAYS = 14
+# Hourly bars newer than this are kept; older ones are rolled into daily bars
+HOURLY_RETENTION_DAYS = 90
+# Graph reads pick the coarsest resolution that still gives this many points
+MIN_POINTS = 60
+
+HOUR = 3600
+DAY = 86400
+RESOLUTION_SECONDS = {'day': DAY, 'hour': HOUR, 'raw': 1}
+
+###############################################################################
+# 1. OHLC BARS TABLE
+###############################################################################
+def initialize_bars_table(conn):
+    """Creates the price_bars table holding hourly and daily OHLC bars."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_bars (
+            nickname TEXT,
+            resolution TEXT,
+            bucket_start INTEGER,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            count INTEGER,
+            PRIMARY KEY (nickname, resolution, bucket_start)
+        )
+    ''')
+
+def ohlc_bars(nicknames, ts, prices, bucket_seconds, counts=None, lows=None, highs=None, closes=None):
+    """
+    Aggregates observations (or finer bars) into OHLC bars of bucket_seconds.
+    When rolling bars up, prices are the bar opens and counts/lows/highs/closes
+    carry the finer bars' values.
+    Returns a DataFrame with nickname, bucket_start, open, high, low, close, count.
+    """
+    df = pd.DataFrame({
+        'nickname': nicknames,
+        'bucket_start': ts - ts % bucket_seconds,
+        'ts': ts,
+        'open': prices,
+        'high': prices if highs is None else highs,
+        'low': prices if lows is None else lows,
+        'close': prices if closes is None else closes,
+        'count': np.ones(len(ts), dtype=np.int64) if counts is None else counts,
+    }).sort_values(['nickname', 'ts'], kind='stable')
+    bars = df.groupby(['nickname', 'bucket_start'], sort=False).agg(
+        open=('open', 'first'),
+        high=('high', 'max'),
+        low=('low', 'min'),
+        close=('close', 'last'),
+        count=('count', 'sum'),
+    )
+    return bars.reset_index()
+
+def replace_bars(conn, bars, resolution):
+    """Writes ohlc_bars output at resolution ('hour' or 'day'), replacing bars for the same buckets."""
+    conn.executemany('INSERT OR REPLACE INTO price_bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+        (str(row.nickname), resolution, int(row.bucket_start), float(row.open), float(row.high),
+         float(row.low), float(row.close), int(row.count))
+        for row in bars.itertuples(index=False)
+    ])
+
+###############################################################################
+# 2. COMPACTION JOB
+###############################################################################
+def check_retention(raw_days, hourly_days):
+    """Raises ValueError unless raw rows are kept for less time than hourly bars."""
+    if raw_days >= hourly_days:
+        raise ValueError(f"raw_days ({raw_days}) must be less than hourly_days ({hourly_days})")
+
+def compact_history(csv_file='price_history.csv', db_name='amazon_tracker.db',
+                    raw_days=RAW_RETENTION_DAYS, hourly_days=HOURLY_RETENTION_DAYS, now=None):
+    """
+    Rolls old raw observations into hourly bars and old hourly bars into daily bars.
+
+    Cutoffs are aligned to whole hours/days, so every bucket is built from all
+    of its rows at once and written with INSERT OR REPLACE. The bars are
+    committed before the raw rows are removed from the CSV, so an interrupted
+    run simply rebuilds the same bars next time: the job is idempotent and
+    only ever touches data that crossed a cutoff since the last run.
+    raw_days must be less than hourly_days; otherwise daily bars would be
+    rebuilt from only the newest hourly bars, replacing the stored ones.
+    Returns a dictionary describing what was compacted.
+    """
+    check_retention(raw_days, hourly_days)
+    now = int(time.time() if now is None else now)
+    raw_cutoff = (now - raw_days * DAY) // HOUR * HOUR
+    hourly_cutoff = (now - hourly_days * DAY) // DAY * DAY
+    summary = {'raw_rows_compacted': 0, 'hourly_bars_written': 0,
+               'hourly_bars_rolled': 0, 'daily_bars_written': 0}
+
+    conn = sqlite3.connect(db_name)
+    initialize_bars_table(conn)
+
+    # Raw -> hourly; a fetch cycle merging meanwhile waits instead of losing its rows
+    with history_lock(csv_file):
+        stored_df = load_history(csv_file)
+        raw_df = expand_runs(stored_df)
+        if not raw_df.empty:
+            ts = raw_df['ts'].to_numpy(dtype=np.int64)
+            prices = pd.to_numeric(raw_df['price'], errors='coerce').to_numpy(dtype=np.float64)
+            old = (ts >= 0) & (ts < raw_cutoff)
+            if old.any():
+                usable = old & np.isfinite(prices) & raw_df['nickname'].notna().to_numpy()
+                hourly = ohlc_bars(raw_df['nickname'].to_numpy(dtype=object)[usable], ts[usable],
+                               prices[usable], HOUR)
+                replace_bars(conn, hourly, 'hour')
+                conn.commit()
+                kept_df = raw_df[~old]
+                kept_df = compress_runs(kept_df) if is_run_length(stored_df) else kept_df
+                save_history(kept_df, csv_file)
+                publish_snapshot(kept_df, csv_file)
+                summary['raw_rows_compacted'] = int(old.sum())
+                summary['hourly_bars_written'] = len(hourly)
+
+    # Hourly -> daily
+    old_hourly = pd.read_sql_query('''
+        SELECT nickname, bucket_start, open, high, low, close, count FROM price_bars
+        WHERE resolution = 'hour' AND bucket_start < ?
+    ''', conn, params=(hourly_cutoff,))
+    if not old_hourly.empty:
+        daily = ohlc_bars(old_hourly['nickname'].to_numpy(dtype=object),
+                      old_hourly['bucket_start'].to_numpy(dtype=np.int64),
+                      old_hourly['open'].to_numpy(), DAY,
+                      counts=old_hourly['count'].to_numpy(), lows=old_hourly['low'].to_numpy(),
+                      highs=old_hourly['high'].to_numpy(), closes=old_hourly['close'].to_numpy())
+        replace_bars(conn, daily, 'day')
+        conn.execute("DELETE FROM price_bars WHERE resolution = 'hour' AND bucket_start < ?",
+                     (hourly_cutoff,))
+        conn.commit()
+        summary['hourly_bars_rolled'] = len(old_hourly)
+        summary['daily_bars_written'] = len(daily)
+
+    conn.close()
+    return summary
+
+###############################################################################
+# 3. RESOLUTION-AWARE READS
+###############################################################################
+def choose_resolution(span_seconds, min_points=MIN_POINTS):
+    """Returns the coarsest of 'day', 'hour', 'raw' giving at least min_points buckets."""
+    for resolution in ('day', 'hour'):
+        if span_seconds / RESOLUTION_SECONDS[resolution] >= min_points:
+            return resolution
+    return 'raw'
+
+def _downsample(df, resolution):
+    """Keeps the last price of each bucket (the bar close) at the given resolution."""
+    if resolution == 'raw' or df.empty:
+        return df
+    seconds = RESOLUTION_SECONDS[resolution]
+    df = df.assign(ts=df['ts'] - df['ts'] % seconds)
+    return df.groupby(['nickname', 'ts'], sort=False, as_index=False)['price'].last()
+
+def load_price_series(nicknames=None, start=None, end=None, csv_file='price_history.csv',
+                      db_name='amazon_tracker.db', min_points=MIN_POINTS, raw_df=None):
+    """
+    Returns a DataFrame with nickname, ts, price and date (local datetime) for
+    the requested products and time range, read across raw rows, hourly and
+    daily bars. The resolution is the coarsest one that still fills the span
+    with min_points buckets, so a multi-year chart reads a few hundred daily
+    closes per product instead of every raw observation.
+    Callers that already hold the raw history can pass it as raw_df;
+    otherwise the published snapshot is used when it mirrors the CSV.
+    """
+    if raw_df is None:
+        snapshot = SnapshotReader(csv_file).fresh()
+        raw_df = snapshot.frame(nicknames) if snapshot is not None else load_history(csv_file)
+    raw = expand_runs(raw_df)[['nickname', 'ts', 'price']]
+    raw = raw[raw['price'].notna() & raw['nickname'].notna()]
+
+    conn = sqlite3.connect(db_name)
+    initialize_bars_table(conn)
+    query = 'SELECT nickname, resolution, bucket_start AS ts, close AS price FROM price_bars WHERE 1 = 1'
+    params = []
+    if start is not None:
+        query += ' AND bucket_start >= ?'
+        params.append(int(start) - DAY)
+    if end is not None:
+        query += ' AND bucket_start <= ?'
+        params.append(int(end))
+    bars = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+
+    if nicknames:
+        raw = raw[raw['nickname'].isin(nicknames)]
+        bars = bars[bars['nickname'].isin(nicknames)]
+    if start is not None:
+        raw = raw[raw['ts'] >= start]
+    if end is not None:
+        raw = raw[raw['ts'] <= end]
+
+    all_ts = np.r_[raw['ts'].to_numpy(), bars['ts'].to_numpy()]
+    if len(all_ts) == 0:
+        return pd.DataFrame(columns=['nickname', 'ts', 'price', 'date'])
+    span = (end if end is not None else all_ts.max()) - (start if start is not None else all_ts.min())
+    resolution = choose_resolution(span, min_points)
+
+    hourly = bars[bars['resolution'] == 'hour'][['nickname', 'ts', 'price']]
+    daily = bars[bars['resolution'] == 'day'][['nickname', 'ts', 'price']]
+    series = pd.concat([
+        daily,
+        hourly if resolution != 'day' else _downsample(hourly, 'day'),
+        _downsample(raw[['nickname', 'ts', 'price']], resolution),
+    ], ignore_index=True).sort_values(['nickname', 'ts'])
+
+    series['date'] = to_local_datetime(series['ts'])
+    series = series.reset_index(drop=True)
+    series.attrs['resolution'] = resolution
+    return series
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old price history into OHLC bars.")
+    parser.add_argument('--csv', default='price_history.csv')
+    parser.add_argument('--db', default='amazon_tracker.db')
+    parser.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS)
+    parser.add_argument('--hourly-days', type=int, default=HOURLY_RETENTION_DAYS)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    try:
+        check_retention(args.raw_days, args.hourly_days)
+    except ValueError:
+        parser.error(f"--raw-days ({args.raw_days}) must be less than --hourly-days ({args.hourly_days})")
+
+    before = os.path.getsize(args.csv) if os.path.exists(args.csv) else 0
+    summary = compact_history(args.csv, args.db, args.raw_days, args.hourly_days)
+    after = os.path.getsize(args.csv) if os.path.exists(args.csv) else 0
+    print(f"Compaction finished: {summary}")
+    print(f"{args.csv}: {before:,} -> {after:,} bytes")
+
+if __name__ == "__main__":
+    run_profiled('retention', main, mode=profile_mode())
@@ -6,7 +6,28 @@ setup(
     name='capstone_project',
     version='1.0.0',
     packages=find_packages(),
+    py_modules=[
+        'analytics',
+        'bulk_import',
+        'api_server',
+        'clean_data',
+        'crawler',
+        'daemon',
+        'generate_data',
+        'graph',
+        'history',
+        'offers',
+        'product_list',
+        'profiling',
+        'retention',
+        'scheduler',
+        'snapshot',
+        'tracker_cli',
+        'user_interface',
+        'work_queue',
+    ],
     install_requires=[
+        'numpy',
         'pandas',
         'matplotlib',
         'seaborn',
@@ -18,8 +39,8 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            # Example: 'run-generate-data=CapstoneProject.generate_data:main'
-            # You can define scripts you want to run directly from CLI here
+            # tracker daemon | fetch | export | import | stats
+            'tracker=tracker_cli:main',
         ],
     },
     author='Chris Goodpaster',
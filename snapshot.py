@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from history import expand_runs, file_stamp, replace_file
+
+###############################################################################
+# MEMORY-MAPPED HISTORY SNAPSHOT
+#
+# price_history_snapshot/
+#   CURRENT              name of the published version, e.g. "v00000042"
+#   v00000042/
+#     codes.npy          int32 product code per observation
+#     ts.npy             int64 epoch seconds
+#     price.npy          float64
+#     offsets.npy        int64, rows of product i are offsets[i]:offsets[i + 1]
+#     strings.json       nicknames, titles and urls indexed by product code
+#     manifest.json      version, row count, newest ts and the CSV it mirrors
+#
+# Observations are sorted by (product, ts), so one product's series is a
+# contiguous slice. Readers np.load the arrays with mmap_mode='r': every
+# process shares the same page-cache pages and nothing is parsed. A new
+# version is written to a temporary directory, renamed into place and only
+# then named in CURRENT, so a reader never sees a half-written snapshot.
+###############################################################################
+CURRENT_FILE = 'CURRENT'
+ARRAYS = ('codes', 'ts', 'price', 'offsets')
+# Versions kept besides the current one, for readers that still have them open
+KEEP_VERSIONS = 1
+
+def snapshot_dir_for(csv_file='price_history.csv'):
+    """price_history.csv -> price_history_snapshot/ next to it."""
+    return os.path.splitext(csv_file)[0] + '_snapshot'
+
+def _read_current(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as current:
+            return current.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# Section: Publish
+def publish_snapshot(history_df, csv_file='price_history.csv'):
+    """
+    Writes history_df (observations or change-only runs) as a new snapshot
+    version for csv_file and makes it current. Call it right after the CSV
+    itself was written so the manifest records the CSV's final stat.
+    Returns the published version name.
+    """
+    snapshot_dir = snapshot_dir_for(csv_file)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    df = expand_runs(history_df)
+    df = df[df['nickname'].notna() & df['price'].notna()]
+    ts = df['ts'].to_numpy(dtype=np.int64)
+    prices = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64)
+    names, codes = np.unique(df['nickname'].astype(str).to_numpy(), return_inverse=True)
+    order = np.lexsort((ts, codes))
+    codes, ts, prices = codes[order].astype(np.int32), ts[order], prices[order]
+    offsets = np.searchsorted(codes, np.arange(len(names) + 1)).astype(np.int64)
+
+    # Latest title and URL of each product
+    last_rows = order[offsets[1:] - 1] if len(names) else np.array([], dtype=np.int64)
+    titles = df['title'].to_numpy(dtype=object)[last_rows] if 'title' in df.columns else names
+    urls = df['url'].to_numpy(dtype=object)[last_rows] if 'url' in df.columns else [None] * len(names)
+    strings = {
+        'nicknames': names.tolist(),
+        'titles': [None if pd.isna(t) else str(t) for t in titles],
+        'urls': [None if pd.isna(u) else str(u) for u in urls],
+    }
+
+    current = _read_current(snapshot_dir)
+    number = int(current[1:]) + 1 if current else 1
+    tmp_dir = os.path.join(snapshot_dir, f".tmp-{os.getpid()}-{time.time_ns()}")
+    os.makedirs(tmp_dir)
+    try:
+        for name, array in zip(ARRAYS, (codes, ts, prices, offsets)):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, 'strings.json'), 'w') as file:
+            json.dump(strings, file)
+
+        # Another publisher may have taken this number; move on to the next one
+        while True:
+            version = f"v{number:08d}"
+            manifest = {'version': version, 'rows': int(len(ts)), 'products': int(len(names)),
+                        'max_ts': int(ts.max()) if len(ts) else None,
+                        'csv_file': os.path.basename(csv_file), 'csv_stamp': file_stamp(csv_file),
+                        'published': int(time.time())}
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as file:
+                json.dump(manifest, file)
+            try:
+                os.rename(tmp_dir, os.path.join(snapshot_dir, version))
+                break
+            except OSError:
+                if not os.path.exists(os.path.join(snapshot_dir, version)):
+                    raise
+                number += 1
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(snapshot_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(current_tmp, 'w') as current_file:
+        current_file.write(version)
+    replace_file(current_tmp, os.path.join(snapshot_dir, CURRENT_FILE))
+    _prune(snapshot_dir, version)
+    return version
+
+def _prune(snapshot_dir, current):
+    """Deletes versions older than the current one and the KEEP_VERSIONS before it."""
+    versions = sorted(name for name in os.listdir(snapshot_dir) if name.startswith('v') and name <= current)
+    for name in versions[:-(KEEP_VERSIONS + 1)]:
+        # A reader on Windows may still have the files mapped; try again next time
+        shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+# Section: Read
+class HistorySnapshot:
+    """One published version, memory-mapped read-only."""
+
+    def __init__(self, snapshot_dir, version):
+        path = os.path.join(snapshot_dir, version)
+        with open(os.path.join(path, 'manifest.json')) as file:
+            self.manifest = json.load(file)
+        with open(os.path.join(path, 'strings.json')) as file:
+            strings = json.load(file)
+        self.version = version
+        self.nicknames = strings['nicknames']
+        self.titles = strings['titles']
+        self.urls = strings['urls']
+        self.index = {name: i for i, name in enumerate(self.nicknames)}
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r'))
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def mirrors(self, csv_file):
+        """True if csv_file has not been rewritten since this snapshot was published."""
+        stamp = file_stamp(csv_file)
+        # The manifest stores the stamp as a JSON list
+        return stamp is not None and self.manifest['csv_stamp'] == list(stamp)
+
+    def series(self, nickname, start=None, end=None):
+        """Returns (ts, price) views of one product between start and end; no copy is made."""
+        i = self.index.get(nickname)
+        if i is None:
+            return self.ts[:0], self.price[:0]
+        first, last = int(self.offsets[i]), int(self.offsets[i + 1])
+        ts = self.ts[first:last]
+        lo = first + (int(np.searchsorted(ts, start, side='left')) if start is not None else 0)
+        hi = first + (int(np.searchsorted(ts, end, side='right')) if end is not None else len(ts))
+        return self.ts[lo:hi], self.price[lo:hi]
+
+    def frame(self, nicknames=None, start=None, end=None):
+        """
+        Returns the requested products and time range as a history DataFrame
+        (nickname, title, price, url, ts). Only the selected slices are copied.
+        """
+        frames = []
+        for nickname in (nicknames if nicknames is not None else self.nicknames):
+            ts, prices = self.series(nickname, start, end)
+            if len(ts):
+                i = self.index[nickname]
+                frames.append(pd.DataFrame({'nickname': nickname, 'title': self.titles[i],
+                                            'price': np.array(prices), 'url': self.urls[i],
+                                            'ts': np.array(ts)}))
+        if not frames:
+            return pd.DataFrame({'nickname': pd.Series(dtype=object), 'title': pd.Series(dtype=object),
+                                 'price': pd.Series(dtype='float64'), 'url': pd.Series(dtype=object),
+                                 'ts': pd.Series(dtype='int64')})
+        return pd.concat(frames, ignore_index=True)
+
+class SnapshotReader:
+    """
+    Keeps the current snapshot mapped and reopens it only when CURRENT names
+    a new version. Checking costs one small file read.
+    """
+
+    def __init__(self, csv_file='price_history.csv'):
+        self.csv_file = csv_file
+        self.snapshot_dir = snapshot_dir_for(csv_file)
+        self.snapshot = None
+
+    def current(self):
+        """Returns the current HistorySnapshot, or None if none was published."""
+        for _ in range(3):
+            version = _read_current(self.snapshot_dir)
+            if version is None:
+                return None
+            if self.snapshot is not None and self.snapshot.version == version:
+                return self.snapshot
+            try:
+                self.snapshot = HistorySnapshot(self.snapshot_dir, version)
+                return self.snapshot
+            except FileNotFoundError:
+                # Pruned between reading CURRENT and opening it; read CURRENT again
+                continue
+        return None
+
+    def fresh(self):
+        """Like current(), but None unless the snapshot still mirrors the CSV."""
+        snapshot = self.current()
+        return snapshot if snapshot is not None and snapshot.mirrors(self.csv_file) else None
@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_data import run_fetch_cycle
+from history import HISTORY_COLUMNS, load_history, save_history
+from snapshot import SnapshotReader
+from stub_server import free_port, serve_stub, synthetic_product_urls, wait_for_port
+
+# Section: Seed History
+def seed_history(csv_file, product_urls, rows):
+    """Writes `rows` older observations so every load, merge and save takes a while."""
+    rng = np.random.default_rng(0)
+    names = np.array(list(product_urls))
+    now = int(time.time())
+    picks = rng.integers(0, len(names), rows)
+    df = pd.DataFrame({'nickname': names[picks], 'title': 'Seeded product',
+                       'price': np.round(rng.uniform(5, 500, rows), 2),
+                       'url': [product_urls[n] for n in names[picks]],
+                       'ts': now - 86400 - rng.integers(0, 30 * 86400, rows)})
+    save_history(df.drop_duplicates(['nickname', 'ts']), csv_file)
+
+# Section: Writers and Readers
+def _writer(number, product_urls, db_name, csv_file, cycles, max_pause, results):
+    """
+    Runs fetch cycles into csv_file and db_name, which every writer shares,
+    as the scheduler, a manual check and the daemon do. Even writers keep the
+    history between cycles like the daemon; odd writers re-read it every
+    cycle like generate_data.py. Each cycle starts after a random pause of
+    up to max_pause seconds, so cycles start while others are mid-fetch.
+    """
+    rng = random.Random(number)
+    existing_df, durations, errors = None, [], []
+    for _ in range(cycles):
+        time.sleep(rng.uniform(0, max_pause))
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                history = run_fetch_cycle(product_urls, db_name=db_name, csv_file=csv_file,
+                                          existing_df=existing_df)
+            existing_df = history if number % 2 == 0 else None
+        except Exception as e:
+            errors.append(f"writer {number}: {type(e).__name__}: {e}")
+        durations.append(time.perf_counter() - start)
+    results.put(('writer', number, {'durations': durations, 'errors': errors}))
+
+def _reader(number, csv_file, done, results):
+    """
+    Reads the CSV and the snapshot until the writers finish. Writers only
+    add rows, so every read must parse and no read may have fewer rows than
+    an earlier one.
+    """
+    reader = SnapshotReader(csv_file)
+    latencies, errors = [], []
+    csv_rows = snapshot_rows = 0
+    reads = 0
+    while not done.is_set():
+        start = time.perf_counter()
+        try:
+            if reads % 2 == 0:
+                df = load_history(csv_file)
+                if list(df.columns) != HISTORY_COLUMNS or df['ts'].dtype != np.int64 \
+                        or df['nickname'].isna().any():
+                    errors.append(f"reader {number}: malformed read ({len(df)} rows, {list(df.columns)})")
+                if len(df) < csv_rows:
+                    errors.append(f"reader {number}: CSV went from {csv_rows} to {len(df)} rows")
+                csv_rows = max(csv_rows, len(df))
+            else:
+                snapshot = reader.current()
+                if snapshot is not None:
+                    frame = snapshot.frame()
+                    if len(frame) != len(snapshot):
+                        errors.append(f"reader {number}: snapshot {snapshot.version} is incomplete")
+                    if len(snapshot) < snapshot_rows:
+                        errors.append(f"reader {number}: snapshot went from {snapshot_rows} "
+                                      f"to {len(snapshot)} rows")
+                    snapshot_rows = max(snapshot_rows, len(snapshot))
+        except Exception as e:
+            errors.append(f"reader {number}: {type(e).__name__}: {e}")
+        latencies.append(time.perf_counter() - start)
+        reads += 1
+    results.put(('reader', number, {'latencies': latencies, 'errors': errors}))
+
+# Section: Stress Run
+def run_stress(writers=3, readers=4, cycles=4, products=100, seed_rows=200_000, stall_seconds=5.0,
+               max_pause=5.0):
+    """
+    Runs `writers` processes doing overlapping fetch cycles against the stub
+    server, all sharing one database and one CSV, while `readers` processes
+    read the history as fast as they can. Every request changes the stub's
+    price, so each fetch is a distinct observation and the CSV must end up
+    with exactly writers x cycles x products new rows.
+    Prints timings and problems; returns True if there were none.
+    """
+    port = free_port()
+    server = multiprocessing.Process(target=serve_stub, args=(port, {'mutation_rate': 1.0}), daemon=True)
+    server.start()
+    wait_for_port(port)
+    product_urls = synthetic_product_urls(f"http://127.0.0.1:{port}", products)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, 'price_history.csv')
+        db_name = os.path.join(tmp, 'amazon_tracker.db')
+        seed_history(csv_file, product_urls, seed_rows)
+        seeded = len(load_history(csv_file))
+        print(f"{writers} writer(s) x {cycles} fetch cycles of {products} products, {readers} reader(s), "
+              f"{seed_rows:,} seeded rows")
+
+        results, done = multiprocessing.Queue(), multiprocessing.Event()
+        procs = [multiprocessing.Process(target=_reader, args=(r, csv_file, done, results))
+                 for r in range(readers)]
+        procs += [multiprocessing.Process(target=_writer,
+                                          args=(w, product_urls, db_name, csv_file, cycles, max_pause, results))
+                  for w in range(writers)]
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+
+        stats = {'writer': {}, 'reader': {}}
+        while len(stats['writer']) < writers:
+            try:
+                kind, number, payload = results.get(timeout=5)
+                stats[kind][number] = payload
+            except queue.Empty:
+                if not any(proc.is_alive() for proc in procs[readers:]):
+                    break
+        elapsed = time.perf_counter() - start
+        done.set()
+        while len(stats['reader']) < readers:
+            try:
+                kind, number, payload = results.get(timeout=30)
+                stats[kind][number] = payload
+            except queue.Empty:
+                break
+        for proc in procs:
+            proc.join(timeout=10)
+        server.terminate()
+
+        final_rows = len(load_history(csv_file))
+        leftovers = [name for name in os.listdir(tmp) if name.endswith('.tmp')]
+
+    durations = [d for s in stats['writer'].values() for d in s['durations']]
+    latencies = np.array([l for s in stats['reader'].values() for l in s['latencies']] or [0.0])
+    errors = [e for kind in stats.values() for s in kind.values() for e in s['errors']]
+    problems = list(errors)
+    if len(stats['writer']) < writers or len(stats['reader']) < readers:
+        problems.append(f"only {len(stats['writer'])} writer(s) and {len(stats['reader'])} reader(s) reported")
+    expected = writers * cycles * products
+    if final_rows - seeded != expected:
+        problems.append(f"the CSV gained {final_rows - seeded:,} rows; expected {expected:,} "
+                        f"({writers} x {cycles} x {products})")
+    if leftovers:
+        problems.append(f"temporary files left behind: {leftovers}")
+    if latencies.max() > stall_seconds:
+        problems.append(f"a read took {latencies.max():.1f}s (stall threshold {stall_seconds}s)")
+
+    print(f"Finished in {elapsed:.1f}s; final CSV has {final_rows:,} rows")
+    if durations:
+        print(f"Fetch cycles: {len(durations)}, {np.mean(durations):.2f}s mean, {max(durations):.2f}s max")
+    print(f"Reads: {len(latencies):,}, latency p50 {np.percentile(latencies, 50) * 1000:.0f} ms, "
+          f"p99 {np.percentile(latencies, 99) * 1000:.0f} ms, max {latencies.max() * 1000:.0f} ms")
+    for problem in problems[:20]:
+        print(f"PROBLEM: {problem}")
+    if len(problems) > 20:
+        print(f"... and {len(problems) - 20} more")
+    print("OK: no corruption, lost updates or stalls." if not problems else f"{len(problems)} problem(s).")
+    return not problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent fetch cycles and readers against one history CSV.")
+    parser.add_argument('--writers', type=int, default=3)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--cycles', type=int, default=4)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--seed-rows', type=int, default=200_000)
+    parser.add_argument('--stall-seconds', type=float, default=5.0, help="slowest acceptable single read")
+    parser.add_argument('--max-pause', type=float, default=5.0, help="longest random pause before a cycle")
+    args = parser.parse_args()
+    ok = run_stress(args.writers, args.readers, args.cycles, args.products, args.seed_rows, args.stall_seconds,
+                    args.max_pause)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal product page with the elements fetch_amazon_data looks for
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>
+<div id="centerCol">
+  <span id="productTitle" class="a-size-large product-title-word-break">{title}</span>
+  <div id="corePrice_feature_div">
+    <span class="a-price"><span class="a-offscreen">${price:.2f}</span></span>
+  </div>
+</div>
+{padding}
+</body></html>
+"""
+
+# First displayed price on a product page (replayed pages have their price rewritten)
+PRICE_PATTERN = re.compile(rb'(<span class="a-offscreen">\s*\$)([\d,]+(?:\.\d{2})?)')
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+# Real product pages are several hundred KB of markup; padding mimics that
+PADDING_BLOCK = '<div class="a-section"><ul><li><span class="a-list-item">Filler feature bullet</span></li></ul></div>\n'
+
+# Section: Synthetic Products
+def synthetic_asin(index):
+    """Returns a stable ten-character fake ASIN for the given index."""
+    return f"B{index:09d}"
+
+def synthetic_price(asin):
+    """Derives a stable price between $5 and $500 from the ASIN."""
+    digest = hashlib.md5(asin.encode()).digest()
+    return 5 + int.from_bytes(digest[:4], 'big') % 49500 / 100
+
+def synthetic_product_urls(base_url, count):
+    """Returns a {nickname: url} dictionary of count products served by the stub."""
+    return {f"product-{i}": f"{base_url}/dp/{synthetic_asin(i)}" for i in range(count)}
+
+def write_product_urls(urls_file, base_url, count):
+    """Writes a product_urls.json for count synthetic products so the tracker can crawl the stub."""
+    with open(urls_file, 'w') as file:
+        json.dump(synthetic_product_urls(base_url, count), file, indent=2)
+
+def make_padding(page_kb):
+    """Returns roughly page_kb kilobytes of filler markup."""
+    repeats = page_kb * 1024 // len(PADDING_BLOCK)
+    return PADDING_BLOCK * repeats
+
+# Section: Replay
+def load_recordings(replay_dir):
+    """
+    Loads pages saved by fetch_amazon_data's recording mode (TRACKER_RECORD_DIR).
+    Returns {key: (status, content_type, body)} keyed by ASIN.
+    """
+    recordings = {}
+    for name in sorted(os.listdir(replay_dir)):
+        if not name.endswith('.json'):
+            continue
+        key = name[:-len('.json')]
+        try:
+            with open(os.path.join(replay_dir, name)) as meta_file:
+                meta = json.load(meta_file)
+            with open(os.path.join(replay_dir, f"{key}.html"), 'rb') as page:
+                body = page.read()
+        except (OSError, ValueError) as e:
+            print(f"Skipping recording {key}: {e}")
+            continue
+        recordings[key] = (meta.get('status', 200), meta.get('content_type', 'text/html'), body)
+    return recordings
+
+def recorded_price(body):
+    """Returns the first displayed price in a recorded page, or None."""
+    match = PRICE_PATTERN.search(body)
+    if not match:
+        return None
+    try:
+        return float(match.group(2).replace(b',', b''))
+    except ValueError:
+        return None
+
+# Section: Simulated Behaviour
+class StubBehaviour:
+    """
+    Decides how each request is answered: latency, injected errors and
+    throttling, and the current (possibly mutated) price of every ASIN.
+    All randomness comes from one seeded generator so runs are repeatable.
+    """
+
+    def __init__(self, latency=0.0, latency_dist='fixed', latency_spread=0.0, error_rate=0.0,
+                 throttle_rate=0.0, mutation_rate=0.0, seed=None):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.mutation_rate = mutation_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.prices = {}
+        self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'throttled': 0, 'not_found': 0,
+                       'mutations': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def sample_latency(self):
+        """
+        Returns a delay in seconds with mean self.latency.
+        uniform: mean +/- spread seconds; exponential: spread is ignored;
+        lognormal: spread is sigma of the underlying normal (long tail).
+        """
+        if self.latency <= 0:
+            return 0.0
+        with self.lock:
+            if self.latency_dist == 'uniform':
+                return max(0.0, self.random.uniform(self.latency - self.latency_spread,
+                                                    self.latency + self.latency_spread))
+            if self.latency_dist == 'exponential':
+                return self.random.expovariate(1 / self.latency)
+            if self.latency_dist == 'lognormal':
+                sigma = self.latency_spread
+                return self.random.lognormvariate(math.log(self.latency) - sigma * sigma / 2, sigma)
+        return self.latency
+
+    def injected_status(self):
+        """Returns 500 or 503 for an injected failure, or None to serve the page."""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            return 503
+        return None
+
+    def current_price(self, asin, base_price):
+        """Returns the ASIN's price, moving it by up to 20% with probability mutation_rate."""
+        with self.lock:
+            price = self.prices.get(asin, base_price)
+            if self.mutation_rate and self.random.random() < self.mutation_rate:
+                price = max(0.01, round(price * self.random.uniform(0.8, 1.2), 2))
+                self.counts['mutations'] += 1
+            self.prices[asin] = price
+            return price
+
+# Section: Request Handler
+class StubProductHandler(BaseHTTPRequestHandler):
+    """
+    Serves /dp/<ASIN> pages and /__stats (request counters as JSON);
+    everything else is a 404.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        behaviour = self.server.behaviour
+        path = self.path.split('?')[0]
+        if path == '/__stats':
+            with behaviour.lock:
+                body = json.dumps(behaviour.counts).encode()
+            self._send(200, 'application/json', body)
+            return
+
+        parts = path.strip('/').split('/')
+        if len(parts) < 2 or parts[-2] != 'dp':
+            behaviour.count('not_found')
+            self.send_error(404)
+            return
+
+        behaviour.count('requests')
+        delay = behaviour.sample_latency()
+        if delay:
+            time.sleep(delay)
+
+        status = behaviour.injected_status()
+        if status == 500:
+            behaviour.count('errors')
+            self._send(500, 'text/html', b'<html><body>Internal Server Error</body></html>')
+            return
+        if status == 503:
+            # Amazon answers throttled clients with a 503 and a captcha page
+            behaviour.count('throttled')
+            self._send(503, 'text/html', b'<html><body>Robot Check</body></html>',
+                       {'Retry-After': '1'})
+            return
+
+        asin = parts[-1]
+        if self.server.recordings:
+            status, content_type, body = self._replayed_page(asin)
+        else:
+            price = behaviour.current_price(asin, synthetic_price(asin))
+            status, content_type = 200, 'text/html; charset=utf-8'
+            body = PAGE_TEMPLATE.format(title=f"Stub Product {asin}", price=price,
+                                        padding=self.server.padding).encode()
+        behaviour.count('ok' if status == 200 else 'errors')
+        self._send(status, content_type, body)
+
+    def _replayed_page(self, asin):
+        """
+        Returns the recording for asin. ASINs that were never recorded (e.g.
+        thousands of synthetic ones) reuse a recording chosen by hash, with
+        the price rewritten so every ASIN still gets its own series.
+        """
+        recordings = self.server.recordings
+        if asin in recordings:
+            status, content_type, body = recordings[asin]
+            base = recorded_price(body)
+        else:
+            keys = self.server.recording_keys
+            index = int.from_bytes(hashlib.md5(asin.encode()).digest()[:4], 'big') % len(keys)
+            status, content_type, body = recordings[keys[index]]
+            base = synthetic_price(asin)
+        if status != 200 or recorded_price(body) is None:
+            return status, content_type, body
+        price = self.server.behaviour.current_price(asin, base)
+        return status, content_type, self._with_price(body, price)
+
+    def _with_price(self, body, price):
+        return PRICE_PATTERN.sub(lambda m: m.group(1) + f"{price:,.2f}".encode(), body, count=1)
+
+    def _send(self, status, content_type, body, extra_headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+# Section: Start / Stop
+def make_server(host='127.0.0.1', port=0, latency=0.0, page_kb=0, latency_dist='fixed',
+                latency_spread=0.0, error_rate=0.0, throttle_rate=0.0, mutation_rate=0.0,
+                replay_dir=None, seed=None):
+    """
+    Builds (but does not start) the stub server.
+    latency is the mean delay in seconds added to every product page, drawn
+    from latency_dist (see StubBehaviour.sample_latency). page_kb pads
+    synthetic pages to approximate a real product page's size. error_rate and
+    throttle_rate are the fractions of requests answered with 500 and 503,
+    and mutation_rate is the chance that a request changes the product's
+    price. With replay_dir, pages recorded by fetch_amazon_data are served
+    instead of the synthetic template.
+    """
+    server = ThreadingHTTPServer((host, port), StubProductHandler)
+    server.daemon_threads = True
+    server.behaviour = StubBehaviour(latency, latency_dist, latency_spread, error_rate,
+                                     throttle_rate, mutation_rate, seed)
+    server.padding = make_padding(page_kb)
+    server.recordings = load_recordings(replay_dir) if replay_dir else {}
+    server.recording_keys = sorted(server.recordings)
+    if replay_dir and not server.recordings:
+        raise ValueError(f"No recordings found in {replay_dir}")
+    return server
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, page_kb=0, **options):
+    """
+    Starts the stub server on a background thread. options are passed to
+    make_server. Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    server = make_server(host, port, latency, page_kb, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, base_url
+
+def serve_stub(port, options):
+    """
+    Runs the stub server until its process is terminated. Benchmarks start it
+    as a multiprocessing target so the stub does not share a GIL with what
+    they measure. options are passed to make_server.
+    """
+    make_server(port=port, **options).serve_forever()
+
+def free_port(host='127.0.0.1'):
+    """A TCP port nothing is listening on right now."""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port, host='127.0.0.1', attempts=100):
+    """Waits up to attempts / 10 seconds for a server on port; returns whether one answered."""
+    for _ in range(attempts):
+        try:
+            socket.create_connection((host, port)).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def add_server_arguments(parser):
+    """Adds the stub's behaviour options to an argparse parser (shared with bench_fetch.py)."""
+    parser.add_argument('--latency', type=float, default=0.0, help="mean seconds added to every response")
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='fixed')
+    parser.add_argument('--latency-spread', type=float, default=0.0,
+                        help="uniform: +/- seconds; lognormal: sigma")
+    parser.add_argument('--page-kb', type=int, default=0, help="pad synthetic pages to roughly this many KB")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument('--mutation-rate', type=float, default=0.0,
+                        help="chance that a request changes the product's price")
+    parser.add_argument('--replay', default=None, help="directory of pages recorded with TRACKER_RECORD_DIR")
+    parser.add_argument('--seed', type=int, default=None)
+
+def server_options(args):
+    """Maps parsed add_server_arguments options to make_server keyword arguments."""
+    return {'latency': args.latency, 'page_kb': args.page_kb, 'latency_dist': args.latency_dist,
+            'latency_spread': args.latency_spread, 'error_rate': args.error_rate,
+            'throttle_rate': args.throttle_rate, 'mutation_rate': args.mutation_rate,
+            'replay_dir': args.replay, 'seed': args.seed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub Amazon product server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_server_arguments(parser)
+    parser.add_argument('--write-urls', default=None,
+                        help="write a product_urls.json for --products synthetic products and exit")
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.write_urls:
+        write_product_urls(args.write_urls, base_url, args.products)
+        print(f"Wrote {args.products} stub product URLs to {args.write_urls}")
+        return
+
+    server = make_server(args.host, args.port, **server_options(args))
+    print(f"Stub product server listening on {base_url}/dp/<ASIN>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import rebuild_summary, update_summary
+from history import save_history
+from retention import HOUR, compact_history
+
+WINDOW_COLUMNS = ['obs_count', 'min_price', 'max_price', 'mean_price', 'first_price', 'last_price',
+                  'price_change']
+
+def _windows(db_name, hours):
+    with sqlite3.connect(db_name) as conn:
+        return pd.read_sql_query('SELECT * FROM product_window_stats WHERE window_hours = ? ORDER BY nickname',
+                                 conn, params=(hours,)).set_index('nickname')[WINDOW_COLUMNS]
+
+@pytest.fixture
+def hourly_history(tmp_path):
+    """29 days of hourly prices for two products; the cheapest prices are the oldest."""
+    start = 1_700_000_000 // HOUR * HOUR
+    ts = start + np.arange(29 * 24) * HOUR
+    frames = []
+    for nickname, scale in (('a', 1.0), ('b', 3.0)):
+        prices = np.where(ts < start + 10 * 86400, 5.0, 10.0 + (np.arange(len(ts)) % 7)) * scale
+        frames.append(pd.DataFrame({'nickname': nickname, 'title': nickname.upper(), 'price': prices,
+                                    'url': 'u', 'ts': ts}))
+    history_df = pd.concat(frames, ignore_index=True)
+    csv_file, db_name = str(tmp_path / 'price_history.csv'), str(tmp_path / 'amazon_tracker.db')
+    save_history(history_df, csv_file)
+    return history_df, csv_file, db_name, int(ts.max())
+
+def test_long_windows_include_compacted_bars(hourly_history):
+    history_df, csv_file, db_name, last_ts = hourly_history
+    rebuild_summary(history_df, db_name)
+    before = _windows(db_name, 720)
+    assert before.loc['a', 'obs_count'] == 696 and before.loc['a', 'min_price'] == 5.0
+
+    compact_history(csv_file, db_name, raw_days=14, hourly_days=60, now=last_ts + HOUR)
+    remaining = pd.read_csv(csv_file)
+    assert len(remaining) < len(history_df)
+    rebuild_summary(remaining, db_name)
+    pd.testing.assert_frame_equal(_windows(db_name, 720), before)
+
+def test_incremental_update_keeps_the_bars_in_long_windows(hourly_history):
+    history_df, csv_file, db_name, last_ts = hourly_history
+    compact_history(csv_file, db_name, raw_days=14, hourly_days=60, now=last_ts + HOUR)
+    remaining = pd.read_csv(csv_file)
+    rebuild_summary(remaining, db_name)
+
+    new_df = pd.DataFrame({'nickname': ['a'], 'title': ['A'], 'price': [12.0], 'url': ['u'],
+                           'ts': [last_ts + HOUR]})
+    update_summary(new_df, pd.concat([remaining, new_df], ignore_index=True), db_name)
+    windows = _windows(db_name, 720)
+    assert windows.loc['a', 'obs_count'] == 697
+    assert windows.loc['a', 'min_price'] == 5.0
+    assert windows.loc['a', 'first_price'] == 5.0
+    assert windows.loc['a', 'last_price'] == 12.0
+    assert windows.loc['b', 'obs_count'] == 696
+    assert windows.loc['b', 'min_price'] == 15.0
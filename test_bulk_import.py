@@ -0,0 +1,52 @@
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+import bulk_import
+import history
+
+def utc(text):
+    return int(pd.Timestamp(text, tz='UTC').timestamp())
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setattr(history, 'LOCAL_TZ', ZoneInfo('America/New_York'))
+
+def test_naive_dates_are_read_in_the_local_zone_across_dst(new_york):
+    values = pd.Series(['2025-01-15 12:00:00', '2025-07-15 12:00:00', '2025-03-09 02:30:00',
+                        '2025-11-02 01:30:00', '2025-01-15T12:00:00+00:00'])
+    seconds = bulk_import._to_epoch_seconds(values[:4]).tolist()
+    assert seconds == [utc('2025-01-15 17:00'), utc('2025-07-15 16:00'),
+                       utc('2025-03-09 07:00'), utc('2025-11-02 05:30')]
+    # Explicit offsets are kept as they are
+    assert bulk_import._to_epoch_seconds(values[4:]).tolist() == [utc('2025-01-15 12:00')]
+
+def test_hours_with_raw_rows_are_not_imported_as_bars(tmp_path):
+    import sqlite3
+    from retention import DAY, compact_history
+    now = 100 * DAY
+    old = now - 10 * DAY
+    csv_file, db_name = str(tmp_path / 'price_history.csv'), str(tmp_path / 'amazon_tracker.db')
+    history.save_history(pd.DataFrame({'nickname': ['p'], 'title': ['t'], 'price': [10.0], 'url': ['u'],
+                                       'ts': [old + 60]}), csv_file)
+    source = tmp_path / 'import.csv'
+    pd.DataFrame({'nickname': ['p', 'p'], 'price': [5.0, 7.0],
+                  'ts': [old + 120, old + 2 * 3600]}).to_csv(source, index=False)
+
+    report = bulk_import.import_files([str(source)], db_name, csv_file, workers=1, urls_file=str(tmp_path / 'none'),
+                                      raw_days=2, hourly_days=30, now=now)
+    assert report['rows_in_existing_bars'] == 1
+    assert report['hourly_bars_written'] == 1
+    assert report['rows_new'] == 1
+
+    compact_history(csv_file, db_name, raw_days=2, hourly_days=30, now=now)
+    with sqlite3.connect(db_name) as conn:
+        bars = conn.execute("SELECT bucket_start, open, count FROM price_bars WHERE nickname = 'p' "
+                            "ORDER BY bucket_start").fetchall()
+    assert bars == [(old, 10.0, 1), (old + 7200, 7.0, 1)]
+
+def test_import_rejects_raw_days_at_or_above_hourly_days(tmp_path):
+    with pytest.raises(ValueError):
+        bulk_import.import_files([str(tmp_path / 'none.csv')], str(tmp_path / 'amazon_tracker.db'),
+                                 str(tmp_path / 'price_history.csv'), raw_days=30, hourly_days=30)
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import daemon
+from generate_data import initialize_database, run_fetch_cycle
+from history import load_history
+from stub_server import start_stub_server, synthetic_product_urls
+
+# The products table as every release before epoch timestamps created it
+LEGACY_PRODUCTS = '''
+    CREATE TABLE products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nickname TEXT,
+        title TEXT,
+        price REAL,
+        url TEXT,
+        date TIMESTAMP
+    )
+'''
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    db_name = str(tmp_path / 'amazon_tracker.db')
+    with sqlite3.connect(db_name) as conn:
+        conn.execute(LEGACY_PRODUCTS)
+        conn.execute("INSERT INTO products (nickname, title, price, url, date) "
+                     "VALUES ('old', 'Old', 1.0, 'u', '2024-01-01 10:00:00')")
+    return db_name
+
+@pytest.fixture
+def product_urls():
+    server, base_url = start_stub_server()
+    yield synthetic_product_urls(base_url, 3)
+    server.shutdown()
+
+def _columns(db_name):
+    with sqlite3.connect(db_name) as conn:
+        return {row[1] for row in conn.execute('PRAGMA table_info(products)')}
+
+def test_initialize_database_replaces_a_legacy_products_table(legacy_db):
+    initialize_database(legacy_db)
+    assert {'ts', 'cycle'} <= _columns(legacy_db)
+    assert 'date' not in _columns(legacy_db)
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM products').fetchone()[0] == 0
+
+def test_fetch_cycle_runs_on_a_legacy_database(legacy_db, product_urls, tmp_path):
+    csv_file = str(tmp_path / 'price_history.csv')
+    run_fetch_cycle(product_urls, db_name=legacy_db, csv_file=csv_file)
+    assert len(load_history(csv_file)) == 3
+
+def test_daemon_runs_on_a_legacy_database(legacy_db, product_urls, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(daemon, 'load_product_urls', lambda urls_file: product_urls)
+    tracker = daemon.TrackerDaemon(interval=0, db_name=legacy_db, csv_file=str(tmp_path / 'price_history.csv'),
+                                   max_cycles=2)
+    assert tracker.run() == 2
+    assert 'Error during fetch cycle' not in capsys.readouterr().out
+    # Both cycles may fetch within the same second; those observations are merged
+    assert set(load_history(tracker.csv_file)['nickname']) == set(product_urls)
+
+def test_failed_daemon_cycle_releases_the_write_lock(legacy_db, tmp_path, monkeypatch):
+    def failing_cycle(self):
+        self.conn.execute("INSERT INTO products (nickname, title, price, url, date) VALUES ('x', 'X', 1, 'u', 0)")
+        raise RuntimeError("fetch failed")
+    monkeypatch.setattr(daemon.TrackerDaemon, 'run_cycle', failing_cycle)
+    tracker = daemon.TrackerDaemon(interval=0, db_name=legacy_db, csv_file=str(tmp_path / 'price_history.csv'),
+                                   max_cycles=2)
+    locked = []
+    original_wait = tracker.stop_event.wait
+    def check_lock(timeout=None):
+        # Between cycles another writer must get the database
+        with sqlite3.connect(legacy_db, timeout=0.1) as other:
+            try:
+                other.execute("INSERT INTO products (nickname) VALUES ('other')")
+            except sqlite3.OperationalError:
+                locked.append(True)
+        return original_wait(0)
+    tracker.stop_event.wait = check_lock
+    tracker.run()
+    assert not locked
@@ -0,0 +1,80 @@
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import history
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+def utc(text):
+    return int(pd.Timestamp(text, tz='UTC').timestamp())
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setattr(history, 'LOCAL_TZ', NEW_YORK)
+
+def test_local_timezone_follows_tz_variable(monkeypatch):
+    monkeypatch.setitem(__import__('sys').modules, 'tzlocal', None)
+    monkeypatch.setenv('TZ', 'America/New_York')
+    assert history.local_timezone() == NEW_YORK
+
+def test_legacy_conversion_uses_the_offset_of_each_date(new_york):
+    legacy = pd.DataFrame({
+        'nickname': 'p', 'title': 't', 'price': 1.0, 'url': 'u',
+        'date_only': ['2025-01-15', '2025-07-15', '2025-03-09', '2025-03-09', '2025-03-09', '2025-11-02'],
+        'time_only': ['12:00:00', '12:00:00', '01:30:00', '03:30:00', '02:30:00', '01:30:00'],
+    })
+    ts = history.convert_legacy_history(legacy)['ts'].tolist()
+    assert ts == [
+        utc('2025-01-15 17:00'),  # EST, UTC-5
+        utc('2025-07-15 16:00'),  # EDT, UTC-4
+        utc('2025-03-09 06:30'),  # before the spring-forward gap
+        utc('2025-03-09 07:30'),  # after it
+        utc('2025-03-09 07:00'),  # inside the gap: moved to 03:00 EDT
+        utc('2025-11-02 05:30'),  # repeated hour: the first (EDT) 01:30
+    ]
+
+def test_to_local_datetime_crosses_dst(new_york):
+    dates = history.to_local_datetime([utc('2025-01-15 17:00'), utc('2025-07-15 16:00')])
+    assert list(dates) == [pd.Timestamp('2025-01-15 12:00'), pd.Timestamp('2025-07-15 12:00')]
+
+# Section: Change-only Storage
+def observations(nickname, prices, start=1_700_000_000, step=3600, title='Title'):
+    return pd.DataFrame({'nickname': nickname, 'title': title, 'price': prices, 'url': 'u',
+                         'ts': start + step * np.arange(len(prices))})
+
+def test_compress_then_expand_keeps_every_observation():
+    df = pd.concat([observations('a', [5.0] * 4 + [6.0] * 3 + [5.0] * 2), observations('b', [9.0] * 5)],
+                   ignore_index=True)
+    runs = history.compress_runs(df)
+    assert runs[['nickname', 'price', 'obs_count']].values.tolist() == [
+        ['a', 5.0, 4], ['a', 6.0, 3], ['a', 5.0, 2], ['b', 9.0, 5]]
+    # Each run keeps the times of its first and last observation
+    assert runs['ts'].tolist() == df['ts'].iloc[[0, 4, 7, 9]].tolist()
+    assert runs['last_seen'].tolist() == df['ts'].iloc[[3, 6, 8, 13]].tolist()
+
+    expanded = history.expand_runs(runs)
+    assert len(expanded) == len(df)
+    # Hourly fetches are spread back exactly
+    pd.testing.assert_frame_equal(expanded, df[history.HISTORY_COLUMNS], check_dtype=False)
+
+def test_merging_the_same_cycle_twice_changes_nothing(monkeypatch):
+    monkeypatch.setattr(history, 'STORAGE_MODE', 'change_only')
+    stored = history.compress_runs(observations('a', [5.0, 5.0, 6.0]))
+    cycle = observations('a', [6.0], start=1_700_000_000 + 3 * 3600)
+    once = history.append_observations(stored, cycle)
+    twice = history.append_observations(once, cycle)
+    pd.testing.assert_frame_equal(once, twice)
+    assert once[['price', 'obs_count']].values.tolist() == [[5.0, 2], [6.0, 2]]
+    # A full file switches to runs when the storage mode is change_only
+    full_once = history.append_observations(history.expand_runs(stored), cycle)
+    pd.testing.assert_frame_equal(history.append_observations(full_once, cycle), once)
+
+def test_a_title_change_starts_a_new_run():
+    df = pd.concat([observations('a', [5.0, 5.0], title='Old name'),
+                    observations('a', [5.0, 5.0], start=1_700_000_000 + 2 * 3600, title='New name')],
+                   ignore_index=True)
+    runs = history.compress_runs(df)
+    assert runs[['title', 'price', 'obs_count']].values.tolist() == [['Old name', 5.0, 2], ['New name', 5.0, 2]]
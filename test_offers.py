@@ -0,0 +1,8 @@
+import os
+
+from check_fixtures import FIXTURES_DIR, check_fixtures
+
+def test_saved_pages_parse_as_expected(capsys):
+    assert any(name.endswith('.html') for name in os.listdir(FIXTURES_DIR))
+    failures = check_fixtures()
+    assert failures == 0, capsys.readouterr().out
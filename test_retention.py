@@ -0,0 +1,19 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from history import save_history
+from retention import DAY, compact_history
+
+def test_compact_history_rejects_raw_days_at_or_above_hourly_days(tmp_path):
+    csv_file, db_name = str(tmp_path / 'price_history.csv'), str(tmp_path / 'amazon_tracker.db')
+    save_history(pd.DataFrame({'nickname': ['p'], 'title': ['t'], 'price': [1.0], 'url': ['u'], 'ts': [DAY]}),
+                 csv_file)
+    for raw_days, hourly_days in ((30, 30), (60, 30)):
+        with pytest.raises(ValueError):
+            compact_history(csv_file, db_name, raw_days=raw_days, hourly_days=hourly_days, now=100 * DAY)
+    # Nothing was compacted
+    assert len(pd.read_csv(csv_file)) == 1
+    with sqlite3.connect(db_name) as conn:
+        assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'price_bars'").fetchone()
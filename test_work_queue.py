@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from generate_data import fetch_price_history, initialize_database
+from work_queue import (MAX_ATTEMPTS, claim_batch, complete_batch, connect_queue, enqueue_products,
+                        initialize_queue, queue_counts, queue_drained)
+
+PRODUCTS = {'p1': 'http://example.invalid/dp/B000000001', 'p2': 'http://example.invalid/dp/B000000002'}
+
+def _data(nickname):
+    return {'title': nickname.upper(), 'price': 9.99, 'url': PRODUCTS[nickname], 'ts': int(time.time())}
+
+@pytest.fixture
+def queue_db(tmp_path):
+    db_name = str(tmp_path / 'amazon_tracker.db')
+    initialize_database(db_name)
+    initialize_queue(db_name)
+    conn = connect_queue(db_name)
+    yield db_name, conn
+    conn.close()
+
+def _status(conn, nickname):
+    return conn.execute('SELECT status, attempts FROM work_queue WHERE nickname = ?', (nickname,)).fetchone()
+
+def test_an_expired_lease_moves_to_another_worker(queue_db):
+    db_name, conn = queue_db
+    enqueue_products({'p1': PRODUCTS['p1']}, db_name, cycle='c')
+    [(queue_id, _, _)] = claim_batch(conn, 'slow', lease_seconds=0.05)
+    assert claim_batch(conn, 'other') == []  # still leased
+    time.sleep(0.1)
+
+    assert claim_batch(conn, 'other', lease_seconds=60) == [(queue_id, 'p1', PRODUCTS['p1'])]
+    # The worker that lost its lease stores nothing and settles nothing
+    assert complete_batch(conn, 'slow', [(queue_id, 'p1', _data('p1'))]) == 0
+    assert _status(conn, 'p1') == ('leased', 2)
+    assert complete_batch(conn, 'other', [(queue_id, 'p1', _data('p1'))]) == 1
+    assert _status(conn, 'p1') == ('done', 2)
+    assert len(fetch_price_history(db_name, cycle='c')) == 1
+
+def test_items_are_parked_after_max_attempts(queue_db):
+    db_name, conn = queue_db
+    enqueue_products(PRODUCTS, db_name, cycle='c')
+    for attempt in range(MAX_ATTEMPTS):
+        # p1's workers keep dying; p2's keep reporting errors
+        batch = claim_batch(conn, f"worker-{attempt}", lease_seconds=0.05)
+        assert sorted(row[1] for row in batch) == ['p1', 'p2']
+        p2 = [row[0] for row in batch if row[1] == 'p2']
+        complete_batch(conn, f"worker-{attempt}", [], [(p2[0], 'no valid price')])
+        time.sleep(0.1)
+    assert claim_batch(conn, 'late') == []
+    assert _status(conn, 'p1') == ('failed', MAX_ATTEMPTS)
+    assert _status(conn, 'p2') == ('failed', MAX_ATTEMPTS)
+    assert queue_counts(conn) == {'failed': 2}
+    assert fetch_price_history(db_name) == []
+
+def test_queue_drained(queue_db):
+    db_name, conn = queue_db
+    assert queue_drained(conn)
+    enqueue_products({'p1': PRODUCTS['p1']}, db_name, cycle='c')
+    assert not queue_drained(conn)  # pending
+    [(queue_id, _, _)] = claim_batch(conn, 'w', lease_seconds=0.05)
+    assert not queue_drained(conn)  # live lease
+    time.sleep(0.1)
+    assert not queue_drained(conn)  # expired lease with attempts left: will be retried
+    [(queue_id, _, _)] = claim_batch(conn, 'w2', lease_seconds=60)
+    complete_batch(conn, 'w2', [(queue_id, 'p1', _data('p1'))])
+    assert queue_drained(conn)
+
+def test_queue_drained_once_an_expired_lease_has_no_attempts_left(queue_db):
+    db_name, conn = queue_db
+    enqueue_products({'p1': PRODUCTS['p1']}, db_name, cycle='c')
+    for attempt in range(MAX_ATTEMPTS):
+        assert claim_batch(conn, f"worker-{attempt}", lease_seconds=0.05)
+        time.sleep(0.1)
+    # Nobody will claim it again, so the coordinator must not wait for it
+    assert _status(conn, 'p1') == ('leased', MAX_ATTEMPTS)
+    assert queue_drained(conn)
+
+def test_a_new_cycle_takes_over_items_a_crashed_coordinator_left(queue_db):
+    db_name, conn = queue_db
+    enqueue_products(PRODUCTS, db_name, cycle='dead')
+    # The dead cycle's worker leased p1 and died; p2 was never claimed
+    assert [row[1] for row in claim_batch(conn, 'dead-worker', batch_size=1, lease_seconds=0.05)] == ['p1']
+    time.sleep(0.1)
+
+    enqueue_products(PRODUCTS, db_name, cycle='new')
+    batch = claim_batch(conn, 'new-worker')
+    assert sorted(row[1] for row in batch) == ['p1', 'p2']
+    assert complete_batch(conn, 'new-worker', [(queue_id, nickname, _data(nickname))
+                                               for queue_id, nickname, _ in batch]) == 2
+    assert sorted(row[0] for row in fetch_price_history(db_name, cycle='new')) == ['p1', 'p2']
+    assert fetch_price_history(db_name, cycle='dead') == []
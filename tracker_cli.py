@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+
+from profiling import add_profile_argument, run_profiled
+
+# Command modules are imported inside each handler so that, for example,
+# `tracker daemon` never loads the export or GUI dependencies.
+
+# Section: Commands
+def cmd_daemon(args):
+    from daemon import run_daemon
+    options = {'request_timeout': tuple(args.timeout)} if args.timeout else {}
+    run_daemon(args.interval_minutes * 60, urls_file=args.urls, db_name=args.db,
+               csv_file=args.csv, max_cycles=args.cycles, **options)
+
+def cmd_fetch(args):
+    if args.record:
+        # Read by generate_data at import time, and inherited by crawler workers
+        os.environ['TRACKER_RECORD_DIR'] = args.record
+    from generate_data import load_product_urls, run_fetch_cycle
+    product_urls = load_product_urls(args.urls)
+    if args.workers > 1:
+        from crawler import run_coordinator
+        run_coordinator(args.workers, product_urls, db_name=args.db, csv_file=args.csv)
+    else:
+        run_fetch_cycle(product_urls, db_name=args.db, csv_file=args.csv)
+
+def cmd_export(args):
+    from clean_data import clean_price_data_tableau
+    clean_price_data_tableau(args.csv, args.output)
+
+def cmd_import(args):
+    from bulk_import import import_files, parse_column_map, print_report
+    report = import_files(args.files, db_name=args.db, csv_file=args.csv, workers=args.workers,
+                          overrides=parse_column_map(args.map), urls_file=args.urls, sheet=args.sheet)
+    print_report(report)
+    return 1 if report['errors'] else 0
+
+def cmd_stats(args):
+    from analytics import load_summary, load_window_changes
+    if args.window:
+        changes = load_window_changes(args.window, args.db)
+        if changes.empty:
+            print(f"No data in the last {args.window} hours.")
+        for nick, diff in zip(changes['nickname'], changes['price_diff']):
+            print(f"{nick}: {diff:+.2f}")
+        return
+
+    summary = load_summary(args.db)
+    if summary.empty:
+        print("No summary yet; run `tracker fetch` or `python analytics.py --rebuild`.")
+        return
+    columns = ['nickname', 'last_price', 'all_time_low', 'all_time_high', 'volatility',
+               'seconds_since_change', 'obs_count']
+    print(summary[columns].to_string(index=False))
+
+# Section: Argument Parsing
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tracker', description="Amazon Product Price Tracker")
+    parser.add_argument('--db', default='amazon_tracker.db', help="SQLite database file")
+    parser.add_argument('--csv', default='price_history.csv', help="price history CSV file")
+    add_profile_argument(parser)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    daemon = subparsers.add_parser('daemon', help="run fetch cycles headlessly on an interval")
+    daemon.add_argument('--interval-minutes', type=float, default=60)
+    daemon.add_argument('--urls', default='product_urls.json', help="product list JSON file")
+    daemon.add_argument('--cycles', type=int, default=None, help="stop after this many cycles")
+    daemon.add_argument('--timeout', type=float, nargs=2, metavar=('CONNECT', 'READ'), default=None,
+                        help="seconds to wait for each page (default: 5 30)")
+    daemon.set_defaults(func=cmd_daemon)
+
+    fetch = subparsers.add_parser('fetch', help="run one fetch cycle now")
+    fetch.add_argument('--urls', default='product_urls.json', help="product list JSON file")
+    fetch.add_argument('--workers', type=int, default=1, help="use the multi-process crawler")
+    fetch.add_argument('--record', default=None, metavar='DIR',
+                       help="save every fetched page to DIR for replay by stub_server.py")
+    fetch.set_defaults(func=cmd_fetch)
+
+    export = subparsers.add_parser('export', help="write the Tableau-ready Excel file")
+    export.add_argument('--output', default='tableau_ready.xlsx')
+    export.set_defaults(func=cmd_export)
+
+    bulk = subparsers.add_parser('import', help="bulk import price history from CSV/JSON/XLSX files")
+    bulk.add_argument('files', nargs='+')
+    bulk.add_argument('--urls', default='product_urls.json', help="product list used to map ASINs to nicknames")
+    bulk.add_argument('--workers', type=int, default=None, help="parser processes (default: CPUs)")
+    bulk.add_argument('--sheet', default=None, help="XLSX sheet name (default: the first sheet)")
+    bulk.add_argument('--map', action='append', metavar='FIELD=COLUMN',
+                      help="use COLUMN for FIELD (nickname, asin, title, price, url, ts)")
+    bulk.set_defaults(func=cmd_import)
+
+    stats = subparsers.add_parser('stats', help="print per-product summary statistics")
+    stats.add_argument('--window', type=int, default=None,
+                       help="print price changes over this many hours instead")
+    stats.set_defaults(func=cmd_stats)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run_profiled(f"tracker-{args.command}", args.func, args, mode=args.profile) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
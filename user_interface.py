@@ -6,7 +6,10 @@ import time
 import schedule
 import subprocess
 import os
-import pandas as pd
+from analytics import load_window_changes
+from history import atomic_write
+from product_list import ProductList
+from profiling import profile_mode, run_profiled
 
 ###############################################################################
 # GLOBALS
@@ -33,78 +36,25 @@ def load_product_urls():
         return {}
 
 def save_product_urls(urls):
-    with open(URLS_FILE, 'w') as file:
+    # A fetch cycle reading the file meanwhile sees the old list or the new one
+    with atomic_write(URLS_FILE) as file:
         json.dump(urls, file, indent=4)
 
-def compute_48h_changes(df):
-    """
-    Returns a list of (nickname, price_diff) for products 
-    that have data within the last 48 hours.
-    price_diff = last_price - first_price in that window.
-    """
-    if df.empty:
-        return []
-
-    if 'date_only' not in df.columns or 'price' not in df.columns or 'nickname' not in df.columns:
-        return []
-
-    # Convert date_only to datetime if not already
-    df['date_only'] = pd.to_datetime(df['date_only'], errors='coerce')
-    df.dropna(subset=['date_only', 'price', 'nickname'], inplace=True)
-
-    if df.empty:
-        return []
-
-    latest_date = df['date_only'].max()
-    cutoff = latest_date - pd.Timedelta(hours=48)
-    recent_df = df[df['date_only'] >= cutoff].copy()
-
-    if recent_df.empty:
-        return []
-
-    # Sort by date so first is earliest, last is latest
-    recent_df.sort_values('date_only', inplace=True)
-
-    grouped = recent_df.groupby('nickname').agg(
-        first_price=('price', 'first'),
-        last_price=('price', 'last')
-    )
-    grouped['price_diff'] = grouped['last_price'] - grouped['first_price']
-    grouped.reset_index(inplace=True)
-
-    # Return list of tuples
-    changes = []
-    for _, row in grouped.iterrows():
-        changes.append((row['nickname'], row['price_diff']))
-
-    return changes
-
 def update_48h_changes():
     """
-    Loads the latest 'price_history.csv', computes 48h changes,
-    then updates the 'changes_text' widget in the GUI.
+    Reads the 48h price changes from the analytics summary table
+    (refreshed by generate_data.py after each fetch cycle), then
+    updates the 'changes_text' widget in the GUI.
     """
     global changes_text
-    try:
-        df = pd.read_csv("price_history.csv")
-        if df.empty:
-            changes_text.delete("1.0", tk.END)
-            changes_text.insert(tk.END, "No data in price_history.csv.")
-            return
-    except Exception as e:
-        changes_text.delete("1.0", tk.END)
-        changes_text.insert(tk.END, f"Error loading price_history.csv: {e}")
-        return
-
-    # Compute changes
-    changes = compute_48h_changes(df)
+    changes = load_window_changes(48)
 
     # Display them
     changes_text.delete("1.0", tk.END)
-    if not changes:
+    if changes.empty:
         changes_text.insert(tk.END, "No data or no price changes in the last 48 hours.")
     else:
-        for (nick, diff) in changes:
+        for nick, diff in zip(changes['nickname'], changes['price_diff']):
             changes_text.insert(tk.END, f"{nick}: {diff:+.2f}\n")
 
 ###############################################################################
@@ -228,10 +178,11 @@ def add_product():
         product_urls[nickname] = url
         save_product_urls(product_urls)
         messagebox.showinfo("Success", f"Added product: {nickname}")
-        refresh_product_list()
+        product_list.insert(nickname)
 
 def delete_product():
-    selected_product = product_listbox.get(tk.ACTIVE)
+    selected = product_list.selection()
+    selected_product = selected[0] if selected else None
     if not selected_product:
         messagebox.showerror("Error", "No product selected!")
         return
@@ -241,16 +192,10 @@ def delete_product():
         del product_urls[selected_product]
         save_product_urls(product_urls)
         messagebox.showinfo("Success", f"Deleted product: {selected_product}")
-        refresh_product_list()
+        product_list.delete(selected_product)
     else:
         messagebox.showerror("Error", f"Product '{selected_product}' not found.")
 
-def refresh_product_list():
-    product_listbox.delete(0, tk.END)
-    product_urls = load_product_urls()
-    for nickname in product_urls.keys():
-        product_listbox.insert(tk.END, nickname)
-
 ###############################################################################
 # NEW: RUN GRAPH.PY
 ###############################################################################
@@ -301,15 +246,14 @@ def show_gui():
 
     tk.Label(manage_frame, text="Products:").pack()
 
-    global product_listbox
-    product_listbox = tk.Listbox(manage_frame, width=50, height=10)
-    product_listbox.pack(pady=5)
+    # Only the visible rows are drawn, so tens of thousands of products stay responsive
+    global product_list
+    product_list = ProductList(manage_frame, load_product_urls().keys(), width=50, height=10)
+    product_list.pack(pady=5)
 
     delete_button = tk.Button(manage_frame, text="Delete Selected Product", command=delete_product)
     delete_button.pack(pady=5)
 
-    refresh_product_list()
-
     # Frame for Scheduler Frequency
     freq_frame = tk.Frame(app, bd=2, relief="ridge")
     freq_frame.pack(pady=10, fill="x", padx=20)
@@ -385,4 +329,5 @@ def show_gui():
     app.mainloop()
 
 if __name__ == "__main__":
-    show_gui()
+    # TRACKER_PROFILE=1 also profiles the scripts launched from the GUI
+    run_profiled('user_interface', show_gui, mode=profile_mode())
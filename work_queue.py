@@ -0,0 +1,164 @@
+import sqlite3
+import time
+
+from offers import store_offers
+
+# Seconds a claimed item stays invisible to other workers before it is retried
+DEFAULT_LEASE_SECONDS = 60
+# Items that fail (or whose worker dies) this many times are parked as 'failed'
+MAX_ATTEMPTS = 3
+
+# Section: Connect to the Queue
+def connect_queue(db_name='amazon_tracker.db'):
+    """
+    Opens a connection suitable for sharing the database file between processes.
+    WAL mode lets readers keep going while a worker commits, and the busy
+    timeout makes writers wait for each other instead of failing.
+    WAL needs shared memory between the processes, so the queue is
+    single-host: the database must be on a local disk, not a network share.
+    """
+    conn = sqlite3.connect(db_name, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+# Section: Initialize Queue
+def initialize_queue(db_name='amazon_tracker.db'):
+    """Creates the work_queue table if it does not exist yet."""
+    conn = connect_queue(db_name)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS work_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nickname TEXT UNIQUE,
+            url TEXT,
+            status TEXT DEFAULT 'pending',
+            lease_owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            enqueued_at REAL,
+            cycle TEXT
+        )
+    ''')
+    if 'cycle' not in [row[1] for row in conn.execute('PRAGMA table_info(work_queue)')]:
+        conn.execute('ALTER TABLE work_queue ADD COLUMN cycle TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_work_queue_status ON work_queue (status, lease_expires)')
+    conn.close()
+
+# Section: Enqueue Products
+def enqueue_products(product_urls, db_name='amazon_tracker.db', cycle=None):
+    """
+    Queues every (nickname, url) pair for the crawl cycle `cycle`.
+    A product already waiting or leased keeps its place; finished or failed
+    entries from a previous cycle are reset to pending. Every entry moves to
+    the new cycle, including ones a crashed coordinator left behind: rows
+    are tagged with their item's cycle when they are stored (see
+    generate_data.initialize_database), and the newest coordinator exports
+    only after the whole queue has drained.
+    """
+    now = time.time()
+    conn = connect_queue(db_name)
+    conn.execute('BEGIN IMMEDIATE')
+    conn.executemany('''
+        INSERT INTO work_queue (nickname, url, status, attempts, enqueued_at, cycle)
+        VALUES (?, ?, 'pending', 0, ?, ?)
+        ON CONFLICT(nickname) DO UPDATE SET
+            url = excluded.url,
+            cycle = COALESCE(excluded.cycle, cycle),
+            status = CASE WHEN status IN ('done', 'failed') THEN 'pending' ELSE status END,
+            attempts = CASE WHEN status IN ('done', 'failed') THEN 0 ELSE attempts END,
+            last_error = NULL,
+            enqueued_at = excluded.enqueued_at
+    ''', [(nickname, url, now, cycle) for nickname, url in product_urls.items()])
+    conn.execute('COMMIT')
+    conn.close()
+    return len(product_urls)
+
+# Section: Claim a Batch
+def claim_batch(conn, worker_id, batch_size=10, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Leases up to batch_size items to worker_id and returns them as
+    (id, nickname, url) tuples. Pending items and items whose lease has
+    expired (their worker crashed or stalled) are both eligible.
+    """
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute('''
+            SELECT id, nickname, url FROM work_queue
+            WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+              AND attempts < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (now, MAX_ATTEMPTS, batch_size)).fetchall()
+        if rows:
+            conn.executemany('''
+                UPDATE work_queue
+                SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', [(worker_id, now + lease_seconds, row[0]) for row in rows])
+        # Expired leases that have used up their attempts are parked for good
+        conn.execute('''
+            UPDATE work_queue SET status = 'failed', last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+        ''', (now, MAX_ATTEMPTS))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return rows
+
+# Section: Complete a Batch
+def complete_batch(conn, worker_id, results, failures=()):
+    """
+    Stores fetched results and settles the worker's leases in one transaction.
+
+    results is a list of (queue_id, nickname, data) tuples where data is the
+    dictionary returned by fetch_amazon_data. failures is a list of
+    (queue_id, error message) tuples. Rows are only written for items the
+    worker still holds a lease on, so a worker that lost its lease to a
+    retry cannot store a duplicate observation.
+    Returns the number of observations stored.
+    """
+    stored = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for queue_id, nickname, data in results:
+            cur = conn.execute('''
+                UPDATE work_queue SET status = 'done', lease_owner = NULL, lease_expires = NULL
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (queue_id, worker_id))
+            if cur.rowcount:
+                conn.execute('''
+                    INSERT INTO products (nickname, title, price, url, ts, cycle)
+                    VALUES (?, ?, ?, ?, ?, (SELECT cycle FROM work_queue WHERE id = ?))
+                ''', (nickname, data['title'], data['price'], data['url'], data['ts'], queue_id))
+                store_offers(conn, nickname, data.get('offers'), data['ts'])
+                stored += 1
+        for queue_id, error in failures:
+            conn.execute('''
+                UPDATE work_queue
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_owner = NULL, lease_expires = NULL, last_error = ?
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (MAX_ATTEMPTS, str(error), queue_id, worker_id))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return stored
+
+# Section: Queue Status
+def queue_counts(conn):
+    """Returns a dictionary of item counts keyed by status."""
+    rows = conn.execute('SELECT status, COUNT(*) FROM work_queue GROUP BY status').fetchall()
+    return dict(rows)
+
+def queue_drained(conn):
+    """True when no item is pending or still held under a live or expired lease."""
+    row = conn.execute('''
+        SELECT COUNT(*) FROM work_queue
+        WHERE status = 'pending' OR (status = 'leased' AND attempts < ?)
+           OR (status = 'leased' AND lease_expires >= ?)
+    ''', (MAX_ATTEMPTS, time.time())).fetchone()
+    return row[0] == 0